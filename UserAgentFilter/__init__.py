@@ -1,12 +1,66 @@
-
 #Package metadata
 __version__='1.0.0'
 __author__='Ambily Biju & Shahana Farvin'
 __email__='ambilybiju2408@gmail.com ,shahana50997@gmail.com'
 
-from .tester import UserAgentTester
+import importlib
+import logging
+from typing import TYPE_CHECKING
+
+# The package logs through the 'UserAgentFilter' logger and leaves output to the application
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# Public names and the submodules that define them. Submodules are imported on first access
+# (PEP 562), so `import UserAgentFilter` does not load requests or urllib3
+_EXPORTS = {
+    'UserAgentTester': 'tester',
+    'GetUserAgent': 'selector',
+    'AgentClassifier': 'classifier',
+    'parse_user_agent': 'classifier',
+    'BlockDetector': 'content',
+    'VerdictCache': 'cache',
+    'MetricsAggregator': 'metrics',
+    'CheckResult': 'metrics',
+    'VerdictPredictor': 'predictor',
+    'ProxyPool': 'proxies',
+    'HostRateLimiter': 'ratelimit',
+    'RetryPolicy': 'retry',
+    'PoolRevalidator': 'revalidator',
+    'AgentStore': 'store',
+    'RequestsTransport': 'transport',
+    'HTTPXTransport': 'transport',
+    'FakeTransport': 'transport',
+    'configure_logging': 'log',
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .cache import VerdictCache
+    from .classifier import AgentClassifier, parse_user_agent
+    from .content import BlockDetector
+    from .log import configure_logging
+    from .metrics import CheckResult, MetricsAggregator
+    from .predictor import VerdictPredictor
+    from .proxies import ProxyPool
+    from .ratelimit import HostRateLimiter
+    from .retry import RetryPolicy
+    from .revalidator import PoolRevalidator
+    from .selector import GetUserAgent
+    from .store import AgentStore
+    from .tester import UserAgentTester
+    from .transport import FakeTransport, HTTPXTransport, RequestsTransport
 
-__all__ = ['UserAgentFilter']
 
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    # Cache the name so later lookups do not come back here
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Connection timings of the request currently sent by each thread
+_timings = threading.local()
+
+
+def reset_connection_timings() -> None:
+    """
+    Forget the connection timings recorded by the current thread. Call before sending a request.
+    """
+    _timings.connect = None
+    _timings.tls = None
+
+
+def connection_timings() -> Dict[str, Optional[float]]:
+    """
+    Return the connection timings recorded by the current thread since the last reset.
+
+    Returns:
+        dict: 'connect' and 'tls' times in seconds, None if no new connection was opened.
+    """
+    return {'connect': getattr(_timings, 'connect', None), 'tls': getattr(_timings, 'tls', None)}
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        _timings.connect = time.perf_counter() - started
+        return sock
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        _timings.connect = time.perf_counter() - started
+        return sock
+
+    def connect(self) -> None:
+        started = time.perf_counter()
+        super().connect()
+        # Everything after the TCP connect: the proxy tunnel, if any, and the TLS handshake
+        _timings.tls = time.perf_counter() - started - (getattr(_timings, 'connect', None) or 0.0)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+_TIMED_POOL_CLASSES = {'http': _TimedHTTPConnectionPool, 'https': _TimedHTTPSConnectionPool}
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    An `HTTPAdapter` whose connections record their TCP connect and TLS handshake times.
+
+    The times are stored per thread and read with `connection_timings`.
+    """
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _TIMED_POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        # SOCKS proxy managers use their own connection classes and are left as they are
+        if manager.pool_classes_by_scheme is not _TIMED_POOL_CLASSES and not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = _TIMED_POOL_CLASSES
+        return manager
@@ -0,0 +1,163 @@
+import sqlite3
+import threading
+import time
+from typing import Iterator, NamedTuple, Optional, Tuple
+
+
+class Verdict(NamedTuple):
+    """
+    A cached test result for one (user agent, host) pair.
+
+    Attributes:
+        status_code (int): The HTTP status code the host answered with.
+        latency (float): Time in seconds the request took.
+        checked_at (float): Unix timestamp of the check.
+    """
+    status_code: int
+    latency: float
+    checked_at: float
+
+    @property
+    def accepted(self) -> bool:
+        """bool: True if the user agent was accepted (HTTP status 200)."""
+        return self.status_code == 200
+
+
+class VerdictCache:
+    """
+    A persistent, SQLite-backed cache of user agent test results.
+
+    Results are keyed by (user agent, host), so a verdict recorded against one page of a site is
+    reused for every URL on the same host. Entries older than `ttl` are treated as unknown and are
+    evicted, and the cache is trimmed to the `max_entries` most recent results.
+
+    The cache can be shared between threads; all access to the database is serialized by a lock.
+    """
+
+    # Number of writes between automatic evictions
+    EVICT_EVERY = 1000
+
+    def __init__(self, path: str, ttl: float = 86400, max_entries: Optional[int] = None):
+        """
+        Open (or create) a verdict cache.
+
+        Args:
+            path (str): Path to the SQLite database file. Use ':memory:' for a throwaway cache.
+            ttl (float, optional): Time in seconds a verdict stays fresh. Default is 86400 (one day).
+            max_entries (int, optional): Maximum number of verdicts to keep. Default is None (no limit).
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "user_agent TEXT NOT NULL, "
+                "host TEXT NOT NULL, "
+                "status_code INTEGER NOT NULL, "
+                "latency REAL NOT NULL, "
+                "checked_at REAL NOT NULL, "
+                "PRIMARY KEY (user_agent, host))"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS verdicts_checked_at ON verdicts (checked_at)")
+        self.evict()
+
+    def get(self, user_agent: str, host: str) -> Optional[Verdict]:
+        """
+        Look up a fresh verdict.
+
+        Args:
+            user_agent (str): The user agent string.
+            host (str): The host (network location) the user agent was tested against.
+
+        Returns:
+            Verdict or None: The cached verdict, or None if it is unknown or older than the TTL.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status_code, latency, checked_at FROM verdicts "
+                "WHERE user_agent = ? AND host = ? AND checked_at >= ?",
+                (user_agent, host.lower(), time.time() - self.ttl),
+            ).fetchone()
+        return Verdict(*row) if row else None
+
+    def put(self, user_agent: str, host: str, status_code: int, latency: float) -> None:
+        """
+        Record the result of a check, replacing any previous verdict for the pair.
+
+        Args:
+            user_agent (str): The user agent string.
+            host (str): The host (network location) the user agent was tested against.
+            status_code (int): The HTTP status code of the response.
+            latency (float): Time in seconds the request took.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?)",
+                (user_agent, host.lower(), status_code, latency, time.time()),
+            )
+            self._writes += 1
+            evict_now = self._writes % self.EVICT_EVERY == 0
+        if evict_now:
+            self.evict()
+
+    def verdicts(self, host: Optional[str] = None) -> Iterator[Tuple[str, str, Verdict]]:
+        """
+        Iterate over the fresh verdicts, e.g. to train a `VerdictPredictor`.
+
+        Args:
+            host (str, optional): Only return verdicts for this host. Default is None (all hosts).
+
+        Yields:
+            tuple: (user_agent, host, verdict) for every verdict younger than the TTL.
+        """
+        query = "SELECT user_agent, host, status_code, latency, checked_at FROM verdicts WHERE checked_at >= ?"
+        parameters: tuple = (time.time() - self.ttl,)
+        if host is not None:
+            query += " AND host = ?"
+            parameters += (host.lower(),)
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        for user_agent, row_host, *verdict in rows:
+            yield user_agent, row_host, Verdict(*verdict)
+
+    def evict(self) -> int:
+        """
+        Remove verdicts older than the TTL and trim the cache to `max_entries`.
+
+        Returns:
+            int: The number of verdicts removed.
+        """
+        with self._lock, self._connection:
+            removed = self._connection.execute(
+                "DELETE FROM verdicts WHERE checked_at < ?", (time.time() - self.ttl,)).rowcount
+            if self.max_entries is not None:
+                # Keep only the most recent verdicts
+                removed += self._connection.execute(
+                    "DELETE FROM verdicts WHERE rowid NOT IN "
+                    "(SELECT rowid FROM verdicts ORDER BY checked_at DESC LIMIT ?)",
+                    (self.max_entries,),
+                ).rowcount
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Evict stale verdicts and close the database.
+        """
+        self.evict()
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> 'VerdictCache':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,290 @@
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Device classes reported by `parse_user_agent`
+DEVICE_CLASSES = ('desktop', 'mobile', 'tablet', 'bot', 'unknown')
+
+# Product tokens that identify a browser, mapped to the browser family, in order of precedence:
+# most browsers also carry the tokens of the engine they are built on ("Chrome", "Safari")
+BROWSER_TOKENS = (
+    ('Edg', 'Edge'),
+    ('EdgA', 'Edge'),
+    ('EdgiOS', 'Edge'),
+    ('Edge', 'Edge'),
+    ('OPR', 'Opera'),
+    ('Opera', 'Opera'),
+    ('SamsungBrowser', 'Samsung Internet'),
+    ('YaBrowser', 'Yandex'),
+    ('UCBrowser', 'UC Browser'),
+    ('CriOS', 'Chrome'),
+    ('Chromium', 'Chromium'),
+    ('Chrome', 'Chrome'),
+    ('FxiOS', 'Firefox'),
+    ('Firefox', 'Firefox'),
+    ('MSIE', 'IE'),
+    ('Trident', 'IE'),
+    ('Safari', 'Safari'),
+)
+
+# All product tokens with their major version, found in a single scan of the user agent
+_PRODUCT = re.compile(r'\b(' + '|'.join(sorted({token for token, _ in BROWSER_TOKENS} | {'Version'},
+                                              key=len, reverse=True)) + r')[/ ](\d+)')
+
+# Internet Explorer 11 reports its version as "rv:11.0" next to the Trident token
+_IE_REVISION = re.compile(r'\brv:(\d+)')
+
+# Operating systems, in order of precedence: Android agents also say "Linux" and iOS agents "Mac OS X"
+OS_PATTERNS = (
+    ('Windows Phone', re.compile(r'Windows Phone')),
+    ('Windows', re.compile(r'Windows')),
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Android', re.compile(r'Android')),
+    ('ChromeOS', re.compile(r'CrOS')),
+    ('macOS', re.compile(r'Macintosh|Mac OS X')),
+    ('Linux', re.compile(r'Linux|X11')),
+)
+
+# Crawlers, monitoring tools and HTTP libraries
+_BOT = re.compile(
+    r'bot\b|crawl|spider|slurp|scrape|archiver|\bfetch|curl/|wget/|python|java/|go-http-client|okhttp|'
+    r'libwww|httpclient|http_request|headless|phantomjs|lighthouse|facebookexternalhit|preview',
+    re.IGNORECASE
+)
+_TABLET = re.compile(r'iPad|Tablet|Kindle|Silk/|PlayBook')
+_MOBILE = re.compile(r'Mobi|iPhone|iPod|Windows Phone|BlackBerry|Opera Mini|IEMobile')
+
+# A user agent starts with a product token such as "Mozilla/5.0"
+_PRODUCT_PREFIX = re.compile(r'[\w.!#$%&\'*+^`|~-]+/\S')
+
+
+class ParsedAgent(NamedTuple):
+    """
+    The fields extracted from a user agent by `parse_user_agent`.
+
+    Attributes:
+        browser (str or None): The browser family, e.g. 'Chrome', 'Firefox', 'Safari' or 'IE'.
+        version (int or None): The major version of the browser.
+        os (str or None): The operating system, e.g. 'Windows', 'macOS', 'Android' or 'iOS'.
+        device (str): The device class, one of `DEVICE_CLASSES`.
+        malformed (bool): True if the user agent does not start with a product token or has
+                          unbalanced parentheses, as truncated user agents do.
+    """
+    browser: Optional[str]
+    version: Optional[int]
+    os: Optional[str]
+    device: str
+    malformed: bool
+
+
+def parse_user_agent(user_agent: str) -> ParsedAgent:
+    """
+    Extract the browser family, major version, operating system and device class of a user agent.
+
+    Parsing is offline and uses a handful of precompiled patterns; the product tokens are found
+    in a single scan of the string.
+
+    Args:
+        user_agent (str): The user agent string.
+
+    Returns:
+        ParsedAgent: The parsed fields. Unknown fields are None.
+    """
+    versions: Dict[str, int] = {}
+    for token, version in _PRODUCT.findall(user_agent):
+        versions.setdefault(token, int(version))
+
+    browser = version = None
+    for token, family in BROWSER_TOKENS:
+        if token in versions:
+            browser, version = family, versions[token]
+            break
+    if browser == 'IE' and 'MSIE' not in versions:
+        revision = _IE_REVISION.search(user_agent)
+        version = int(revision.group(1)) if revision else None
+    elif browser in ('Safari', 'Opera') and 'Version' in versions:
+        # Safari and old Opera put the browser version in a separate "Version/" token
+        version = versions['Version']
+
+    os = None
+    for name, pattern in OS_PATTERNS:
+        if pattern.search(user_agent):
+            os = name
+            break
+
+    if _BOT.search(user_agent):
+        device = 'bot'
+    elif _TABLET.search(user_agent) or (os == 'Android' and 'Mobile' not in user_agent):
+        device = 'tablet'
+    elif _MOBILE.search(user_agent):
+        device = 'mobile'
+    elif os in ('Windows', 'macOS', 'Linux', 'ChromeOS'):
+        device = 'desktop'
+    else:
+        device = 'unknown'
+
+    malformed = not _PRODUCT_PREFIX.match(user_agent) or user_agent.count('(') != user_agent.count(')')
+    return ParsedAgent(browser, version, os, device, malformed)
+
+
+class AgentClassifier:
+    """
+    Rules that reject user agents which are certain to fail, before any request is sent.
+
+    A user agent is rejected if it is shorter than `min_length` or longer than `max_length`
+    characters, if it is malformed (see `ParsedAgent.malformed`), if it belongs to a bot, if its
+    browser is older than the minimum version configured for the family, or if its device class
+    is not one of `devices`. Each rule can be switched off.
+
+    Attributes:
+        min_versions (dict): Minimum major version per browser family.
+        drop_bots (bool): Reject crawlers, monitoring tools and HTTP libraries.
+        drop_malformed (bool): Reject malformed and truncated user agents.
+        devices (frozenset or None): The accepted device classes, or None for all.
+        min_length (int): Minimum length of a user agent.
+        max_length (int): Maximum length of a user agent.
+    """
+
+    # Browser versions older than these are rejected by the default rules
+    DEFAULT_MIN_VERSIONS = {
+        'Chrome': 70,
+        'Edge': 79,
+        'Firefox': 68,
+        'IE': 11,
+        'Opera': 60,
+        'Safari': 12,
+        'Samsung Internet': 10,
+    }
+
+    def __init__(
+        self,
+        min_versions: Optional[Dict[str, int]] = None,
+        drop_bots: bool = True,
+        drop_malformed: bool = True,
+        devices: Optional[Iterable[str]] = None,
+        min_length: int = 20,
+        max_length: int = 1024
+    ):
+        """
+        Initialize the classifier.
+
+        Args:
+            min_versions (dict, optional): Minimum major version per browser family. Default is None
+                                           (`DEFAULT_MIN_VERSIONS`); pass {} to accept every version.
+            drop_bots (bool, optional): Reject crawlers, monitoring tools and HTTP libraries. Default is True.
+            drop_malformed (bool, optional): Reject malformed and truncated user agents. Default is True.
+            devices (iterable, optional): Accept only these device classes. Default is None (all).
+            min_length (int, optional): Minimum length of a user agent. Default is 20.
+            max_length (int, optional): Maximum length of a user agent. Default is 1024.
+        """
+        if devices is not None:
+            unknown = set(devices) - set(DEVICE_CLASSES)
+            if unknown:
+                raise ValueError(f"unknown device classes: {', '.join(sorted(unknown))}")
+        self.min_versions = dict(self.DEFAULT_MIN_VERSIONS if min_versions is None else min_versions)
+        self.drop_bots = drop_bots
+        self.drop_malformed = drop_malformed
+        self.devices = frozenset(devices) if devices is not None else None
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def reject_reason(self, user_agent: str) -> Optional[str]:
+        """
+        Check a user agent against the rules.
+
+        Args:
+            user_agent (str): The user agent string.
+
+        Returns:
+            str or None: Why the user agent is rejected ('length', 'malformed', 'bot', 'outdated'
+                         or 'device'), or None if it passes every rule.
+        """
+        if not self.min_length <= len(user_agent) <= self.max_length:
+            return 'length'
+        parsed = parse_user_agent(user_agent)
+        if self.drop_malformed and parsed.malformed:
+            return 'malformed'
+        if self.drop_bots and parsed.device == 'bot':
+            return 'bot'
+        minimum = self.min_versions.get(parsed.browser)
+        if minimum is not None and parsed.version is not None and parsed.version < minimum:
+            return 'outdated'
+        if self.devices is not None and parsed.device not in self.devices:
+            return 'device'
+        return None
+
+    def accepts(self, user_agent: str) -> bool:
+        """
+        Return True if a user agent passes every rule.
+
+        Args:
+            user_agent (str): The user agent string.
+
+        Returns:
+            bool: True if the user agent is worth testing.
+        """
+        return self.reject_reason(user_agent) is None
+
+
+class ClassifyStats:
+    """
+    Counters collected by `classify_user_agents`.
+
+    Attributes:
+        total (int): Number of user agents read.
+        passed (int): Number of user agents passed on for testing.
+        rejected (Counter): Number of rejected user agents per reason.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.passed = 0
+        self.rejected: Counter = Counter()
+
+    @property
+    def requests_saved(self) -> int:
+        """int: Number of HTTP requests avoided by rejecting user agents."""
+        return sum(self.rejected.values())
+
+    def __repr__(self) -> str:
+        return f"ClassifyStats(total={self.total}, passed={self.passed}, rejected={dict(self.rejected)})"
+
+
+def classify_user_agents(
+    agents: Iterable[Tuple[int, str]],
+    classifier: Optional[AgentClassifier] = None,
+    stats: Optional[ClassifyStats] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Drop user agents that fail the classifier's rules from a stream.
+
+    Like `dedupe_user_agents`, the stage is a single linear pass and does no network I/O.
+
+    Args:
+        agents (iterable): (line_index, user_agent) pairs, as produced by `iter_user_agents`.
+        classifier (AgentClassifier, optional): The rules to apply. Default is None (the default rules).
+        stats (ClassifyStats, optional): Counters to update. Default is None (a new instance is used).
+
+    Yields:
+        tuple: (line_index, user_agent) for every user agent that passes the rules.
+    """
+    if classifier is None:
+        classifier = AgentClassifier()
+    if stats is None:
+        stats = ClassifyStats()
+
+    for index, user_agent in agents:
+        stats.total += 1
+        reason = classifier.reject_reason(user_agent)
+        if reason is not None:
+            stats.rejected[reason] += 1
+            logger.debug("Skipping User-Agent '%s': %s.", user_agent, reason)
+            continue
+        stats.passed += 1
+        yield index, user_agent
+
+    logger.info("Classification: %d of %d user agents passed the rules, %d requests saved.",
+                stats.passed, stats.total, stats.requests_saved)
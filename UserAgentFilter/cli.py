@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import threading
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from .cache import VerdictCache
+from .classifier import DEVICE_CLASSES, AgentClassifier, classify_user_agents
+from .content import BlockDetector
+from .log import configure_logging, shutdown_logging
+from .metrics import CheckResult, MetricsAggregator
+from .predictor import VerdictPredictor
+from .preprocess import dedupe_user_agents
+from .ratelimit import HostRateLimiter
+from .retry import RetryPolicy
+from .streaming import iter_user_agents
+from .tester import UserAgentTester
+from .transport import HTTPXTransport
+
+logger = logging.getLogger(__name__)
+
+# Output formats of the command-line interface
+FORMATS = ('plain', 'jsonl')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the argument parser of the command-line interface.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog='useragentfilter',
+        description='Test user agents against a website and print the ones it accepts.',
+        epilog='Accepted user agents are printed as soon as they are known, in input order (with --target, '
+               'once the target is reached, in the order they were tested). '
+               'The exit status is 0 if at least one user agent was accepted and 1 otherwise.'
+    )
+    parser.add_argument('input', nargs='?', default='-',
+                        help="file with one user agent per line, optionally gzip-compressed (default: '-', standard input)")
+    parser.add_argument('--url', required=True, help='URL to test the user agents against')
+    parser.add_argument('-o', '--output', default='-', help="file to write the results to (default: '-', standard output)")
+    parser.add_argument('--format', choices=FORMATS, default='plain',
+                        help='plain: one accepted user agent per line; jsonl: one JSON object per line with '
+                             'the status code, latency and block signature of the last request (default: plain)')
+    parser.add_argument('--all', action='store_true', help='with --format jsonl, also print rejected user agents')
+
+    testing = parser.add_argument_group('testing')
+    testing.add_argument('-c', '--concurrency', type=int, default=1,
+                         help='number of checks running at the same time (default: 1)')
+    testing.add_argument('--processes', type=int, default=1,
+                         help='number of worker processes the input is sharded across; needs an input and an '
+                              'output file and plain output (default: 1)')
+    testing.add_argument('--probe-mode', choices=UserAgentTester.PROBE_MODES, default='get',
+                         help='how much of each response is downloaded (default: get)')
+    testing.add_argument('--probe-bytes', type=int, default=1024,
+                         help="body bytes read with --probe-mode capped (default: 1024)")
+    testing.add_argument('--http2', action='store_true',
+                         help='send requests over multiplexed HTTP/2 connections (needs the http2 extra: '
+                              'pip install UserAgentFilter[http2])')
+    testing.add_argument('--timeout', type=float, default=10, help='request timeout in seconds (default: 10)')
+    testing.add_argument('--retries', type=int, default=3,
+                         help='attempts per user agent on timeouts, connection errors, throttling and server '
+                              'errors (default: 3)')
+    testing.add_argument('--backoff', type=float, default=0.5,
+                         help='jittered wait before the first retry in seconds, doubled after every retry '
+                              '(default: 0.5)')
+    testing.add_argument('--retry-budget', type=float, metavar='SECONDS',
+                         help='maximum time spent retrying one user agent')
+    testing.add_argument('--delay', type=float, nargs=2, default=(3, 8), metavar=('MIN', 'MAX'),
+                         help='random delay between the requests of one worker to the same host in seconds (default: 3 8)')
+    testing.add_argument('--rate', type=float,
+                         help='adaptive per-host rate limit in requests per second, replacing --delay')
+    testing.add_argument('--dedupe', action='store_true', help='normalize user agents and skip duplicates')
+    testing.add_argument('--classify', action='store_true',
+                         help='skip malformed, bot and outdated user agents without testing them')
+    testing.add_argument('--device', action='append', choices=DEVICE_CLASSES, metavar='CLASS',
+                         help=f"only test user agents of this device class ({', '.join(DEVICE_CLASSES)}); "
+                              f"repeat for several; implies --classify")
+    testing.add_argument('--detect-blocks', action='store_true',
+                         help='reject 200 responses that start like a captcha or robot-check page')
+    testing.add_argument('--block-signature', action='append', metavar='PHRASE',
+                         help='phrase that marks a block page of the target site; repeat for several; '
+                              'implies --detect-blocks')
+    testing.add_argument('--block-vendor-markers', action='store_true',
+                         help='also treat bot-protection script markers (e.g. datadome, px-captcha) as block pages; '
+                              'only for sites whose normal pages do not load them; implies --detect-blocks')
+
+    network = parser.add_argument_group('proxies and cache')
+    network.add_argument('--proxy', action='append', default=[], metavar='URL',
+                         help='proxy URL; repeat to use a health-scored pool of proxies')
+    network.add_argument('--proxy-file', help='file with one proxy URL per line, added to the pool')
+    network.add_argument('--cache', metavar='PATH', help='SQLite verdict cache; fresh verdicts are not tested again')
+    network.add_argument('--cache-ttl', type=float, default=86400,
+                         help='seconds a cached verdict stays fresh (default: 86400)')
+
+    search = parser.add_argument_group('finding a few good user agents')
+    search.add_argument('--target', type=int, metavar='N',
+                        help='stop once N user agents were accepted, testing the ones most likely to pass first')
+    search.add_argument('--model', metavar='PATH',
+                        help='with --target, load the per-host verdict model from this file and save it back')
+
+    run = parser.add_argument_group('batch runs')
+    run.add_argument('--checkpoint', help='checkpoint file used to resume an interrupted run; needs an input and an '
+                                          'output file and plain output')
+    run.add_argument('--metrics', metavar='PATH',
+                     help='write request metrics (status codes, latency percentiles, per-proxy stats) to a file')
+    run.add_argument('--metrics-format', choices=('json', 'prometheus'), default='json',
+                     help='format of the --metrics file (default: json)')
+    verbosity = run.add_mutually_exclusive_group()
+    verbosity.add_argument('-q', '--quiet', action='store_true', help='only log warnings and errors')
+    verbosity.add_argument('-v', '--verbose', action='store_true', help='also log the outcome of every user agent')
+    return parser
+
+
+class _LastAttempts:
+    """
+    Keeps the last request attempt of each check until its result is printed.
+
+    Streamed checks are keyed by their input index through `record`, so duplicate user agents keep
+    their own attempts. Called as a check hook, the instance keys attempts by user agent; `--target`
+    runs do that, as they check every user agent once.
+    """
+
+    def __init__(self):
+        self._attempts: Dict[Union[int, str], CheckResult] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, result: CheckResult) -> None:
+        self.record(result.user_agent, result)
+
+    def record(self, key: Union[int, str], result: CheckResult) -> None:
+        with self._lock:
+            self._attempts[key] = result
+
+    def pop(self, key: Union[int, str]) -> Optional[CheckResult]:
+        with self._lock:
+            return self._attempts.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._attempts.clear()
+
+
+def _read_agents(source: str) -> Iterator[Tuple[int, str]]:
+    """
+    Read (line_index, user_agent) pairs from a file or, for '-', from standard input.
+    """
+    if source != '-':
+        yield from iter_user_agents(source)
+        return
+    for index, line in enumerate(sys.stdin):
+        user_agent = line.strip()
+        if user_agent:
+            yield index, user_agent
+
+
+def _read_proxies(args: argparse.Namespace) -> List[str]:
+    proxies = list(args.proxy)
+    if args.proxy_file:
+        with open(args.proxy_file, 'r') as f:
+            proxies.extend(line.strip() for line in f if line.strip())
+    return proxies
+
+
+async def _stream(
+    tester: UserAgentTester,
+    agents: Iterator[Tuple[int, str]],
+    out: IO[str],
+    args: argparse.Namespace,
+    attempts: Optional[_LastAttempts] = None
+) -> int:
+    """
+    Test user agents concurrently and print the results as they become known.
+
+    Returns:
+        int: The number of accepted user agents.
+    """
+    accepted = 0
+    results = tester.aiter_check_user_agents(agents, args.concurrency,
+                                             attempt_hook=attempts.record if attempts is not None else None)
+    try:
+        async for index, user_agent, success in results:
+            accepted += success
+            _write_result(tester, user_agent, success, out, args, attempts.pop(index) if attempts is not None else None)
+    finally:
+        await results.aclose()
+    return accepted
+
+
+def _write_result(
+    tester: UserAgentTester,
+    user_agent: str,
+    success: bool,
+    out: IO[str],
+    args: argparse.Namespace,
+    attempt: Optional[CheckResult] = None
+) -> None:
+    """
+    Print the result of one check in the output format, with the last request attempt of the check.
+    """
+    if args.format == 'plain':
+        if success:
+            out.write(user_agent + '\n')
+    elif success or args.all:
+        record = {'user_agent': user_agent, 'accepted': success, 'status_code': None, 'latency': None, 'blocked': None}
+        if attempt is not None:
+            # The last attempt of the check; a transport failure has no status code
+            latency = attempt.ttfb if attempt.ttfb is not None else attempt.total
+            record.update(status_code=attempt.status_code, latency=round(latency, 6), blocked=attempt.blocked)
+        elif tester.cache is not None:
+            # No request was sent: the verdict came from the --cache file
+            verdict = tester.cache.get(user_agent, urlparse(tester.test_url).netloc)
+            if verdict is not None:
+                record.update(status_code=verdict.status_code, latency=round(verdict.latency, 6))
+        out.write(json.dumps(record) + '\n')
+    out.flush()
+
+
+def _find(
+    tester: UserAgentTester,
+    agents: Iterator[Tuple[int, str]],
+    out: IO[str],
+    args: argparse.Namespace,
+    attempts: Optional[_LastAttempts] = None
+) -> int:
+    """
+    Test the user agents most likely to pass first until `--target` of them were accepted.
+
+    Returns:
+        int: The number of accepted user agents.
+    """
+    predictor = VerdictPredictor()
+    if args.model:
+        try:
+            predictor = VerdictPredictor.load(args.model)
+        except FileNotFoundError:
+            logger.info("No model at %s yet, starting a new one.", args.model)
+    if args.cache:
+        predictor.learn_from_cache(tester.cache, urlparse(tester.test_url).netloc)
+
+    try:
+        found = tester.find_user_agents((user_agent for _, user_agent in agents), args.target, predictor,
+                                        args.concurrency, extra_hooks=(attempts,) if attempts is not None else ())
+        for user_agent in found:
+            _write_result(tester, user_agent, True, out, args, attempts.pop(user_agent) if attempts is not None else None)
+    finally:
+        if attempts is not None:
+            # Only the accepted agents are printed; drop the attempts of the rejected ones
+            attempts.clear()
+    if args.model:
+        predictor.save(args.model)
+    return len(found)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the command-line interface.
+
+    Args:
+        argv (list, optional): The arguments, without the program name. Default is None (`sys.argv`).
+
+    Returns:
+        int: The exit status: 0 if at least one user agent was accepted, 1 otherwise.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if args.processes < 1:
+        parser.error('--processes must be at least 1')
+    if (args.detect_blocks or args.block_signature or args.block_vendor_markers) and args.probe_mode in ('head', 'stream'):
+        parser.error("--detect-blocks needs --probe-mode get or capped")
+    if args.retries < 1 or args.backoff < 0:
+        parser.error('--retries must be at least 1 and --backoff must not be negative')
+    batch = args.processes > 1 or args.checkpoint
+    if batch and ('-' in (args.input, args.output) or args.format != 'plain'):
+        parser.error('--processes and --checkpoint need an input file, an output file and --format plain')
+    if args.target is not None and (args.target < 1 or batch):
+        parser.error('--target must be at least 1 and cannot be combined with --processes or --checkpoint')
+    if args.model and args.target is None:
+        parser.error('--model needs --target')
+    if args.metrics and args.processes > 1:
+        parser.error('--metrics cannot be combined with --processes')
+    # Log to standard error from a background thread so checks never wait on the terminal. Worker
+    # processes cannot reach that thread's queue, so sharded runs write directly
+    configure_logging(logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO,
+                      use_queue=args.processes == 1)
+    try:
+        return _run(parser, args)
+    finally:
+        shutdown_logging()
+
+
+def _run(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    """
+    Run the filtering described by the parsed arguments.
+
+    Returns:
+        int: The exit status.
+    """
+    try:
+        proxies = _read_proxies(args)
+    except IOError as e:
+        parser.error(f"cannot read the proxy file: {e}")
+    cache = VerdictCache(args.cache, ttl=args.cache_ttl) if args.cache else None
+    metrics = MetricsAggregator() if args.metrics else None
+    # The JSON output takes the status code and latency of each check from its last attempt
+    attempts = _LastAttempts() if args.format == 'jsonl' else None
+    rate_limiter = HostRateLimiter(rate=args.rate, max_rate=max(args.rate, 10.0)) if args.rate else None
+    classifier = AgentClassifier(devices=args.device) if args.classify or args.device else None
+    block_detector = None
+    if args.detect_blocks or args.block_signature or args.block_vendor_markers:
+        block_detector = BlockDetector({urlparse(args.url).netloc: args.block_signature or ()},
+                                       vendor_markers=args.block_vendor_markers)
+    transport = None
+    if args.http2:
+        try:
+            transport = HTTPXTransport()
+        except ImportError as e:
+            parser.error(str(e))
+    retry_policy = RetryPolicy(max_attempts=args.retries, backoff=args.backoff, budget=args.retry_budget)
+
+    tester = UserAgentTester(
+        test_url=args.url,
+        proxy=proxies or None,
+        timeout=args.timeout,
+        max_retries=args.retries,
+        delay_range=tuple(args.delay),
+        cache=cache,
+        dedupe=args.dedupe,
+        rate_limiter=rate_limiter,
+        probe_mode=args.probe_mode,
+        probe_bytes=args.probe_bytes,
+        hooks=[metrics] if metrics is not None else None,
+        classifier=classifier,
+        retry_policy=retry_policy,
+        block_detector=block_detector,
+        transport=transport
+    )
+    try:
+        with tester:
+            if args.processes > 1:
+                return 0 if tester.filter_user_agents_sharded(
+                    args.input, args.output, processes=args.processes, checkpoint_file=args.checkpoint) else 1
+            if args.checkpoint:
+                return 0 if asyncio.run(tester.afilter_user_agents(
+                    args.input, args.output, concurrency=args.concurrency, checkpoint_file=args.checkpoint)) else 1
+
+            agents = _read_agents(args.input)
+            if args.dedupe:
+                agents = dedupe_user_agents(agents)
+            if classifier is not None:
+                agents = classify_user_agents(agents, classifier)
+            out = sys.stdout if args.output == '-' else open(args.output, 'w')
+            try:
+                if args.target is not None:
+                    accepted = _find(tester, agents, out, args, attempts)
+                else:
+                    accepted = asyncio.run(_stream(tester, agents, out, args, attempts))
+            except FileNotFoundError:
+                logger.error("Error: The file '%s' was not found.", args.input)
+                return 1
+            except BrokenPipeError:
+                # The reader went away (e.g. `| head`); stop quietly
+                return 0
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+            return 0 if accepted else 1
+    finally:
+        if cache is not None:
+            cache.close()
+        if metrics is not None:
+            metrics.export(args.metrics, args.metrics_format)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import logging
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Phrases that only appear on the captcha, robot-check and bot-wall pages that common sites and
+# bot-protection services serve with a 200 status. Matching is case-insensitive
+DEFAULT_BLOCK_SIGNATURES = (
+    # Amazon's robot check
+    '/errors/validatecaptcha',
+    'type the characters you see in this image',
+    'enter the characters you see below',
+    # Generic wording
+    'robot check',
+    'are you a robot',
+    "i'm not a robot",
+    'verify you are human',
+    'unusual traffic from your computer network',
+    '<title>access denied</title>',
+    # Interstitial pages of bot-protection services
+    '<title>just a moment...</title>',
+    'attention required! | cloudflare',
+    'checking your browser before accessing',
+    'access to this page has been denied',
+    'incapsula incident id',
+)
+
+# Markers of bot-protection vendor scripts. Challenge pages contain them, but so do ordinary pages
+# of sites that load those scripts, so they are only searched when asked for
+VENDOR_BLOCK_SIGNATURES = (
+    'cf-browser-verification',
+    '/cdn-cgi/challenge-platform/',
+    'px-captcha',
+    'distil_r_captcha',
+    'datadome',
+)
+
+# Status code recorded in the verdict cache for a block page that was served with a 200
+BLOCK_PAGE_STATUS = 403
+
+
+class SignatureMatcher:
+    """
+    An Aho-Corasick automaton that finds any of a set of byte patterns in a single pass.
+
+    The automaton is compiled once into a deterministic transition table, so a search reads each
+    byte of the text exactly once whatever the number of patterns. Patterns and text are compared
+    case-insensitively (ASCII only).
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Compile the automaton.
+
+        Args:
+            patterns (iterable): The patterns to search for. Empty patterns are ignored.
+        """
+        self.patterns = tuple(dict.fromkeys(pattern for pattern in patterns if pattern))
+        # Per state: byte -> next state; state 0 is the root
+        goto: List[Dict[int, int]] = [{}]
+        # Per state: the pattern that ends there (or at its longest suffix that is a state), if any
+        output: List[Optional[str]] = [None]
+        for pattern in self.patterns:
+            state = 0
+            for byte in pattern.lower().encode('utf-8'):
+                next_state = goto[state].get(byte)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][byte] = next_state
+                    goto.append({})
+                    output.append(None)
+                state = next_state
+            if output[state] is None:
+                output[state] = pattern
+
+        # Breadth-first pass: compute the failure links and fold them into the transition table,
+        # turning the trie into a DFA that never needs to follow a failure link while searching
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            if output[state] is None:
+                output[state] = output[fail[state]]
+            for byte, next_state in list(goto[state].items()):
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and byte not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(byte, 0)
+                fail[next_state] = target if target != next_state else 0
+            # Inherit the transitions of the failure state that this state does not define itself
+            if state:
+                for byte, next_state in goto[fail[state]].items():
+                    goto[state].setdefault(byte, next_state)
+        self._goto = goto
+        self._output = output
+
+    def search(self, data: bytes) -> Optional[str]:
+        """
+        Find the first pattern that occurs in `data`.
+
+        Args:
+            data (bytes): The text to search.
+
+        Returns:
+            str or None: The pattern whose occurrence ends first, or None if there is none.
+        """
+        goto = self._goto
+        output = self._output
+        state = 0
+        for byte in data.lower():
+            state = goto[state].get(byte, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+
+class BlockDetector:
+    """
+    Recognize block pages (captchas, robot checks) that are served with a 200 status.
+
+    Only the first `max_bytes` bytes of a response body are searched, with one precompiled
+    `SignatureMatcher` per host; the body is never parsed as HTML. A host is matched by the
+    signatures registered for it or for any of its parent domains (signatures for 'amazon.com'
+    also apply to 'www.amazon.com'), plus `DEFAULT_BLOCK_SIGNATURES` unless `defaults` is False
+    and `VENDOR_BLOCK_SIGNATURES` if `vendor_markers` is True.
+
+    The detector is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        signatures: Optional[Dict[str, Iterable[str]]] = None,
+        defaults: bool = True,
+        max_bytes: int = 4096,
+        vendor_markers: bool = False
+    ):
+        """
+        Initialize the detector.
+
+        Args:
+            signatures (dict, optional): Block signatures per host. Default is None (no host signatures).
+            defaults (bool, optional): Also search every host for `DEFAULT_BLOCK_SIGNATURES`. Default is True.
+            max_bytes (int, optional): Number of body bytes searched. Default is 4096.
+            vendor_markers (bool, optional): Also search every host for `VENDOR_BLOCK_SIGNATURES`. Only use this
+                                             for sites whose normal pages do not load those scripts. Default is False.
+        """
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        self.defaults = defaults
+        self.vendor_markers = vendor_markers
+        self.max_bytes = max_bytes
+        self._signatures: Dict[str, List[str]] = {}
+        # Compiled matchers by host; rebuilt lazily after `add`
+        self._matchers: Dict[str, SignatureMatcher] = {}
+        for host, patterns in (signatures or {}).items():
+            self.add(host, patterns)
+
+    def add(self, host: str, patterns: Iterable[str]) -> None:
+        """
+        Register block signatures for a host and its subdomains.
+
+        Args:
+            host (str): The host, e.g. 'amazon.com'.
+            patterns (iterable): Phrases that only appear on the host's block pages.
+        """
+        self._signatures.setdefault(host.lower(), []).extend(patterns)
+        self._matchers = {}
+
+    def matcher(self, host: str) -> SignatureMatcher:
+        """
+        Return the compiled matcher for a host.
+
+        Args:
+            host (str): The host (network location) of the tested URL.
+
+        Returns:
+            SignatureMatcher: The matcher for the host's signatures.
+        """
+        host = host.lower()
+        matcher = self._matchers.get(host)
+        if matcher is None:
+            patterns = list(DEFAULT_BLOCK_SIGNATURES) if self.defaults else []
+            if self.vendor_markers:
+                patterns += VENDOR_BLOCK_SIGNATURES
+            name = host.rsplit(':', 1)[0] if not host.endswith(']') else host
+            labels = name.split('.')
+            for start in range(len(labels)):
+                patterns += self._signatures.get('.'.join(labels[start:]), ())
+            if name != host:
+                patterns += self._signatures.get(host, ())
+            matcher = self._matchers[host] = SignatureMatcher(patterns)
+        return matcher
+
+    def detect(self, host: str, body: bytes) -> Optional[str]:
+        """
+        Search the start of a response body for a block signature.
+
+        Args:
+            host (str): The host (network location) of the tested URL.
+            body (bytes): The response body, or a prefix of it.
+
+        Returns:
+            str or None: The matching signature, or None if the body does not look like a block page.
+        """
+        return self.matcher(host).search(body[:self.max_bytes])
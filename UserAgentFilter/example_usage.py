@@ -1,5 +1,7 @@
-from selector import GetUserAgent
-from tester  import UserAgentTester
+from UserAgentFilter.content import BlockDetector
+from UserAgentFilter.log import configure_logging
+from UserAgentFilter.selector import GetUserAgent
+from UserAgentFilter.tester import UserAgentTester
 import requests
 from bs4 import BeautifulSoup
 
@@ -31,6 +33,9 @@ def scrape_amazon_product_links(url, headers):
 
 
 
+# Show the package's progress messages
+configure_logging()
+
 # Initialize the GetUserAgent class with the file path to user agents
 user_agent_selector = GetUserAgent(file_path="UserAgentFilter/text_file/user_agents.txt")
 
@@ -43,13 +48,14 @@ urls = [
 # Define the number of user agents to test
 number_of_agents = 5
 
-# Select and test user agents
-user_agent_selector.test_user_agents(number=number_of_agents, test_url=urls[0])
+# Select user agents and test each of them against every URL in one pass. Amazon answers blocked
+# user agents with a robot-check page and a 200 status, so the start of each page is checked too
+user_agent_selector.test_user_agents_matrix(number=number_of_agents, urls=urls, block_detector=BlockDetector())
 
-# Scrape product links from each URL using random successful user agents
+# Scrape product links from each URL using a random user agent that was accepted by that URL
 for url in urls:
     headers = {
-        "User-Agent": user_agent_selector.get_random_user_agent()
+        "User-Agent": user_agent_selector.get_random_user_agent(url)
     }
     product_links = scrape_amazon_product_links(url, headers)
     print(f"Scraped {len(product_links)} product links from {url}")
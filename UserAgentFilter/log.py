@@ -0,0 +1,156 @@
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Tuple
+
+# Name of the package logger; every module logs to a child of it
+PACKAGE_LOGGER = 'UserAgentFilter'
+
+# Format used by `configure_logging`
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Handler and listener installed by the last `configure_logging` call
+_installed: Optional[Tuple[logging.Handler, Optional[QueueListener]]] = None
+_installed_lock = threading.Lock()
+
+
+def configure_logging(
+    level: int = logging.INFO,
+    handler: Optional[logging.Handler] = None,
+    use_queue: bool = False
+) -> logging.Logger:
+    """
+    Send the package's log records to a handler, for scripts and the command-line interface.
+
+    The package only installs a `NullHandler`, so applications that configure logging themselves
+    keep full control. This helper is the opt-in replacement for the `logging.basicConfig` call
+    the tester used to make at import time. Calling it again replaces the previous configuration.
+
+    With `use_queue`, records are put on an in-memory queue and written by a background thread,
+    so worker threads never block on a slow terminal or log file.
+
+    Args:
+        level (int, optional): The level of the package logger. Default is `logging.INFO`.
+        handler (logging.Handler, optional): Where to write records. Default is None (standard
+                                             error, in the format of `LOG_FORMAT`).
+        use_queue (bool, optional): Write records from a background thread. Default is False.
+
+    Returns:
+        logging.Logger: The package logger.
+    """
+    global _installed
+    if handler is None:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    package_logger = logging.getLogger(PACKAGE_LOGGER)
+    with _installed_lock:
+        _uninstall(package_logger)
+        listener = None
+        if use_queue:
+            listener = QueueListener(queue.SimpleQueue(), handler, respect_handler_level=True)
+            installed_handler: logging.Handler = QueueHandler(listener.queue)
+            listener.start()
+        else:
+            installed_handler = handler
+        package_logger.addHandler(installed_handler)
+        package_logger.setLevel(level)
+        _installed = (installed_handler, listener)
+    return package_logger
+
+
+def shutdown_logging() -> None:
+    """
+    Remove the handler installed by `configure_logging`, writing out any queued records first.
+    """
+    with _installed_lock:
+        _uninstall(logging.getLogger(PACKAGE_LOGGER))
+
+
+def _uninstall(package_logger: logging.Logger) -> None:
+    global _installed
+    if _installed is None:
+        return
+    handler, listener = _installed
+    package_logger.removeHandler(handler)
+    if listener is not None:
+        # Stopping the listener writes the records still in the queue
+        listener.stop()
+    _installed = None
+
+
+class ProgressReporter:
+    """
+    Log aggregated progress instead of one line per user agent.
+
+    A progress line is logged at INFO level after every `every` user agents, or when `interval`
+    seconds have passed since the last one, whichever comes first. The reporter is thread-safe.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        every: int = 1000,
+        interval: float = 10.0,
+        total: Optional[int] = None
+    ):
+        """
+        Initialize the reporter.
+
+        Args:
+            logger (logging.Logger): The logger to report to.
+            every (int, optional): Number of user agents between progress lines. Default is 1000.
+            interval (float, optional): Maximum number of seconds between progress lines. Default is 10.
+            total (int, optional): The number of user agents expected, if known. Default is None.
+        """
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        self.logger = logger
+        self.every = every
+        self.interval = interval
+        self.total = total
+        self.tested = 0
+        self.accepted = 0
+        self._started = time.monotonic()
+        self._next_count = every
+        self._next_time = self._started + interval
+        self._reported = 0
+        self._lock = threading.Lock()
+
+    def update(self, success: bool) -> None:
+        """
+        Count a tested user agent and log progress when it is due.
+
+        Args:
+            success (bool): True if the user agent was accepted.
+        """
+        with self._lock:
+            self.tested += 1
+            self.accepted += success
+            if self.tested < self._next_count and time.monotonic() < self._next_time:
+                return
+            self._next_count = self.tested + self.every
+            self._next_time = time.monotonic() + self.interval
+            self._log()
+
+    def finish(self) -> None:
+        """
+        Log the final progress line, unless the last update already did.
+        """
+        with self._lock:
+            if self.tested != self._reported:
+                self._log()
+
+    def _log(self) -> None:
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        self._reported = self.tested
+        rate = self.tested / max(time.monotonic() - self._started, 1e-9)
+        if self.total:
+            self.logger.info("Tested %d of %d user agents (%d accepted, %.1f/s).",
+                             self.tested, self.total, self.accepted, rate)
+        else:
+            self.logger.info("Tested %d user agents (%d accepted, %.1f/s).", self.tested, self.accepted, rate)
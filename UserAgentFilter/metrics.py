@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import random
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Names that moved to `adapters`, which imports requests, so importing this module stays cheap
+_MOVED_TO_ADAPTERS = ('TimedHTTPAdapter', 'connection_timings', 'reset_connection_timings')
+
+
+def __getattr__(name: str):
+    if name in _MOVED_TO_ADAPTERS:
+        from . import adapters
+        return getattr(adapters, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CheckResult(NamedTuple):
+    """
+    The record of a single request attempt made by `UserAgentTester.check_user_agent`.
+
+    Timings are in seconds. `connect` and `tls` are only set when the attempt opened a new
+    connection; a request sent over a reused keep-alive connection has None for both. Name
+    resolution is not measured separately: `dns` is always None and the DNS lookup is included in
+    `connect`. For HTTPS through a proxy, `tls` also includes the CONNECT tunnel setup.
+
+    Attributes:
+        user_agent (str): The user agent that was tested.
+        url (str): The URL the request was sent to.
+        attempt (int): The 0-based attempt number; retries have higher numbers.
+        status_code (int or None): The HTTP status code, or None if the request failed.
+        dns (float or None): Name resolution time (not measured, see above).
+        connect (float or None): TCP connect time, including name resolution.
+        tls (float or None): TLS handshake time.
+        ttfb (float or None): Time from sending the request until the response headers were parsed.
+        total (float): Time the whole attempt took, including reading the body.
+        bytes (int): Number of body bytes received from the network.
+        proxy (str or None): The proxy the request went through.
+        exception (str or None): The class name of the exception, if the request failed.
+        timestamp (float): Unix time when the attempt finished.
+        blocked (str or None): The block signature found in a 200 response's body, if any
+                               (see `UserAgentFilter.content.BlockDetector`).
+    """
+    user_agent: str
+    url: str
+    attempt: int
+    status_code: Optional[int]
+    dns: Optional[float]
+    connect: Optional[float]
+    tls: Optional[float]
+    ttfb: Optional[float]
+    total: float
+    bytes: int
+    proxy: Optional[str]
+    exception: Optional[str]
+    timestamp: float
+    blocked: Optional[str] = None
+
+    @property
+    def accepted(self) -> bool:
+        """bool: True if the user agent was accepted (HTTP status 200 without a block page)."""
+        return self.status_code == 200 and self.blocked is None
+
+
+class MetricsAggregator:
+    """
+    Collect `CheckResult` records into counters, histograms and latency percentiles.
+
+    An aggregator is a hook: pass it to `UserAgentTester(hooks=[...])` or `tester.add_hook`. It is
+    thread-safe. Latency percentiles are computed from a uniform random sample of at most
+    `max_samples` values per phase (exact until that many attempts were recorded), while the
+    Prometheus histograms and all counters cover every attempt.
+    """
+
+    # Upper bounds of the latency histogram buckets, in seconds
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    # Timings summarized by the aggregator
+    PHASES = ('connect', 'tls', 'ttfb', 'total')
+
+    def __init__(self, max_samples: int = 10000):
+        """
+        Initialize the aggregator.
+
+        Args:
+            max_samples (int, optional): Number of values kept per phase for percentiles. Default is 10000.
+        """
+        if max_samples < 1:
+            raise ValueError("max_samples must be at least 1")
+        self.max_samples = max_samples
+        self.attempts = 0
+        self.errors = 0
+        self.bytes = 0
+        self.block_pages = 0
+        self.status_codes: Counter = Counter()
+        self.exceptions: Counter = Counter()
+        # Per proxy: [attempts, errors, total latency]
+        self.proxies: Dict[str, List[float]] = {}
+        self._seen = {phase: 0 for phase in self.PHASES}
+        self._sums = {phase: 0.0 for phase in self.PHASES}
+        self._samples: Dict[str, List[float]] = {phase: [] for phase in self.PHASES}
+        self._buckets = {phase: [0] * len(self.BUCKETS) for phase in self.PHASES}
+        self._lock = threading.Lock()
+
+    def __call__(self, result: CheckResult) -> None:
+        """
+        Record an attempt.
+
+        Args:
+            result (CheckResult): The attempt to record.
+        """
+        with self._lock:
+            self.attempts += 1
+            self.bytes += result.bytes
+            if result.exception is not None:
+                self.errors += 1
+                self.exceptions[result.exception] += 1
+            if result.status_code is not None:
+                self.status_codes[result.status_code] += 1
+            if result.blocked is not None:
+                self.block_pages += 1
+            if result.proxy is not None:
+                stats = self.proxies.setdefault(result.proxy, [0, 0, 0.0])
+                stats[0] += 1
+                stats[1] += result.exception is not None
+                stats[2] += result.total
+            for phase in self.PHASES:
+                value = getattr(result, phase)
+                if value is not None:
+                    self._observe(phase, value)
+
+    def _observe(self, phase: str, value: float) -> None:
+        self._seen[phase] += 1
+        self._sums[phase] += value
+        for index, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                self._buckets[phase][index] += 1
+                break
+        # Reservoir sampling keeps a uniform sample of every value seen so far
+        samples = self._samples[phase]
+        if len(samples) < self.max_samples:
+            samples.append(value)
+        else:
+            slot = random.randrange(self._seen[phase])
+            if slot < self.max_samples:
+                samples[slot] = value
+
+    def percentile(self, q: float, phase: str = 'total') -> Optional[float]:
+        """
+        Return a latency percentile.
+
+        Args:
+            q (float): The percentile, from 0 to 100.
+            phase (str, optional): One of `PHASES`. Default is 'total'.
+
+        Returns:
+            float or None: The latency in seconds, or None if nothing was recorded for the phase.
+        """
+        with self._lock:
+            samples = sorted(self._samples[phase])
+        if not samples:
+            return None
+        # Nearest-rank percentile
+        rank = max(1, min(len(samples), int(-(-q * len(samples) // 100))))
+        return samples[rank - 1]
+
+    def summary(self) -> dict:
+        """
+        Summarize everything recorded so far.
+
+        Returns:
+            dict: Attempt, error, block page and byte counts, the status code and exception histograms, latency
+                  percentiles per phase and per-proxy statistics.
+        """
+        latency = {}
+        for phase in self.PHASES:
+            with self._lock:
+                seen, total = self._seen[phase], self._sums[phase]
+            if seen:
+                latency[phase] = {
+                    'count': seen,
+                    'mean': total / seen,
+                    'p50': self.percentile(50, phase),
+                    'p90': self.percentile(90, phase),
+                    'p99': self.percentile(99, phase),
+                    'max': self.percentile(100, phase),
+                }
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'errors': self.errors,
+                'block_pages': self.block_pages,
+                'bytes': self.bytes,
+                'status_codes': {str(code): count for code, count in sorted(self.status_codes.items())},
+                'exceptions': dict(sorted(self.exceptions.items())),
+                'latency': latency,
+                'proxies': {
+                    proxy: {'attempts': attempts, 'errors': errors, 'mean_latency': total / attempts}
+                    for proxy, (attempts, errors, total) in sorted(self.proxies.items())
+                },
+            }
+
+    def to_json(self) -> str:
+        """
+        Return the summary as a JSON document.
+
+        Returns:
+            str: The JSON text.
+        """
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Return the counters and histograms in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text, e.g. for the node exporter's textfile collector.
+        """
+        lines = [
+            '# HELP useragentfilter_attempts_total Request attempts made.',
+            '# TYPE useragentfilter_attempts_total counter',
+        ]
+        with self._lock:
+            lines.append(f'useragentfilter_attempts_total {self.attempts}')
+            lines += [
+                '# HELP useragentfilter_response_bytes_total Response body bytes received.',
+                '# TYPE useragentfilter_response_bytes_total counter',
+                f'useragentfilter_response_bytes_total {self.bytes}',
+                '# HELP useragentfilter_block_pages_total Block pages served with status 200.',
+                '# TYPE useragentfilter_block_pages_total counter',
+                f'useragentfilter_block_pages_total {self.block_pages}',
+                '# HELP useragentfilter_responses_total Responses by HTTP status code.',
+                '# TYPE useragentfilter_responses_total counter',
+            ]
+            lines += [f'useragentfilter_responses_total{{code="{code}"}} {count}'
+                      for code, count in sorted(self.status_codes.items())]
+            lines += [
+                '# HELP useragentfilter_errors_total Failed attempts by exception class.',
+                '# TYPE useragentfilter_errors_total counter',
+            ]
+            lines += [f'useragentfilter_errors_total{{exception="{name}"}} {count}'
+                      for name, count in sorted(self.exceptions.items())]
+            lines += [
+                '# HELP useragentfilter_latency_seconds Request latency by phase.',
+                '# TYPE useragentfilter_latency_seconds histogram',
+            ]
+            for phase in self.PHASES:
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS, self._buckets[phase]):
+                    cumulative += count
+                    lines.append(f'useragentfilter_latency_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+                lines.append(f'useragentfilter_latency_seconds_bucket{{phase="{phase}",le="+Inf"}} {self._seen[phase]}')
+                lines.append(f'useragentfilter_latency_seconds_sum{{phase="{phase}"}} {self._sums[phase]}')
+                lines.append(f'useragentfilter_latency_seconds_count{{phase="{phase}"}} {self._seen[phase]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str, format: str = 'json') -> None:
+        """
+        Write the metrics to a local file, replacing it atomically.
+
+        Args:
+            path (str): Path to the file to write.
+            format (str, optional): 'json' or 'prometheus'. Default is 'json'.
+        """
+        if format not in ('json', 'prometheus'):
+            raise ValueError("format must be 'json' or 'prometheus'")
+        text = self.to_json() if format == 'json' else self.to_prometheus()
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w') as f:
+            f.write(text)
+        os.replace(temp_file, path)
+        logger.info("Wrote metrics for %s attempts to %s.", self.attempts, path)
@@ -0,0 +1,284 @@
+import json
+import logging
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .cache import VerdictCache
+from .classifier import parse_user_agent
+from .metrics import CheckResult
+
+logger = logging.getLogger(__name__)
+
+# (browser, os, version bucket, version, device) of a user agent, as used by the predictor
+Signature = Tuple[Optional[str], Optional[str], Optional[int], Optional[int], str]
+
+
+def agent_signature(user_agent: str) -> Signature:
+    """
+    Reduce a user agent to the fields the predictor learns from.
+
+    Args:
+        user_agent (str): The user agent string.
+
+    Returns:
+        tuple: (browser, os, version bucket, major version, device class). The version bucket is
+               the major version rounded down to a multiple of 10, so that a host blocking e.g.
+               every Chrome below 100 is recognized for versions that were never tested.
+    """
+    parsed = parse_user_agent(user_agent)
+    bucket = parsed.version // 10 * 10 if parsed.version is not None else None
+    return parsed.browser, parsed.os, bucket, parsed.version, parsed.device
+
+
+class VerdictPredictor:
+    """
+    A per-host model of which user agents a host accepts, learned from past verdicts.
+
+    Verdicts are counted for every prefix of the user agent's signature (see `agent_signature`):
+    the host as a whole, the browser family, family and OS, family, OS and version bucket, and so
+    on down to the device class. The acceptance probability of a signature is estimated level by
+    level, each level's rate being shrunk towards the level above it by `strength` pseudo-counts.
+    A signature that was never seen therefore inherits the rate of its closest observed relative.
+
+    The predictor is a hook: pass it to `UserAgentTester(hooks=[...])` to learn from every
+    response. Throttling (408/429) and server errors (5xx) say nothing about the user agent and
+    are ignored, as are transport failures. It is thread-safe.
+    """
+
+    # Status codes that are not a verdict on the user agent
+    TRANSIENT_STATUS_CODES = frozenset((408, 429)) | frozenset(range(500, 600))
+
+    def __init__(self, strength: float = 2.0):
+        """
+        Initialize the predictor.
+
+        Args:
+            strength (float, optional): Number of pseudo-observations each level borrows from the
+                                        level above it. Default is 2.
+        """
+        if strength <= 0:
+            raise ValueError("strength must be positive")
+        self.strength = strength
+        # Per host: signature prefix -> [accepted, total]
+        self._counts: Dict[str, Dict[tuple, List[int]]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, result: CheckResult) -> None:
+        """
+        Learn from a request attempt.
+
+        Args:
+            result (CheckResult): The attempt, as passed to tester hooks.
+        """
+        if result.status_code is None or result.status_code in self.TRANSIENT_STATUS_CODES:
+            return
+        self.observe(urlparse(result.url).netloc, result.user_agent, result.accepted)
+
+    def observe(self, host: str, user_agent: str, accepted: bool) -> None:
+        """
+        Record a verdict.
+
+        Args:
+            host (str): The host (network location) the user agent was tested against.
+            user_agent (str): The user agent string.
+            accepted (bool): True if the host accepted the user agent.
+        """
+        self.observe_signature(host, agent_signature(user_agent), accepted)
+
+    def observe_signature(self, host: str, signature: Signature, accepted: bool) -> None:
+        """
+        Record a verdict for a user agent that was already reduced with `agent_signature`.
+
+        Args:
+            host (str): The host (network location) the user agent was tested against.
+            signature (tuple): The signature of the user agent.
+            accepted (bool): True if the host accepted the user agent.
+        """
+        with self._lock:
+            counts = self._counts.setdefault(host.lower(), {})
+            for length in range(len(signature) + 1):
+                entry = counts.setdefault(signature[:length], [0, 0])
+                entry[0] += accepted
+                entry[1] += 1
+
+    def predict(self, host: str, user_agent: str) -> float:
+        """
+        Estimate the probability that a host accepts a user agent.
+
+        Args:
+            host (str): The host (network location) to predict for.
+            user_agent (str): The user agent string.
+
+        Returns:
+            float: The estimated acceptance probability; 0.5 for a host without verdicts.
+        """
+        return self.predict_signature(host, agent_signature(user_agent))
+
+    def predict_signature(self, host: str, signature: Signature) -> float:
+        """
+        Estimate the probability that a host accepts user agents with a signature.
+
+        Args:
+            host (str): The host (network location) to predict for.
+            signature (tuple): The signature, from `agent_signature`.
+
+        Returns:
+            float: The estimated acceptance probability.
+        """
+        with self._lock:
+            counts = self._counts.get(host.lower(), {})
+            # Laplace estimate for the host, then shrink each more specific level towards its parent
+            accepted, total = counts.get((), (0, 0))
+            probability = (accepted + 1) / (total + 2)
+            for length in range(1, len(signature) + 1):
+                entry = counts.get(signature[:length])
+                if entry is None:
+                    break
+                probability = (entry[0] + self.strength * probability) / (entry[1] + self.strength)
+        return probability
+
+    def observations(self, host: str) -> int:
+        """
+        Return the number of verdicts recorded for a host.
+
+        Args:
+            host (str): The host (network location).
+
+        Returns:
+            int: The number of verdicts.
+        """
+        with self._lock:
+            return self._counts.get(host.lower(), {}).get((), (0, 0))[1]
+
+    def learn_from_cache(self, cache: VerdictCache, host: Optional[str] = None) -> int:
+        """
+        Learn from the fresh verdicts of a verdict cache, e.g. at the start of a run.
+
+        Args:
+            cache (VerdictCache): The cache to read.
+            host (str, optional): Only learn verdicts for this host. Default is None (all hosts).
+
+        Returns:
+            int: The number of verdicts learned.
+        """
+        learned = 0
+        for user_agent, verdict_host, verdict in cache.verdicts(host):
+            if verdict.status_code in self.TRANSIENT_STATUS_CODES:
+                continue
+            self.observe(verdict_host, user_agent, verdict.accepted)
+            learned += 1
+        logger.info("Learned %s verdicts from the verdict cache.", learned)
+        return learned
+
+    def save(self, path: str) -> None:
+        """
+        Save the model to a JSON file, replacing it atomically.
+
+        Args:
+            path (str): Path to the file to write.
+        """
+        with self._lock:
+            data = {
+                'strength': self.strength,
+                'hosts': {host: [[list(key), accepted, total] for key, (accepted, total) in counts.items()]
+                          for host, counts in self._counts.items()},
+            }
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(data, f)
+        os.replace(temp_file, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'VerdictPredictor':
+        """
+        Load a model saved with `save`.
+
+        Args:
+            path (str): Path to the model file.
+
+        Returns:
+            VerdictPredictor: The loaded predictor.
+        """
+        with open(path, 'r') as f:
+            data = json.load(f)
+        predictor = cls(strength=data['strength'])
+        for host, entries in data['hosts'].items():
+            predictor._counts[host] = {tuple(key): [accepted, total] for key, accepted, total in entries}
+        return predictor
+
+
+class PredictionQueue:
+    """
+    A test queue that hands out the user agents most likely to be accepted first.
+
+    User agents are grouped by signature, and every `pop` picks the group with the highest
+    predicted acceptance probability at that moment, so verdicts learned during a run reorder the
+    rest of it. Groups predicted below `threshold` are pruned: only a fraction `explore` of their
+    user agents (at least one, unless `explore` is 0) is tested, to confirm the prediction. A
+    confirmed-good group rises above the threshold again and is tested in full.
+    """
+
+    def __init__(
+        self,
+        predictor: VerdictPredictor,
+        host: str,
+        user_agents: Iterable[str],
+        threshold: float = 0.2,
+        explore: float = 0.1
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            predictor (VerdictPredictor): The model to rank user agents with.
+            host (str): The host (network location) the user agents are tested against.
+            user_agents (iterable): The user agents to test.
+            threshold (float, optional): Groups predicted below this probability are pruned. Default is 0.2.
+            explore (float, optional): Fraction of each pruned group that is still tested. Default is 0.1.
+        """
+        if not 0 <= explore <= 1:
+            raise ValueError("explore must be between 0 and 1")
+        self.predictor = predictor
+        self.host = host
+        self.threshold = threshold
+        self.explore = explore
+        self._groups: Dict[Signature, Deque[str]] = {}
+        for user_agent in user_agents:
+            self._groups.setdefault(agent_signature(user_agent), deque()).append(user_agent)
+        # Number of user agents each group may still spend on confirming a low prediction
+        self._budgets = {signature: math.ceil(explore * len(agents)) for signature, agents in self._groups.items()}
+        self.explored = 0
+
+    def __len__(self) -> int:
+        return sum(len(agents) for agents in self._groups.values())
+
+    def pop(self) -> Optional[str]:
+        """
+        Take the next user agent to test.
+
+        Returns:
+            str or None: The user agent, or None if every remaining user agent is pruned.
+        """
+        best = None
+        best_probability = -1.0
+        for signature in self._groups:
+            probability = self.predictor.predict_signature(self.host, signature)
+            if probability < self.threshold and self._budgets[signature] <= 0:
+                continue
+            if probability > best_probability:
+                best, best_probability = signature, probability
+        if best is None:
+            return None
+
+        if best_probability < self.threshold:
+            self._budgets[best] -= 1
+            self.explored += 1
+        agents = self._groups[best]
+        user_agent = agents.popleft()
+        if not agents:
+            del self._groups[best]
+        return user_agent
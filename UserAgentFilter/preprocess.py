@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import re
+from typing import Iterable, Iterator, Optional, Set, Tuple
+
+# Junk appended to user agents by some proxies and log pipelines, e.g. ",gzip(gfe)" from Google front ends
+JUNK_SUFFIX = re.compile(r'(?:\s*,\s*gzip\(gfe\))+\Z', re.IGNORECASE)
+
+# Control characters that sometimes end up in scraped user agent lists
+CONTROL_CHARACTERS = re.compile(r'[\x00-\x1f\x7f]')
+
+# Quote characters wrapped around user agents exported from CSV files or logs
+QUOTES = '"\''
+
+logger = logging.getLogger(__name__)
+
+
+class DedupStats:
+    """
+    Counters collected by `dedupe_user_agents`.
+
+    Attributes:
+        total (int): Number of user agents read.
+        normalized (int): Number of user agents changed by normalization.
+        duplicates (int): Number of user agents dropped as duplicates.
+        unique (int): Number of user agents passed on for testing.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.normalized = 0
+        self.duplicates = 0
+        self.unique = 0
+
+    @property
+    def requests_saved(self) -> int:
+        """int: Number of HTTP requests avoided by dropping duplicates."""
+        return self.duplicates
+
+    def __repr__(self) -> str:
+        return (f"DedupStats(total={self.total}, unique={self.unique}, "
+                f"duplicates={self.duplicates}, normalized={self.normalized})")
+
+
+def normalize_user_agent(user_agent: str) -> str:
+    """
+    Canonicalize a user agent string.
+
+    Control characters are replaced by spaces, runs of whitespace are collapsed to a single space,
+    surrounding quotes are removed and junk suffixes such as ",gzip(gfe)" are stripped.
+
+    Args:
+        user_agent (str): The raw user agent string.
+
+    Returns:
+        str: The canonical form of the user agent, possibly empty.
+    """
+    if not user_agent.isprintable():
+        user_agent = CONTROL_CHARACTERS.sub(' ', user_agent)
+    user_agent = ' '.join(user_agent.split())
+    user_agent = user_agent.strip(QUOTES).strip()
+    if user_agent.endswith(')'):
+        user_agent = JUNK_SUFFIX.sub('', user_agent)
+    return user_agent
+
+
+def dedupe_user_agents(
+    agents: Iterable[Tuple[int, str]],
+    normalize: bool = True,
+    stats: Optional[DedupStats] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Drop duplicate user agents from a stream, keeping the first occurrence of each.
+
+    Each user agent is optionally normalized with `normalize_user_agent` and then identified by a
+    128-bit BLAKE2 digest, so the set of seen user agents costs a small fixed amount of memory per
+    entry regardless of the length of the strings. The stage is a single linear pass and does no
+    network I/O.
+
+    Args:
+        agents (iterable): (line_index, user_agent) pairs, as produced by `iter_user_agents`.
+        normalize (bool, optional): Canonicalize user agents before comparing them. Default is True.
+        stats (DedupStats, optional): Counters to update. Default is None (a new instance is used).
+
+    Yields:
+        tuple: (line_index, user_agent) for the first occurrence of every distinct user agent.
+    """
+    if stats is None:
+        stats = DedupStats()
+    seen: Set[int] = set()
+
+    for index, user_agent in agents:
+        stats.total += 1
+        if normalize:
+            canonical = normalize_user_agent(user_agent)
+            if canonical != user_agent:
+                stats.normalized += 1
+            user_agent = canonical
+            if not user_agent:
+                continue
+
+        key = int.from_bytes(hashlib.blake2b(user_agent.encode('utf-8'), digest_size=16).digest(), 'big')
+        if key in seen:
+            stats.duplicates += 1
+            continue
+        seen.add(key)
+        stats.unique += 1
+        yield index, user_agent
+
+    logger.info("Deduplication: %d unique user agents out of %d, %d requests saved.",
+                stats.unique, stats.total, stats.requests_saved)
@@ -0,0 +1,172 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the value of a `Retry-After` header.
+
+    Args:
+        value (str or None): The header value, either a number of seconds or an HTTP date.
+
+    Returns:
+        float or None: The number of seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class _Bucket:
+    """
+    Token bucket state for a single host.
+    """
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.blocked_until = 0.0
+
+
+class HostRateLimiter:
+    """
+    An adaptive, per-host token bucket rate limiter.
+
+    Every host gets its own bucket that refills at `rate` requests per second up to `burst` tokens.
+    The rate adapts to the server with AIMD (additive increase, multiplicative decrease): each clean
+    response raises the host's rate by `increase`, while a 429/503 response or a timeout multiplies
+    it by `decrease`. A `Retry-After` value pauses the host for the requested time.
+
+    The limiter is thread-safe and can be shared by the synchronous, threaded and asynchronous
+    filtering modes; the asynchronous modes wait for it on their executor threads, next to the
+    request. Waiting happens outside the lock, so callers for different hosts never block each other.
+    """
+
+    # Status codes that signal the server wants us to slow down
+    BACKOFF_STATUS_CODES = (429, 503)
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 1.0,
+        min_rate: float = 0.05,
+        max_rate: float = 10.0,
+        increase: float = 0.1,
+        decrease: float = 0.5
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate (float, optional): Initial requests per second for every host. Default is 1.0.
+            burst (float, optional): Maximum number of requests that may start back to back. Default is 1.0.
+            min_rate (float, optional): Lowest rate the limiter backs off to. Default is 0.05.
+            max_rate (float, optional): Highest rate the limiter speeds up to. Default is 10.0.
+            increase (float, optional): Rate added after each clean response. Default is 0.1.
+            decrease (float, optional): Factor the rate is multiplied by on back-off. Default is 0.5.
+        """
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError("rates must satisfy 0 < min_rate <= rate <= max_rate")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+
+        self.initial_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str) -> float:
+        """
+        Block until a request to `host` may be sent.
+
+        Args:
+            host (str): The network location (host[:port]) of the request.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+        delay = self._reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def feedback(
+        self,
+        host: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        timeout: bool = False
+    ) -> None:
+        """
+        Adapt the rate of `host` to the outcome of a request.
+
+        Args:
+            host (str): The network location (host[:port]) of the request.
+            status_code (int, optional): The HTTP status code of the response, if one was received.
+            retry_after (float, optional): Seconds the server asked us to wait (`Retry-After`).
+            timeout (bool, optional): True if the request timed out. Default is False.
+        """
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(host, now)
+            if timeout or status_code in self.BACKOFF_STATUS_CODES:
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                # Drop any saved-up burst so the slower pace applies right away
+                bucket.tokens = min(bucket.tokens, 0.0)
+            elif status_code is not None and status_code < 500:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase)
+            if retry_after:
+                bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+
+    def rate(self, host: str) -> float:
+        """
+        Return the current rate of a host.
+
+        Args:
+            host (str): The network location (host[:port]).
+
+        Returns:
+            float: The host's current requests per second.
+        """
+        with self._lock:
+            return self._bucket(host, time.monotonic()).rate
+
+    def _reserve(self, host: str) -> float:
+        """
+        Take a token from the host's bucket and return how long the caller must wait for it.
+
+        The bucket may go into debt, which queues callers behind each other in arrival order.
+        """
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(host, now)
+            # Refill the bucket for the time elapsed since the last update
+            bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            bucket.tokens -= 1
+            delay = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            return max(delay, bucket.blocked_until - now)
+
+    def _bucket(self, host: str, now: float) -> _Bucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.initial_rate, self.burst, now)
+        return bucket
@@ -0,0 +1,149 @@
+import random
+from typing import Iterable, Optional, Tuple, Type
+
+# Outcomes of a check, as returned by `UserAgentTester.check_outcome`
+ACCEPTED = 'accepted'
+REJECTED = 'rejected'
+TRANSPORT_FAILURE = 'transport_failure'
+OUTCOMES = (ACCEPTED, REJECTED, TRANSPORT_FAILURE)
+
+
+class RetryPolicy:
+    """
+    When and how `UserAgentTester.check_user_agent` retries a failed attempt.
+
+    An attempt that raises one of `retry_exceptions` or gets one of `retry_status_codes` says
+    nothing about the user agent, so it is retried after an exponential backoff: the n-th retry
+    waits up to `backoff * multiplier ** (n - 1)` seconds (at most `max_backoff`), drawn uniformly
+    from that range with `jitter` ("full jitter") so that concurrent checks do not retry in lock
+    step. A `Retry-After` header is honored if it asks for a longer wait. A check gives up after
+    `max_attempts` attempts, or when the next wait would exceed the `budget` of seconds per user
+    agent, and its outcome is then a transport failure rather than a verdict.
+
+    Transport failures are not recorded in the verdict cache. File and stream runs test them
+    again after the rest of the input, up to `defer_passes` times.
+
+    Attributes:
+        max_attempts (int): Maximum number of attempts per check.
+        retry_exceptions (tuple): Exception classes that are retried.
+        retry_status_codes (frozenset): Status codes that are retried.
+        backoff (float): Wait before the first retry in seconds, before jitter.
+        multiplier (float): Factor applied to the wait after every retry.
+        max_backoff (float): Upper bound of a single wait in seconds.
+        jitter (bool): Draw each wait uniformly between 0 and its bound.
+        budget (float or None): Maximum time in seconds spent on one check, or None for no limit.
+        defer_passes (int): Number of extra passes over the transport failures of a run.
+    """
+
+    DEFAULT_RETRY_STATUS_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        retry_exceptions: Optional[Iterable[Type[Exception]]] = None,
+        retry_status_codes: Optional[Iterable[int]] = None,
+        backoff: float = 0.5,
+        multiplier: float = 2.0,
+        max_backoff: float = 30.0,
+        jitter: bool = True,
+        budget: Optional[float] = None,
+        defer_passes: int = 1
+    ):
+        """
+        Initialize the retry policy.
+
+        Args:
+            max_attempts (int, optional): Maximum number of attempts per check. Default is 3.
+            retry_exceptions (iterable, optional): Exception classes to retry. Default is None
+                                                   (timeouts and connection errors, including proxy errors).
+            retry_status_codes (iterable, optional): Status codes to retry. Default is None
+                                                     (408, 425, 429, 500, 502, 503 and 504).
+            backoff (float, optional): Wait before the first retry in seconds. Default is 0.5.
+            multiplier (float, optional): Factor applied to the wait after every retry. Default is 2.
+            max_backoff (float, optional): Upper bound of a single wait in seconds. Default is 30.
+            jitter (bool, optional): Randomize each wait between 0 and its bound. Default is True.
+            budget (float, optional): Maximum time in seconds spent on one check. Default is None (no limit).
+            defer_passes (int, optional): Number of times transport failures are tested again at the
+                                          end of a run. Default is 1.
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if backoff < 0 or multiplier < 1 or max_backoff < 0:
+            raise ValueError("backoff and max_backoff must not be negative and multiplier must be at least 1")
+        if defer_passes < 0:
+            raise ValueError("defer_passes must not be negative")
+        self.max_attempts = max_attempts
+        # The default exception classes are looked up on first use, so a policy can be built
+        # without importing requests
+        self._retry_exceptions = None if retry_exceptions is None else tuple(retry_exceptions)
+        self.retry_status_codes = frozenset(
+            self.DEFAULT_RETRY_STATUS_CODES if retry_status_codes is None else retry_status_codes)
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.budget = budget
+        self.defer_passes = defer_passes
+
+    @staticmethod
+    def default_retry_exceptions() -> Tuple[Type[Exception], ...]:
+        """
+        Return the exception classes retried by default: timeouts and connection errors, including proxy errors.
+
+        Returns:
+            tuple: The exception classes.
+        """
+        import requests
+        return requests.exceptions.Timeout, requests.exceptions.ConnectionError
+
+    @property
+    def retry_exceptions(self) -> Tuple[Type[Exception], ...]:
+        """tuple: Exception classes that are retried."""
+        if self._retry_exceptions is None:
+            self._retry_exceptions = self.default_retry_exceptions()
+        return self._retry_exceptions
+
+    @retry_exceptions.setter
+    def retry_exceptions(self, retry_exceptions: Iterable[Type[Exception]]) -> None:
+        self._retry_exceptions = tuple(retry_exceptions)
+
+    def retries_exception(self, error: BaseException) -> bool:
+        """
+        Return True if an attempt that raised `error` should be retried.
+
+        Args:
+            error (BaseException): The exception raised by the attempt.
+
+        Returns:
+            bool: True if the exception is one of `retry_exceptions`.
+        """
+        return isinstance(error, self.retry_exceptions)
+
+    def retries_status(self, status_code: int) -> bool:
+        """
+        Return True if an attempt answered with `status_code` should be retried.
+
+        Args:
+            status_code (int): The HTTP status code of the response.
+
+        Returns:
+            bool: True if the status code is one of `retry_status_codes`.
+        """
+        return status_code in self.retry_status_codes
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """
+        Return the time to wait before a retry.
+
+        Args:
+            retry (int): The 1-based number of the retry.
+            retry_after (float, optional): The wait asked for by a `Retry-After` header. Default is None.
+
+        Returns:
+            float: The wait in seconds.
+        """
+        bound = min(self.max_backoff, self.backoff * self.multiplier ** (retry - 1))
+        wait = random.uniform(0, bound) if self.jitter else bound
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+        return wait
@@ -0,0 +1,203 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Union
+
+from .metrics import CheckResult
+from .proxies import ProxyPool
+from .ratelimit import HostRateLimiter
+from .retry import ACCEPTED, TRANSPORT_FAILURE
+from .tester import UserAgentTester
+
+if TYPE_CHECKING:
+    from .selector import GetUserAgent
+
+logger = logging.getLogger(__name__)
+
+
+class PoolRevalidator:
+    """
+    Keep the successful-agent pool of a `GetUserAgent` fresh from a background thread.
+
+    Every `interval` seconds the revalidator spends at most `budget` requests. It first re-tests
+    the pool members that were checked longest ago: accepted agents get their full weight back,
+    agents the website now rejects are evicted, and checks that end in a transport failure
+    (throttling, server errors or an unreachable host that outlast the tester's `RetryPolicy`)
+    only lower the agent's weight, as `GetUserAgent.report` does. The rest of
+    the budget tops the pool up to `min_pool` agents from user agents of the file that were
+    never tested.
+
+    The revalidator only uses the selector's public interface (`pool_snapshot`, `report`,
+    `sample_untested` and `record_verdict`). All requests are sent outside the selector's lock;
+    the pool is only locked for the O(log n) update after each check, so `get_random_user_agent`
+    never waits for the network. The verdict cache is deliberately not used, as it would return
+    the very verdicts being rechecked.
+
+    Attributes:
+        checked (int): Number of pool members re-tested.
+        evicted (int): Number of pool members evicted.
+        added (int): Number of agents added by topping up.
+        cycles (int): Number of completed revalidation cycles.
+    """
+
+    def __init__(
+        self,
+        selector: 'GetUserAgent',
+        test_url: str,
+        interval: float = 300.0,
+        budget: int = 20,
+        min_pool: Optional[int] = None,
+        delay_range: tuple = (3, 8),
+        proxy: Optional[Union[Dict[str, str], list, ProxyPool]] = None,
+        timeout: int = 10,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        hooks: Optional[Iterable[Callable[[CheckResult], None]]] = None
+    ):
+        """
+        Initialize the revalidator.
+
+        Args:
+            selector (GetUserAgent): The selector whose pool is kept fresh.
+            test_url (str): URL of the website to re-test user agents against.
+            interval (float, optional): Seconds between revalidation cycles. Default is 300.
+            budget (int, optional): Maximum number of user agents tested per cycle. Default is 20.
+            min_pool (int, optional): Top the pool up to this many agents. Default is None (the size
+                                      of the pool when the revalidator is started).
+            delay_range (tuple, optional): Random delay in seconds between two checks. Default is (3, 8).
+            proxy (dict, list or ProxyPool, optional): Proxy settings, as for `UserAgentTester`. Default is None.
+            timeout (int, optional): Timeout for each request in seconds. Default is 10.
+            rate_limiter (HostRateLimiter, optional): Paces the requests instead of `delay_range`. Default is None.
+            hooks (iterable, optional): Callables that receive a `CheckResult` for every request attempt.
+                                        Default is None.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if budget < 1:
+            raise ValueError("budget must be at least 1")
+        self.selector = selector
+        self.interval = interval
+        self.budget = budget
+        self.min_pool = min_pool
+        self.delay_range = delay_range
+        self.checked = 0
+        self.evicted = 0
+        self.added = 0
+        self.cycles = 0
+        self.tester = UserAgentTester(test_url=test_url, proxy=proxy, timeout=timeout, delay_range=delay_range,
+                                      rate_limiter=rate_limiter, hooks=hooks)
+        # Monotonic time of the last check of each pool member, by user agent
+        self._checked_at: Dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Serializes cycles, so `run_once` can also be called directly
+        self._cycle_lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Start the background thread. The first cycle runs after `interval` seconds.
+        """
+        if self._thread is not None:
+            raise RuntimeError("the revalidator was already started")
+        pool = self.selector.pool_snapshot()
+        if self.min_pool is None:
+            self.min_pool = len(pool)
+        # The pool was just tested; start its schedule now
+        now = time.monotonic()
+        self._checked_at.update((user_agent, now) for user_agent in pool)
+        self._thread = threading.Thread(target=self._run, name='PoolRevalidator', daemon=True)
+        self._thread.start()
+        logger.info("Revalidating %s user agents every %s seconds.", len(pool), self.interval)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread after the current check and close the tester's connections.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the thread. Default is None (wait until it ends).
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.tester.close()
+
+    def __enter__(self) -> 'PoolRevalidator':
+        if self._thread is None:
+            self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                # Keep the thread alive; the next cycle may well succeed
+                logger.exception("Revalidation cycle failed.")
+
+    def run_once(self) -> int:
+        """
+        Run one revalidation cycle.
+
+        Returns:
+            int: The number of user agents tested.
+        """
+        with self._cycle_lock:
+            selector = self.selector
+            pool = selector.pool_snapshot()
+            for user_agent in set(self._checked_at) - set(pool):
+                del self._checked_at[user_agent]
+
+            tested = 0
+            for user_agent in heapq.nsmallest(self.budget, pool, key=lambda agent: self._checked_at.get(agent, 0.0)):
+                if self._stop.is_set():
+                    break
+                verdict = self._check(user_agent, tested)
+                tested += 1
+                self.checked += 1
+                self._checked_at[user_agent] = time.monotonic()
+                if verdict is False:
+                    logger.info("User-Agent '%s' is no longer accepted, evicting it.", user_agent)
+                    self.evicted += 1
+                # True restores the weight, False evicts and None lowers the weight
+                selector.report(user_agent, verdict)
+
+            # Sampled agents count as tested, so draw them one at a time and only while one is needed
+            while (len(selector.successful_agents) < (self.min_pool or 0) and tested < self.budget
+                   and not self._stop.is_set()):
+                user_agents = selector.sample_untested(1)
+                if not user_agents:
+                    break
+                user_agent = user_agents[0]
+                verdict = self._check(user_agent, tested)
+                tested += 1
+                if verdict:
+                    selector.record_verdict(user_agent, True)
+                    self._checked_at[user_agent] = time.monotonic()
+                    self.added += 1
+
+            self.cycles += 1
+            logger.info("Revalidation: tested %s user agents; pool has %s (%s evicted, %s added so far).",
+                        tested, len(selector.successful_agents), self.evicted, self.added)
+            return tested
+
+    def _check(self, user_agent: str, tested: int) -> Optional[bool]:
+        """
+        Test a user agent, waiting between checks.
+
+        Args:
+            user_agent (str): The user agent to test.
+            tested (int): Number of user agents already tested in this cycle.
+
+        Returns:
+            bool or None: True if accepted, False if rejected, None if the check was inconclusive.
+        """
+        if tested and self.tester.rate_limiter is None:
+            self._stop.wait(random.uniform(*self.delay_range))
+        outcome = self.tester.check_outcome(user_agent)
+        if outcome == TRANSPORT_FAILURE:
+            return None
+        return outcome == ACCEPTED
@@ -0,0 +1,139 @@
+import itertools
+import random
+from typing import Iterable, List
+
+
+class WeightedSampler:
+    """
+    A dynamic weighted sampler backed by a Fenwick (binary indexed) tree.
+
+    Items are identified by their position, 0 to len - 1. Sampling returns a position with
+    probability proportional to its weight. Sampling, updating a weight, appending and removing
+    the last item all take O(log n), so weights can change after every use even for pools of
+    hundreds of thousands of items.
+    """
+
+    def __init__(self, weights: Iterable[float] = ()):
+        """
+        Initialize the sampler.
+
+        Args:
+            weights (iterable, optional): Initial non-negative weights. Default is empty.
+        """
+        self._weights: List[float] = []
+        # 1-based Fenwick tree; _tree[i] holds the sum of weights (i - lowbit(i), i]
+        self._tree: List[float] = [0.0]
+        for weight in weights:
+            self.append(weight)
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    @property
+    def total(self) -> float:
+        """float: The sum of all weights."""
+        return self._prefix_sum(len(self._weights))
+
+    def weight(self, index: int) -> float:
+        """
+        Return the weight of an item.
+
+        Args:
+            index (int): The position of the item.
+
+        Returns:
+            float: The item's weight.
+        """
+        return self._weights[index]
+
+    def append(self, weight: float) -> int:
+        """
+        Add an item at the end.
+
+        Args:
+            weight (float): The non-negative weight of the new item.
+
+        Returns:
+            int: The position of the new item.
+        """
+        if weight < 0:
+            raise ValueError("weights must be non-negative")
+        self._weights.append(weight)
+        position = len(self._weights)
+        lowbit = position & -position
+        # The new node covers (position - lowbit, position]: the new weight plus the existing items in range
+        self._tree.append(weight + self._prefix_sum(position - 1) - self._prefix_sum(position - lowbit))
+        return position - 1
+
+    def pop(self) -> float:
+        """
+        Remove the last item.
+
+        Returns:
+            float: The weight of the removed item.
+        """
+        # No other node covers the last position, so dropping its node keeps the tree valid
+        self._tree.pop()
+        return self._weights.pop()
+
+    def update(self, index: int, weight: float) -> None:
+        """
+        Change the weight of an item.
+
+        Args:
+            index (int): The position of the item.
+            weight (float): The new non-negative weight.
+        """
+        if weight < 0:
+            raise ValueError("weights must be non-negative")
+        delta = weight - self._weights[index]
+        self._weights[index] = weight
+        position = index + 1
+        while position < len(self._tree):
+            self._tree[position] += delta
+            position += position & -position
+
+    def sample(self, rng: random.Random = random) -> int:
+        """
+        Draw a position with probability proportional to its weight.
+
+        Args:
+            rng (random.Random, optional): The random number generator to use. Default is the `random` module.
+
+        Returns:
+            int: The sampled position.
+
+        Raises:
+            ValueError: If the sampler is empty or every weight is zero.
+        """
+        total = self.total
+        if total <= 0:
+            raise ValueError("cannot sample from a sampler without positive weights")
+        target = rng.random() * total
+
+        # Descend the tree to find the first position whose prefix sum exceeds the target
+        position = 0
+        step = 1 << (len(self._weights).bit_length() - 1)
+        while step:
+            candidate = position + step
+            if candidate < len(self._tree) and self._tree[candidate] <= target:
+                position = candidate
+                target -= self._tree[candidate]
+            step >>= 1
+
+        # Guard against floating point drift landing on a zero-weight item or past the end
+        index = min(position, len(self._weights) - 1)
+        if self._weights[index] > 0:
+            return index
+        nearby = itertools.chain(range(index - 1, -1, -1), range(index + 1, len(self._weights)))
+        index = next((candidate for candidate in nearby if self._weights[candidate] > 0), None)
+        if index is None:
+            raise ValueError("cannot sample from a sampler without positive weights")
+        return index
+
+    def _prefix_sum(self, position: int) -> float:
+        total = 0.0
+        while position > 0:
+            total += self._tree[position]
+            position -= position & -position
+        return total
@@ -1,6 +1,24 @@
 import random
 import logging
-from tester import UserAgentTester
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .cache import VerdictCache
+from .classifier import AgentClassifier, parse_user_agent
+from .content import BlockDetector
+from .log import ProgressReporter
+from .metrics import CheckResult
+from .ratelimit import HostRateLimiter
+from .sampler import WeightedSampler
+from .store import AgentList, AgentStore
+from .streaming import iter_user_agents
+
+if TYPE_CHECKING:
+    from .revalidator import PoolRevalidator
+
+logger = logging.getLogger(__name__)
 
 class GetUserAgent:
     """
@@ -8,64 +26,544 @@ class GetUserAgent:
     testing a specified number of user agents against a website and provides 
     successful user agents for subsequent requests.
 
+    Successful user agents are picked by a weighted sampler. Callers report how each use went
+    with `report`: agents that keep working keep their full weight, failing agents are picked
+    less often and agents that get blocked are dropped from the pool.
+
+    All user agents are kept once, in a compact `AgentStore`; the sampled, successful and per-URL
+    agents are lists of integer IDs into that store.
+
+    With a `classifier`, user agents that pass its rules are sampled first; the others are only
+    tested when there are not enough good ones. `get_random_user_agent(device=...)` picks agents
+    of one device class, as parsed by `parse_user_agent`.
+
     Attributes:
-        file_path (str): Path to the user agent text file.
-        successful_agents (list): List of user agents that passed the tests.
+        file_path (str): Path to the user agent text file, or to a store file saved with `AgentStore.save`.
+        store (AgentStore): The store holding every user agent.
+        classifier (AgentClassifier or None): Rules used to deprioritize user agents when sampling.
+        successful_agents (AgentList): List of user agents that passed the tests.
+        url_agents (dict): For each URL tested with `test_user_agents_matrix`, the user agents accepted by it.
     """
-    
-    def __init__(self, file_path: str):
+
+    # Status codes that mean the website has blocked a user agent
+    BLOCKED_STATUS_CODES = (401, 403)
+
+    # Weight changes applied by `report`; new agents start at MAX_WEIGHT
+    MAX_WEIGHT = 1.0
+    SUCCESS_FACTOR = 2.0
+    FAILURE_FACTOR = 0.5
+
+    def __init__(self, file_path: str, store: Optional[AgentStore] = None,
+                 classifier: Optional[AgentClassifier] = None):
         """
         Initialize the GetUserAgent class.
 
         Args:
-            file_path (str): The path to the file containing user agents.
+            file_path (str): The path to the file containing user agents. A store file saved with
+                             `AgentStore.save` is memory-mapped instead of read.
+            store (AgentStore, optional): A store already holding the user agents of `file_path`,
+                                          e.g. shared with other selectors. Default is None.
+            classifier (AgentClassifier, optional): Sample user agents that pass these rules before
+                                                    the others. Default is None (sample uniformly).
         """
         self.file_path = file_path
-        self.successful_agents = []
+        if store is None and AgentStore.is_store_file(file_path):
+            store = AgentStore.open(file_path)
+        # The text file is only read on the first test call
+        self._loaded = store is not None
+        self.store = store if store is not None else AgentStore()
+        self.successful_agents = AgentList(self.store)
+        self.url_agents: Dict[str, AgentList] = {}
+        # Selection weights, position-aligned with `successful_agents` and keyed by agent ID
+        self._sampler = WeightedSampler()
+        self._positions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.classifier = classifier
+        # IDs of the agents that pass and fail the classifier, computed on first use
+        self._classified: Optional[Tuple[array, array]] = None
+        # Device class of each agent ID looked up by `get_random_user_agent`
+        self._devices: Dict[int, str] = {}
+        # One sampler and ID list per device class, built on the first draw by device and kept in
+        # step with `_sampler`; `_device_positions` maps an agent ID to its position in its class
+        self._device_samplers: Optional[Dict[str, Tuple[WeightedSampler, List[int]]]] = None
+        self._device_positions: Dict[int, int] = {}
+        # One flag per agent ID, set once the agent has been tested. It has its own lock, so
+        # scanning it for untested agents never holds up `get_random_user_agent`
+        self._tested = bytearray()
+        self._tested_lock = threading.Lock()
 
-    def test_user_agents(self, number: int, test_url: str):
+    def test_user_agents(self, number: int, test_url: str, workers: int = 1, stop_after: Optional[int] = None,
+                         cache: Optional[VerdictCache] = None, rate_limiter: Optional[HostRateLimiter] = None,
+                         hooks: Optional[Iterable[Callable[[CheckResult], None]]] = None,
+                         block_detector: Optional[BlockDetector] = None):
         """
         Test a given number of user agents from the file against a website.
 
+        With `workers` greater than 1 the sampled user agents are checked on a bounded thread pool.
+        Each check sends its own per-request headers and successful agents are collected under a
+        lock, so the pool can safely share one tester.
+
         Args:
             number (int): Number of user agents to test.
             test_url (str): URL of the website to test user agents against.
+            workers (int, optional): Number of checks to run in parallel. Default is 1 (sequential).
+            stop_after (int, optional): Stop testing once this many user agents have passed.
+                                        Checks that have not started yet are skipped. Default is None (test all).
+            cache (VerdictCache, optional): A persistent verdict cache; user agents with a fresh verdict
+                                            are not sent again. Default is None.
+            rate_limiter (HostRateLimiter, optional): An adaptive per-host rate limiter shared by all workers.
+                                                      Default is None (no throttling).
+            hooks (iterable, optional): Callables that receive a `CheckResult` for every request attempt. Default is None.
+            block_detector (BlockDetector, optional): Treats captcha and robot-check pages served with a 200
+                                                      as rejections. Default is None.
 
         Returns:
             None
         """
-        logging.info(f"Testing up to {number} user agents from {self.file_path} against {test_url}.")
-        
-        tester = UserAgentTester(test_url=test_url)
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        # The HTTP stack is only imported when agents are tested, so picking agents stays cheap
+        from .tester import UserAgentTester
+
+        logger.info("Testing up to %s user agents from %s against %s.", number, self.file_path, test_url)
         
-        try:
-            # Load user agents from the file
-            with open(self.file_path, "r") as f:
-                user_agents = [line.strip() for line in f if line.strip()]
-        except FileNotFoundError:
-            logging.error(f"File not found: {self.file_path}")
+        sampled_ids = self._sample_agent_ids(number)
+        if sampled_ids is None:
             return
-        
-        if len(user_agents) < number:
-            logging.warning(f"Requested {number} user agents, but only {len(user_agents)} available.")
-            number = len(user_agents)
 
-        sampled_agents = random.sample(user_agents, number)
+        lock = threading.Lock()
+        quota_met = threading.Event()
+        passed = 0
+        progress = ProgressReporter(logger, UserAgentTester.PROGRESS_EVERY, UserAgentTester.PROGRESS_INTERVAL,
+                                    total=len(sampled_ids))
 
-        for user_agent in sampled_agents:
-            if tester.check_user_agent(user_agent):
-                self.successful_agents.append(user_agent)
+        def check(agent_id: int) -> None:
+            nonlocal passed
+            # Skip checks that start after the quota has been met
+            if quota_met.is_set():
+                return
+            with self._tested_lock:
+                self._mark_tested(agent_id)
+            success = tester.check_user_agent(self.store[agent_id])
+            progress.update(success)
+            if success:
+                with lock:
+                    if quota_met.is_set():
+                        return
+                    self._add_successful(agent_id)
+                    passed += 1
+                    if stop_after is not None and passed >= stop_after:
+                        logger.info("Reached %s successful user agents, stopping early.", stop_after)
+                        quota_met.set()
 
-        logging.info(f"Total successful user agents: {len(self.successful_agents)}")
+        # Size the connection pool so every worker can keep its connection alive
+        with UserAgentTester(test_url=test_url, pool_maxsize=max(10, workers), cache=cache,
+                             rate_limiter=rate_limiter, hooks=hooks, block_detector=block_detector) as tester:
+            if workers == 1:
+                for agent_id in sampled_ids:
+                    check(agent_id)
+                    if quota_met.is_set():
+                        break
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    # Consume the results so exceptions raised in workers are not swallowed
+                    list(executor.map(check, sampled_ids))
+        progress.finish()
 
-    def get_random_user_agent(self):
+        logger.info("Total successful user agents: %s", len(self.successful_agents))
+
+    def test_user_agents_matrix(self, number: int, urls: List[str], concurrency: int = 10,
+                                cache: Optional[VerdictCache] = None,
+                                rate_limiter: Optional[HostRateLimiter] = None,
+                                hooks: Optional[Iterable[Callable[[CheckResult], None]]] = None,
+                                block_detector: Optional[BlockDetector] = None):
+        """
+        Test a given number of user agents from the file against several websites in one pass.
+
+        Every sampled user agent is tested against every URL with `UserAgentTester.test_matrix`,
+        using shared per-host connection pools and concurrent, per-host paced scheduling. User agents
+        accepted by every URL are added to `successful_agents`, and the agents accepted by each URL
+        are kept in `url_agents` for `get_random_user_agent(url)`.
+
+        Args:
+            number (int): Number of user agents to test.
+            urls (list): URLs of the websites to test user agents against.
+            concurrency (int, optional): Maximum number of checks running at the same time. Default is 10.
+            cache (VerdictCache, optional): A persistent verdict cache. Default is None.
+            rate_limiter (HostRateLimiter, optional): An adaptive per-host rate limiter. Default is None.
+            hooks (iterable, optional): Callables that receive a `CheckResult` for every request attempt. Default is None.
+            block_detector (BlockDetector, optional): Treats captcha and robot-check pages served with a 200
+                                                      as rejections. Default is None.
+
+        Returns:
+            dict: The acceptance matrix, mapping each sampled user agent to a dictionary of URL -> verdict.
+        """
+        from .tester import UserAgentTester
+
+        logger.info("Testing up to %s user agents from %s against %s URLs.", number, self.file_path, len(urls))
+
+        sampled_ids = self._sample_agent_ids(number)
+        if sampled_ids is None:
+            return {}
+        sampled_agents = [self.store[agent_id] for agent_id in sampled_ids]
+        with self._tested_lock:
+            for agent_id in sampled_ids:
+                self._mark_tested(agent_id)
+
+        # Keep one connection pool per host and one connection per worker
+        with UserAgentTester(test_url=urls[0], pool_connections=max(10, len(urls)),
+                             pool_maxsize=max(10, concurrency), cache=cache,
+                             rate_limiter=rate_limiter, hooks=hooks, block_detector=block_detector) as tester:
+            matrix = tester.test_matrix(sampled_agents, urls, concurrency)
+
+        for url in urls:
+            accepted = self.url_agents.setdefault(url, AgentList(self.store))
+            before = len(accepted)
+            for agent_id, agent in zip(sampled_ids, sampled_agents):
+                if matrix[agent][url]:
+                    accepted.append_id(agent_id)
+            logger.info("%s user agents accepted by %s.", len(accepted) - before, url)
+        for agent_id, agent in zip(sampled_ids, sampled_agents):
+            if all(matrix[agent].values()):
+                self._add_successful(agent_id)
+
+        logger.info("Total successful user agents: %s", len(self.successful_agents))
+        return matrix
+
+    def get_random_user_agent(self, url: Optional[str] = None, device: Optional[str] = None):
         """
         Get a random user agent from the list of successful user agents.
 
+        The user agent is drawn with probability proportional to its weight, which `report`
+        lowers for failing agents. Drawing takes O(log n) in the size of the pool, also when the
+        draw is restricted to a device class: the first such draw sorts the pool into one sampler
+        per class, which later additions, removals and `report` calls keep up to date.
+
+        Args:
+            url (str, optional): Pick uniformly among the user agents accepted by this URL in
+                                 `test_user_agents_matrix`. Default is None (use `successful_agents`).
+            device (str, optional): Only pick user agents of this device class, e.g. 'mobile' or
+                                    'desktop' (see `parse_user_agent`). Default is None (any device).
+
         Returns:
             str: A random successful user agent.
         """
-        if not self.successful_agents:
-            logging.error("No successful user agents available. Run `test_user_agents` first.")
+        if url is not None:
+            agent_ids = self.url_agents[url].ids if url in self.url_agents else array('I')
+            if device is not None:
+                agent_ids = [agent_id for agent_id in agent_ids if self._device_of(agent_id) == device]
+            if not agent_ids:
+                logger.error("No successful user agents available. Run `test_user_agents` first.")
+                return None
+            return self.store[random.choice(agent_ids)]
+
+        with self._lock:
+            self._sync_sampler()
+            if device is not None:
+                if self._device_samplers is None:
+                    self._build_device_samplers()
+                sampler, agent_ids = self._device_samplers.get(device, (None, None))
+                if sampler is None or sampler.total <= 0:
+                    logger.error("No successful %s user agents available.", device)
+                    return None
+                return self.store[agent_ids[sampler.sample()]]
+            if self._sampler.total <= 0:
+                logger.error("No successful user agents available. Run `test_user_agents` first.")
+                return None
+            return self.store[self.successful_agents.ids[self._sampler.sample()]]
+
+    def report(self, user_agent: str, status: Union[int, bool, None]) -> None:
+        """
+        Report the outcome of using a user agent, updating its selection weight.
+
+        - A 2xx status (or True) restores the agent's weight towards the maximum.
+        - A 401/403 status (or False) means the agent is blocked: it is removed from `successful_agents`.
+        - Any other status, or None for a transport failure, halves the agent's weight.
+
+        Updates take O(log n); removing an agent moves the last agent into its place.
+
+        Args:
+            user_agent (str): The user agent that was used.
+            status (int, bool or None): The HTTP status code received, a boolean verdict, or None
+                                        if the request failed without a response.
+        """
+        if isinstance(status, bool):
+            accepted, blocked = status, not status
+        else:
+            accepted = status is not None and 200 <= status < 300
+            blocked = status in self.BLOCKED_STATUS_CODES
+
+        agent_id = self.store.id_of(user_agent)
+        with self._lock:
+            self._sync_sampler()
+            position = self._positions.get(agent_id)
+            if position is None:
+                return
+            if blocked:
+                logger.debug("User-Agent '%s' was blocked, removing it from the pool.", user_agent)
+                self._remove_successful(position)
+                return
+            weight = self._sampler.weight(position)
+            weight = min(self.MAX_WEIGHT, weight * self.SUCCESS_FACTOR) if accepted else weight * self.FAILURE_FACTOR
+            self._sampler.update(position, weight)
+            if self._device_samplers is not None:
+                sampler = self._device_samplers[self._device_of(agent_id)][0]
+                sampler.update(self._device_positions[agent_id], weight)
+
+    def pool_snapshot(self) -> List[str]:
+        """
+        Return a copy of the successful user agents, taken under the pool's lock.
+
+        Returns:
+            list: The user agents currently in the pool.
+        """
+        with self._lock:
+            self._sync_sampler()
+            return [self.store[agent_id] for agent_id in self.successful_agents.ids]
+
+    def sample_untested(self, number: int) -> List[str]:
+        """
+        Pick a random sample of user agents from the file that have never been tested.
+
+        The picked agents are marked as tested, so later calls do not return them again.
+
+        Args:
+            number (int): Number of user agents to sample.
+
+        Returns:
+            list: Up to `number` user agents, fewer if the file is nearly used up.
+        """
+        if not self._load():
+            return []
+        # Sample and claim in one step, so concurrent callers never get the same agent
+        with self._tested_lock:
+            agent_ids = self._sample_untested_ids(number)
+            for agent_id in agent_ids:
+                self._mark_tested(agent_id)
+        return [self.store[agent_id] for agent_id in agent_ids]
+
+    def record_verdict(self, user_agent: str, accepted: Optional[bool]) -> None:
+        """
+        Record the verdict of a new test of a user agent.
+
+        - True adds the agent to the pool with full weight, or restores the weight of a pool member.
+        - False evicts the agent from the pool.
+        - None (an inconclusive check, e.g. a transport failure) halves the agent's weight.
+
+        Args:
+            user_agent (str): The user agent that was tested.
+            accepted (bool or None): The verdict.
+        """
+        if accepted:
+            agent_id = self.store.id_of(user_agent)
+            if agent_id is None:
+                agent_id = self.store.add(user_agent)
+            self._add_successful(agent_id)
+        self.report(user_agent, accepted)
+
+    def _add_successful(self, agent_id: int) -> None:
+        """
+        Add a user agent to the pool with full weight, ignoring agents already in it.
+
+        Args:
+            agent_id (int): The store ID of the user agent that passed the test.
+        """
+        with self._lock:
+            self._sync_sampler()
+            if agent_id in self._positions:
+                return
+            self.successful_agents.append_id(agent_id)
+            self._positions[agent_id] = self._sampler.append(self.MAX_WEIGHT)
+            if self._device_samplers is not None:
+                self._add_to_device(agent_id, self.MAX_WEIGHT)
+
+    def _remove_successful(self, position: int) -> None:
+        """
+        Remove the user agent at `position` by moving the last agent into its place. Call with the lock held.
+
+        Args:
+            position (int): The position of the agent in `successful_agents`.
+        """
+        ids = self.successful_agents.ids
+        last = len(ids) - 1
+        removed = ids[position]
+        if position != last:
+            moved = ids[last]
+            ids[position] = moved
+            self._positions[moved] = position
+            self._sampler.update(position, self._sampler.weight(last))
+        ids.pop()
+        self._sampler.pop()
+        del self._positions[removed]
+        if self._device_samplers is not None:
+            self._remove_from_device(removed)
+
+    def _sync_sampler(self) -> None:
+        """
+        Rebuild the sampler if `successful_agents` was changed directly. Call with the lock held.
+        """
+        ids = self.successful_agents.ids
+        if len(self._sampler) == len(ids):
+            return
+        self._positions = {}
+        self._sampler = WeightedSampler()
+        # Rebuilt from the new pool on the next draw by device
+        self._device_samplers = None
+        unique = []
+        for agent_id in ids:
+            if agent_id not in self._positions:
+                unique.append(agent_id)
+                self._positions[agent_id] = self._sampler.append(self.MAX_WEIGHT)
+        ids[:] = type(ids)(ids.typecode, unique)
+
+    def _build_device_samplers(self) -> None:
+        """
+        Sort the pool into one sampler per device class, keeping the weights. Call with the lock held.
+        """
+        self._device_samplers = {}
+        self._device_positions = {}
+        for position, agent_id in enumerate(self.successful_agents.ids):
+            self._add_to_device(agent_id, self._sampler.weight(position))
+
+    def _add_to_device(self, agent_id: int, weight: float) -> None:
+        """
+        Add a user agent to the sampler of its device class. Call with the lock held.
+
+        Args:
+            agent_id (int): The store ID of the user agent.
+            weight (float): Its selection weight.
+        """
+        sampler, agent_ids = self._device_samplers.setdefault(self._device_of(agent_id), (WeightedSampler(), []))
+        agent_ids.append(agent_id)
+        self._device_positions[agent_id] = sampler.append(weight)
+
+    def _remove_from_device(self, agent_id: int) -> None:
+        """
+        Remove a user agent from the sampler of its device class by moving the last agent of the
+        class into its place. Call with the lock held.
+
+        Args:
+            agent_id (int): The store ID of the user agent.
+        """
+        sampler, agent_ids = self._device_samplers[self._device_of(agent_id)]
+        position = self._device_positions.pop(agent_id)
+        last = len(agent_ids) - 1
+        if position != last:
+            moved = agent_ids[last]
+            agent_ids[position] = moved
+            self._device_positions[moved] = position
+            sampler.update(position, sampler.weight(last))
+        agent_ids.pop()
+        sampler.pop()
+
+    def _device_of(self, agent_id: int) -> str:
+        """
+        Return the device class of a user agent, parsing it on first use.
+
+        Args:
+            agent_id (int): The store ID of the user agent.
+
+        Returns:
+            str: The device class.
+        """
+        device = self._devices.get(agent_id)
+        if device is None:
+            device = self._devices[agent_id] = parse_user_agent(self.store[agent_id]).device
+        return device
+
+    def revalidate(self, test_url: str, **kwargs) -> 'PoolRevalidator':
+        """
+        Start a background `PoolRevalidator` that keeps the pool fresh.
+
+        Args:
+            test_url (str): URL of the website to re-test user agents against.
+            **kwargs: Further arguments for `PoolRevalidator`, e.g. `interval` or `budget`.
+
+        Returns:
+            PoolRevalidator: The started revalidator; call its `stop` method when done.
+        """
+        from .revalidator import PoolRevalidator
+
+        revalidator = PoolRevalidator(self, test_url, **kwargs)
+        revalidator.start()
+        return revalidator
+
+    def _mark_tested(self, agent_id: int) -> None:
+        """
+        Remember that a user agent has been tested. Call with `_tested_lock` held.
+
+        Args:
+            agent_id (int): The store ID of the user agent.
+        """
+        if agent_id >= len(self._tested):
+            self._tested.extend(bytes(len(self.store) - len(self._tested)))
+        self._tested[agent_id] = 1
+
+    def _sample_untested_ids(self, number: int) -> List[int]:
+        """
+        Pick a random sample of user agents that have never been tested. Call with `_tested_lock` held.
+
+        Args:
+            number (int): Number of user agents to sample.
+
+        Returns:
+            list: Up to `number` agent IDs, fewer if the file is nearly used up.
+        """
+        tested = self._tested
+        untested = [agent_id for agent_id in range(len(self.store))
+                    if agent_id >= len(tested) or not tested[agent_id]]
+        return random.sample(untested, min(number, len(untested)))
+
+    def _load(self) -> bool:
+        """
+        Load the user agents from the file into the store on first use.
+
+        Returns:
+            bool: False if the file was not found.
+        """
+        if not self._loaded:
+            try:
+                # Load user agents from the file into the store
+                for _, user_agent in iter_user_agents(self.file_path):
+                    self.store.add(user_agent)
+            except FileNotFoundError:
+                logger.error("File not found: %s", self.file_path)
+                return False
+            self._loaded = True
+        return True
+
+    def _sample_agent_ids(self, number: int) -> Optional[List[int]]:
+        """
+        Load the user agents from the file on first use and pick a random sample of their IDs.
+
+        With a classifier, the sample is drawn from the agents that pass its rules and only topped
+        up with agents that fail them if there are not enough.
+
+        Args:
+            number (int): Number of user agents to sample.
+
+        Returns:
+            list or None: The sampled agent IDs, or None if the file was not found.
+        """
+        if not self._load():
             return None
-        return random.choice(self.successful_agents)
+
+        available = len(self.store)
+        if available < number:
+            logger.warning("Requested %s user agents, but only %s available.", number, available)
+            number = available
+
+        if self.classifier is None:
+            return random.sample(range(available), number)
+
+        if self._classified is None:
+            passed, failed = array('I'), array('I')
+            for agent_id, user_agent in enumerate(self.store):
+                (passed if self.classifier.accepts(user_agent) else failed).append(agent_id)
+            logger.info("%s of %s user agents pass the classifier's rules.", len(passed), available)
+            self._classified = (passed, failed)
+        passed, failed = self._classified
+        if len(passed) >= number:
+            return random.sample(passed, number)
+        logger.info("Also testing %s user agents that fail the classifier's rules.", number - len(passed))
+        return random.sample(passed, len(passed)) + random.sample(failed, number - len(passed))
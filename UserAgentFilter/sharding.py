@@ -0,0 +1,393 @@
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .cache import VerdictCache
+from .proxies import ProxyPool
+from .ratelimit import HostRateLimiter
+from .preprocess import dedupe_user_agents
+from .streaming import count_lines, iter_user_agents, line_offsets
+
+logger = logging.getLogger(__name__)
+
+
+class ShardResult(NamedTuple):
+    """
+    The outcome of one shard of a sharded filtering run.
+
+    Attributes:
+        shard (int): The 0-based shard number.
+        start_line (int): Index of the first input line of the shard.
+        stop_line (int): Index one past the last input line of the shard.
+        written (int): Number of successful user agents found in the shard.
+        seconds (float): Time the shard took, or 0 if it was already complete.
+    """
+    shard: int
+    start_line: int
+    stop_line: int
+    written: int
+    seconds: float
+
+
+class ShardStats:
+    """
+    Summary of a sharded filtering run, filled in by `filter_user_agents_sharded`.
+
+    Attributes:
+        lines (int): Number of lines in the input file.
+        written (int): Number of successful user agents in the merged output.
+        seconds (float): Wall-clock time of the whole run.
+        shards (list): A `ShardResult` for every shard, in input order.
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.written = 0
+        self.seconds = 0.0
+        self.shards: List[ShardResult] = []
+
+    def __repr__(self) -> str:
+        return (f"ShardStats(lines={self.lines}, written={self.written}, "
+                f"shards={len(self.shards)}, seconds={self.seconds:.2f})")
+
+
+# A picklable recipe for an object the child processes build themselves: (class, keyword arguments)
+_Factory = Tuple[type, Dict[str, Any]]
+
+
+def _check_shareable(tester) -> None:
+    """
+    Refuse tester settings that the shards cannot share with the parent process.
+
+    Args:
+        tester (UserAgentTester): The tester of the sharded run.
+
+    Raises:
+        ValueError: If the tester has hooks (they would never see the shards' requests), an
+                    in-memory verdict cache (each shard would get its own empty one), or a
+                    transport that cannot describe its settings.
+    """
+    if tester.hooks:
+        raise ValueError("A sharded run cannot report to hooks: every shard runs in its own process. "
+                         "Use filter_user_agents or afilter_user_agents instead.")
+    if tester.cache is not None and tester.cache.path == ':memory:':
+        raise ValueError("A sharded run cannot share an in-memory verdict cache; use a cache file.")
+    try:
+        tester.transport.settings()
+    except NotImplementedError as e:
+        raise ValueError(f"A sharded run cannot rebuild the transport in its worker processes: {e}") from e
+
+
+def _write_unique(user_agents_file: str, unique_file: str, use_mmap: bool) -> None:
+    """
+    Write the distinct user agents of a file to another file, one per line, in input order.
+
+    Raises:
+        FileNotFoundError: If the input file does not exist.
+        IOError: If the input cannot be read or the output cannot be written.
+    """
+    with open(unique_file, 'w') as f:
+        for _, user_agent in dedupe_user_agents(iter_user_agents(user_agents_file, use_mmap=use_mmap)):
+            f.write(user_agent + '\n')
+
+
+def _tester_recipe(tester, shards: int) -> Tuple[type, Dict[str, Any], Dict[str, _Factory]]:
+    """
+    Describe a tester in a form that can be sent to a child process.
+
+    Transports, proxy pools, caches and rate limiters hold locks and sockets, so every shard builds
+    its own from the same settings. The rate limiter's rates are divided by the number of shards,
+    so together the shards send requests to a host no faster than the original limiter would.
+
+    Args:
+        tester (UserAgentTester): The tester to copy, checked by `_check_shareable`.
+        shards (int): The number of shards the run is split into.
+
+    Returns:
+        tuple: (tester class, plain keyword arguments, factories for the remaining arguments).
+    """
+    kwargs = {
+        'test_url': tester.test_url,
+        'proxy': tester.proxy if isinstance(tester.proxy, dict) else None,
+        'timeout': tester.timeout,
+        'max_retries': tester.max_retries,
+        'delay_range': tester.delay_range,
+        'pool_connections': tester.pool_connections,
+        'pool_maxsize': tester.pool_maxsize,
+        'keep_alive': tester.keep_alive,
+        # The parent removes duplicates from the input once, before it is split
+        'dedupe': False,
+        'probe_mode': tester.probe_mode,
+        'probe_bytes': tester.probe_bytes,
+        'classifier': tester.classifier,
+        'retry_policy': tester.retry_policy,
+        'block_detector': tester.block_detector,
+    }
+    factories: Dict[str, _Factory] = {}
+    pool = tester.proxy_pool
+    if pool is not None:
+        factories['proxy'] = (ProxyPool, {
+            'proxies': list(pool.proxies),
+            'cooldown': pool.cooldown,
+            'max_failures': pool.max_failures,
+            'smoothing': pool.smoothing,
+        })
+    transport = tester.transport
+    factories['transport'] = (type(transport), transport.settings())
+    cache = tester.cache
+    if cache is not None:
+        # SQLite serializes the writes of the shards to the same database file
+        factories['cache'] = (VerdictCache, {'path': cache.path, 'ttl': cache.ttl, 'max_entries': cache.max_entries})
+    limiter = tester.rate_limiter
+    if limiter is not None:
+        factories['rate_limiter'] = (HostRateLimiter, {
+            'rate': limiter.initial_rate / shards,
+            'burst': max(1.0, limiter.burst / shards),
+            'min_rate': limiter.min_rate / shards,
+            'max_rate': limiter.max_rate / shards,
+            'increase': limiter.increase / shards,
+            'decrease': limiter.decrease,
+        })
+    return type(tester), kwargs, factories
+
+
+def _filter_shard(
+    recipe: Tuple[type, Dict[str, Any], Dict[str, _Factory]],
+    shard: int,
+    line_range: Tuple[int, int],
+    line_offset: int,
+    user_agents_file: str,
+    shard_file: str,
+    checkpoint_file: Optional[str],
+    flush_every: int,
+    use_mmap: bool
+) -> ShardResult:
+    """
+    Filter one range of input lines into its own output file. Runs in a child process.
+
+    The shard seeks to `line_offset`, the byte offset of its first line, so it never reads the lines
+    of the shards before it. It is written to a temporary file that is renamed to `shard_file` once
+    the whole range has been processed, so a complete shard file never needs to be tested again.
+
+    Raises:
+        IOError: If the input cannot be read or the shard file cannot be written.
+    """
+    tester_class, kwargs, factories = recipe
+    kwargs = dict(kwargs, **{name: cls(**arguments) for name, (cls, arguments) in factories.items()})
+    tester = tester_class(**kwargs)
+    started = time.monotonic()
+    partial_file = shard_file + '.part'
+    try:
+        stream = tester._open_stream(user_agents_file, partial_file, checkpoint_file, flush_every, use_mmap, line_range,
+                                     line_offset)
+        if stream is None:
+            raise IOError(f"Shard {shard + 1} could not open its input or output file.")
+        agents, writer = stream
+        for _ in tester._filter_stream(agents, writer):
+            pass
+    finally:
+        tester.close()
+        if tester.cache is not None:
+            tester.cache.close()
+    os.replace(partial_file, shard_file)
+    return ShardResult(shard, line_range[0], line_range[1], writer.written, time.monotonic() - started)
+
+
+class _InProcess:
+    """
+    Run a single shard in the current process, with the interface of `ProcessPoolExecutor`.
+    """
+
+    def submit(self, function, *args) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def __enter__(self) -> '_InProcess':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+def _count_written(shard_file: str) -> int:
+    with open(shard_file, 'r') as f:
+        return sum(1 for _ in f)
+
+
+def filter_user_agents_sharded(
+    tester,
+    user_agents_file: str,
+    output_file: str,
+    processes: Optional[int] = None,
+    checkpoint_file: Optional[str] = None,
+    flush_every: int = 100,
+    use_mmap: bool = False,
+    stats: Optional[ShardStats] = None
+) -> List[str]:
+    """
+    Filter user agents across several processes, merging the results into one output file.
+
+    The input is split into `processes` contiguous ranges of lines. Each range is filtered by its
+    own process with a copy of `tester`, so it has its own sessions, proxy pool and rate limiter,
+    and writes to its own shard file. The shard files are concatenated in input order, so the
+    merged output holds the same user agents as that of `tester.filter_user_agents` and in the
+    same order, except for those retried after a transport failure (see `RetryPolicy.defer_passes`):
+    each shard writes them at the end of its own range rather than at the end of the whole output.
+
+    With `tester.dedupe`, duplicates are removed once, here, into a temporary file next to the
+    output that the shards then split; the shards themselves do not dedupe. Hooks, an in-memory
+    verdict cache and transports that cannot describe their settings cannot be shared with the
+    worker processes and are refused.
+
+    With a `checkpoint_file`, every shard saves its own checkpoint next to it, and a later call
+    with the same input, output and number of processes resumes the unfinished shards and keeps
+    the finished ones.
+
+    Args:
+        tester (UserAgentTester): The tester whose settings every shard uses.
+        user_agents_file (str): Path to the file containing user agents to test.
+        output_file (str): Path to the file where successful user agents will be saved.
+        processes (int, optional): Number of worker processes (and shards). Default is None (one per CPU).
+        checkpoint_file (str, optional): Path prefix of the shard checkpoint files. Default is None.
+        flush_every (int, optional): Number of input lines between flushes and checkpoint saves. Default is 100.
+        use_mmap (bool, optional): Memory-map an uncompressed input file. Default is False.
+        stats (ShardStats, optional): Summary to fill in. Default is None.
+
+    Returns:
+        list: The successful user agents, in input order, or an empty list if the run failed.
+
+    Raises:
+        ValueError: If `processes` is below 1 or the tester cannot be shared with worker processes.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes < 1:
+        raise ValueError("processes must be at least 1")
+    _check_shareable(tester)
+    if stats is None:
+        stats = ShardStats()
+    started = time.monotonic()
+
+    unique_file = output_file + '.unique' if tester.dedupe else None
+    try:
+        if unique_file is not None:
+            # Every shard would otherwise reread the input from its first line to know what it saw
+            _write_unique(user_agents_file, unique_file, use_mmap)
+        stats.lines = count_lines(unique_file or user_agents_file)
+    except FileNotFoundError:
+        logger.error("Error: The file '%s' was not found.", user_agents_file)
+        _remove(unique_file)
+        return []
+    except IOError:
+        logger.error("Error: Unable to read the file '%s'. Check file permissions.", user_agents_file)
+        _remove(unique_file)
+        return []
+
+    try:
+        return _run_shards(tester, unique_file or user_agents_file, output_file, processes, checkpoint_file,
+                           flush_every, use_mmap, stats, started)
+    finally:
+        _remove(unique_file)
+
+
+def _remove(path: Optional[str]) -> None:
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+def _run_shards(
+    tester,
+    user_agents_file: str,
+    output_file: str,
+    processes: int,
+    checkpoint_file: Optional[str],
+    flush_every: int,
+    use_mmap: bool,
+    stats: ShardStats,
+    started: float
+) -> List[str]:
+    """
+    Split the input into shards, filter them in worker processes and merge their outputs.
+
+    Returns:
+        list: The successful user agents, in input order, or an empty list if the run failed.
+    """
+
+    # Split the lines as evenly as possible; the first shards take one extra line each
+    shards = max(1, min(processes, stats.lines))
+    size, extra = divmod(stats.lines, shards)
+    bounds = [shard * size + min(shard, extra) for shard in range(shards + 1)]
+    ranges = list(zip(bounds, bounds[1:]))
+    # Find where every shard starts in one pass over the file; a gzip input is read from the start
+    try:
+        offsets = line_offsets(user_agents_file, bounds[:-1]) or [0] * shards
+    except IOError:
+        logger.error("Error: Unable to read the file '%s'. Check file permissions.", user_agents_file)
+        return []
+    shard_files = [f"{output_file}.{shard + 1}-of-{shards}" for shard in range(shards)]
+    recipe = _tester_recipe(tester, shards)
+
+    results: Dict[int, ShardResult] = {}
+    pending = []
+    for shard, (line_range, line_offset, shard_file) in enumerate(zip(ranges, offsets, shard_files)):
+        if checkpoint_file and os.path.exists(shard_file):
+            logger.info("Shard %s of %s is already complete.", shard + 1, shards)
+            results[shard] = ShardResult(shard, line_range[0], line_range[1], _count_written(shard_file), 0.0)
+            continue
+        shard_checkpoint = f"{checkpoint_file}.{shard + 1}-of-{shards}" if checkpoint_file else None
+        pending.append((recipe, shard, line_range, line_offset, user_agents_file, shard_file, shard_checkpoint,
+                        flush_every, use_mmap))
+
+    logger.info("Filtering %s lines in %s shards with %s processes.", stats.lines, shards, min(processes, len(pending)))
+    failed = False
+    pending_results = []
+    with ProcessPoolExecutor(max_workers=processes) if len(pending) > 1 else _InProcess() as executor:
+        futures = [executor.submit(_filter_shard, *arguments) for arguments in pending]
+        for arguments, future in zip(pending, futures):
+            try:
+                pending_results.append(future.result())
+            except (IOError, OSError) as e:
+                logger.error("Error: Shard %s of %s failed: %s", arguments[1] + 1, shards, e)
+                failed = True
+    for result in pending_results:
+        results[result.shard] = result
+
+    if failed:
+        if not checkpoint_file:
+            # Without checkpoints the finished shards cannot be reused
+            for shard_file in shard_files:
+                if os.path.exists(shard_file):
+                    os.remove(shard_file)
+        return []
+
+    # Merge the shard files in input order, replacing the output atomically
+    try:
+        temp_file = output_file + '.tmp'
+        with open(temp_file, 'wb') as merged:
+            for shard_file in shard_files:
+                with open(shard_file, 'rb') as f:
+                    shutil.copyfileobj(f, merged)
+        os.replace(temp_file, output_file)
+    except IOError:
+        logger.error("Error: Unable to write to the file '%s'. Check file permissions.", output_file)
+        return []
+    for shard_file in shard_files:
+        os.remove(shard_file)
+
+    stats.shards = [results[shard] for shard in range(shards)]
+    stats.written = sum(result.written for result in stats.shards)
+    stats.seconds = time.monotonic() - started
+    for result in stats.shards:
+        logger.info("Shard %d: lines %d-%d, %d successful user agents in %.2f seconds.",
+                    result.shard + 1, result.start_line + 1, result.stop_line, result.written, result.seconds)
+    tester._log_summary(output_file, stats.written)
+
+    with open(output_file, 'r') as f:
+        return [line.rstrip('\n') for line in f]
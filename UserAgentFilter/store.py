@@ -0,0 +1,323 @@
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import MutableSequence
+from typing import Iterable, Iterator, List, Optional, Union
+
+from .streaming import iter_user_agents
+
+
+class AgentStore:
+    """
+    A compact, interned store of user agent strings.
+
+    All user agents live in one contiguous UTF-8 buffer with an offset array, and are referred to
+    by integer ID (their position in the store). Adding a user agent that is already stored returns
+    the existing ID, so every distinct string is kept exactly once. Lookups by string use an
+    open-addressing hash table of IDs, which costs a few bytes per agent instead of a dictionary
+    entry per string.
+
+    A store can be saved to a file and opened again with `open`, which memory-maps the file: the
+    strings and offsets are then served from the OS page cache and shared by every process that
+    opens the same file. Agents added to an opened store are kept in memory next to the mapped part.
+    """
+
+    # File header: magic, then the number of agents as a little-endian 64-bit integer
+    MAGIC = b'UAFSTOR1'
+    HEADER = struct.Struct('<8sQ')
+
+    def __init__(self, agents: Iterable[str] = ()):
+        """
+        Initialize an in-memory store.
+
+        Args:
+            agents (iterable, optional): User agents to add. Default is empty.
+        """
+        # Read-only part backed by a memory-mapped file (empty for in-memory stores)
+        self._base_buffer: Union[bytes, memoryview] = b''
+        self._base_offsets: Union[array, memoryview] = array('Q', [0])
+        self._base_count = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._views: List[memoryview] = []
+        # Writable part holding agents added in memory
+        self._buffer = bytearray()
+        self._offsets = array('Q', [0])
+        # Hash table of IDs (-1 marks an empty slot), built on first lookup
+        self._table: Optional[array] = None
+        for agent in agents:
+            self.add(agent)
+
+    @classmethod
+    def from_file(cls, user_agents_file: str, use_mmap: bool = False) -> 'AgentStore':
+        """
+        Build a store from a text file with one user agent per line (optionally gzip-compressed).
+
+        Args:
+            user_agents_file (str): Path to the file containing user agents.
+            use_mmap (bool, optional): Memory-map an uncompressed input file while reading it. Default is False.
+
+        Returns:
+            AgentStore: The store, with IDs in order of first appearance in the file.
+        """
+        return cls(agent for _, agent in iter_user_agents(user_agents_file, use_mmap=use_mmap))
+
+    @classmethod
+    def is_store_file(cls, path: str) -> bool:
+        """
+        Check whether a file is a store saved with `save`.
+
+        Args:
+            path (str): Path to the file.
+
+        Returns:
+            bool: True if the file starts with the store header.
+        """
+        try:
+            with open(path, 'rb') as f:
+                return f.read(len(cls.MAGIC)) == cls.MAGIC
+        except (IOError, OSError):
+            return False
+
+    @classmethod
+    def open(cls, path: str) -> 'AgentStore':
+        """
+        Open a store saved with `save`, memory-mapping its contents.
+
+        Args:
+            path (str): Path to the store file.
+
+        Returns:
+            AgentStore: The store.
+
+        Raises:
+            ValueError: If the file is not a store file.
+        """
+        store = cls()
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = cls.HEADER.unpack_from(mapped)
+        if magic != cls.MAGIC:
+            mapped.close()
+            raise ValueError(f"'{path}' is not a user agent store file")
+
+        view = memoryview(mapped)
+        offsets_start = cls.HEADER.size
+        buffer_start = offsets_start + 8 * (count + 1)
+        offsets = view[offsets_start:buffer_start]
+        if sys.byteorder == 'little':
+            store._base_offsets = offsets.cast('Q')
+        else:
+            # The file stores offsets little-endian; convert them once on big-endian machines
+            store._base_offsets = array('Q', offsets.tobytes())
+            store._base_offsets.byteswap()
+        store._base_buffer = view[buffer_start:]
+        store._base_count = count
+        store._mmap = mapped
+        # Views must be released before the mapping can be closed
+        store._views = [view, offsets, store._base_buffer]
+        if isinstance(store._base_offsets, memoryview):
+            store._views.append(store._base_offsets)
+        return store
+
+    def save(self, path: str) -> None:
+        """
+        Save the store to a file that can be memory-mapped with `open`.
+
+        Args:
+            path (str): Path to the file to write.
+        """
+        offsets = array('Q', self._base_offsets)
+        base_size = offsets[-1]
+        offsets.extend(base_size + offset for offset in self._offsets[1:])
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, len(self)))
+            f.write(offsets.tobytes())
+            f.write(self._base_buffer)
+            f.write(self._buffer)
+
+    def close(self) -> None:
+        """
+        Release the memory-mapped file of an opened store. The store must not be used afterwards.
+        """
+        if self._mmap is not None:
+            self._base_buffer = b''
+            self._base_offsets = array('Q', [0])
+            self._base_count = 0
+            self._table = None
+            for view in reversed(self._views):
+                view.release()
+            self._views = []
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> 'AgentStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._base_count + len(self._offsets) - 1
+
+    def __getitem__(self, agent_id: int) -> str:
+        return self.get_bytes(agent_id).decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for agent_id in range(len(self)):
+            yield self[agent_id]
+
+    def __contains__(self, user_agent: object) -> bool:
+        return isinstance(user_agent, str) and self.id_of(user_agent) is not None
+
+    def get_bytes(self, agent_id: int) -> bytes:
+        """
+        Return the UTF-8 encoded user agent with the given ID.
+
+        Args:
+            agent_id (int): The ID of the user agent.
+
+        Returns:
+            bytes: The encoded user agent.
+        """
+        if not 0 <= agent_id < len(self):
+            raise IndexError("agent ID out of range")
+        if agent_id < self._base_count:
+            return bytes(self._base_buffer[self._base_offsets[agent_id]:self._base_offsets[agent_id + 1]])
+        agent_id -= self._base_count
+        return bytes(self._buffer[self._offsets[agent_id]:self._offsets[agent_id + 1]])
+
+    def add(self, user_agent: str) -> int:
+        """
+        Add a user agent, or return its ID if it is already stored.
+
+        Args:
+            user_agent (str): The user agent string.
+
+        Returns:
+            int: The ID of the user agent.
+        """
+        encoded = user_agent.encode('utf-8')
+        slot = self._find_slot(encoded)
+        agent_id = self._table[slot]
+        if agent_id >= 0:
+            return agent_id
+
+        self._buffer += encoded
+        self._offsets.append(len(self._buffer))
+        agent_id = len(self) - 1
+        self._table[slot] = agent_id
+        if 2 * len(self) > len(self._table):
+            self._resize(2 * len(self._table))
+        return agent_id
+
+    def id_of(self, user_agent: str) -> Optional[int]:
+        """
+        Look up the ID of a user agent.
+
+        Args:
+            user_agent (str): The user agent string.
+
+        Returns:
+            int or None: The ID, or None if the user agent is not stored.
+        """
+        agent_id = self._table_for_lookup()[self._find_slot(user_agent.encode('utf-8'))]
+        return agent_id if agent_id >= 0 else None
+
+    def _table_for_lookup(self) -> array:
+        if self._table is None:
+            self._resize(max(16, 1 << (2 * len(self)).bit_length()))
+        return self._table
+
+    def _find_slot(self, encoded: bytes) -> int:
+        # Linear probing: return the slot holding `encoded`, or the empty slot where it belongs
+        table = self._table_for_lookup()
+        mask = len(table) - 1
+        slot = hash(encoded) & mask
+        while True:
+            agent_id = table[slot]
+            if agent_id < 0 or self.get_bytes(agent_id) == encoded:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _resize(self, capacity: int) -> None:
+        table = array('q', [-1]) * capacity
+        mask = capacity - 1
+        for agent_id in range(len(self)):
+            slot = hash(self.get_bytes(agent_id)) & mask
+            while table[slot] >= 0:
+                slot = (slot + 1) & mask
+            table[slot] = agent_id
+        self._table = table
+
+
+class AgentList(MutableSequence):
+    """
+    A list of user agents stored as integer IDs into an `AgentStore`.
+
+    It behaves like a list of strings: items are resolved through the store when read, and strings
+    assigned or appended are interned in the store. Each entry costs four bytes, so several lists
+    over the same store (sampled, successful, per-URL agents) share the strings instead of copying them.
+    """
+
+    def __init__(self, store: AgentStore, agents: Iterable[str] = ()):
+        """
+        Initialize the list.
+
+        Args:
+            store (AgentStore): The store the IDs refer to.
+            agents (iterable, optional): Initial user agents. Default is empty.
+        """
+        self.store = store
+        self.ids = array('I')
+        self.extend(agents)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store[agent_id] for agent_id in self.ids[index]]
+        return self.store[self.ids[index]]
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            self.ids[index] = array('I', (self.store.add(agent) for agent in value))
+        else:
+            self.ids[index] = self.store.add(value)
+
+    def __delitem__(self, index) -> None:
+        del self.ids[index]
+
+    def insert(self, index: int, value: str) -> None:
+        self.ids.insert(index, self.store.add(value))
+
+    def append_id(self, agent_id: int) -> None:
+        """
+        Append a user agent by its ID in the store.
+
+        Args:
+            agent_id (int): The ID of the user agent.
+        """
+        self.ids.append(agent_id)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, AgentList):
+            return list(self) == list(other)
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"AgentList({list(self)!r})"
+
+    def to_list(self) -> List[str]:
+        """
+        Return the user agents as a plain list of strings.
+
+        Returns:
+            list: The user agents.
+        """
+        return list(self)
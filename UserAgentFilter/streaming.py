@@ -0,0 +1,339 @@
+import gzip
+import json
+import logging
+import mmap
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Magic bytes at the start of every gzip file
+GZIP_MAGIC = b'\x1f\x8b'
+
+logger = logging.getLogger(__name__)
+
+
+def iter_user_agents(
+    user_agents_file: str,
+    start: int = 0,
+    use_mmap: bool = False,
+    offset: int = 0,
+    offset_line: int = 0
+) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily read user agents from a file, one line at a time.
+
+    Gzip-compressed files are detected by their magic bytes and decompressed on the fly. With
+    `use_mmap` an uncompressed file is memory-mapped instead of read through a buffered file
+    object, which lets the OS page cache back very large inputs. In every mode only the current
+    line is held in memory.
+
+    Args:
+        user_agents_file (str): Path to the file containing user agents, optionally gzip-compressed.
+        start (int, optional): Number of lines to skip, used to resume an interrupted run. Default is 0.
+        use_mmap (bool, optional): Memory-map an uncompressed input file. Default is False.
+        offset (int, optional): Byte offset to start reading an uncompressed file at, as returned by
+                                `line_offsets`; lines before it are neither read nor skipped. Default is 0.
+        offset_line (int, optional): Index of the line that starts at `offset`. Default is 0.
+
+    Yields:
+        tuple: (line_index, user_agent) for every non-empty line, with surrounding whitespace stripped.
+               `line_index` is the 0-based line number in the file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        IOError: If the file cannot be read.
+    """
+    with open(user_agents_file, 'rb') as raw:
+        compressed = raw.read(2) == GZIP_MAGIC
+        raw.seek(0)
+
+        if compressed:
+            # A gzip stream cannot seek without decompressing, so it is always read from the start
+            lines = gzip.open(raw, 'rb')
+            offset = offset_line = 0
+        elif use_mmap and os.fstat(raw.fileno()).st_size > 0:
+            lines = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            lines = raw
+
+        try:
+            lines.seek(offset)
+            for index, line in enumerate(iter(lines.readline, b''), offset_line):
+                if index < start:
+                    continue
+                user_agent = line.decode('utf-8', errors='replace').strip()
+                if user_agent:
+                    yield index, user_agent
+        finally:
+            if lines is not raw:
+                lines.close()
+
+
+def count_lines(user_agents_file: str) -> int:
+    """
+    Count the lines of a user agent file, as numbered by `iter_user_agents`.
+
+    The file is read in large blocks, so counting is much faster than iterating over the lines.
+
+    Args:
+        user_agents_file (str): Path to the file, optionally gzip-compressed.
+
+    Returns:
+        int: The number of lines, including empty ones and a last line without a newline.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        IOError: If the file cannot be read.
+    """
+    with open(user_agents_file, 'rb') as raw:
+        compressed = raw.read(2) == GZIP_MAGIC
+        raw.seek(0)
+        blocks = gzip.open(raw, 'rb') if compressed else raw
+
+        try:
+            lines = 0
+            last = b'\n'
+            for block in iter(lambda: blocks.read(1 << 20), b''):
+                lines += block.count(b'\n')
+                last = block[-1:]
+            # A last line without a trailing newline is still a line
+            return lines + (last != b'\n')
+        finally:
+            if blocks is not raw:
+                blocks.close()
+
+
+def line_offsets(user_agents_file: str, line_indices: List[int]) -> Optional[List[int]]:
+    """
+    Find the byte offsets at which lines of an uncompressed user agent file start.
+
+    The file is read once in large blocks, like `count_lines`, so readers of the later lines can
+    seek to them with `iter_user_agents(offset=...)` instead of reading every line before them.
+
+    Args:
+        user_agents_file (str): Path to the file.
+        line_indices (list): 0-based indices of the lines, as numbered by `iter_user_agents`.
+
+    Returns:
+        list or None: The offset of each line (the size of the file for lines past its end), or None
+                      for a gzip-compressed file, which cannot be entered at an offset.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        IOError: If the file cannot be read.
+    """
+    targets = iter(sorted(set(line_indices)))
+    target = next(targets, None)
+    offsets: Dict[int, int] = {}
+    with open(user_agents_file, 'rb') as raw:
+        if raw.read(2) == GZIP_MAGIC:
+            return None
+        raw.seek(0)
+
+        lines = position = 0
+        for block in iter(lambda: raw.read(1 << 20), b''):
+            count = block.count(b'\n')
+            # Walk the newlines of this block only as far as the targets that start in it
+            seen, cursor = lines, 0
+            while target is not None and target <= lines + count:
+                while seen < target:
+                    cursor = block.index(b'\n', cursor) + 1
+                    seen += 1
+                offsets[target] = position + cursor
+                target = next(targets, None)
+            lines += count
+            position += len(block)
+    while target is not None:
+        offsets[target] = position
+        target = next(targets, None)
+    return [offsets[index] for index in line_indices]
+
+
+class AgentWriter:
+    """
+    Write successful user agents to the output file as they are found, with checkpointing.
+
+    Agents are flushed to disk every `flush_every` processed lines. When a `checkpoint_file` is
+    given, the number of input lines processed so far is saved right after each flush, so the
+    checkpoint never claims more than what is already in the output file. A later run with the
+    same checkpoint file resumes from that line and appends to the existing output.
+
+    Lines put aside to be tested again later (after a transport failure) are saved in the
+    checkpoint with their user agents until they get a final verdict, so a resumed run tests
+    them again (see `defer` and `pending`).
+    """
+
+    def __init__(self, output_file: str, checkpoint_file: Optional[str] = None, flush_every: int = 100):
+        """
+        Open the output file, resuming from the checkpoint if there is one.
+
+        Args:
+            output_file (str): Path to the file where successful user agents are written.
+            checkpoint_file (str, optional): Path to the checkpoint file. Default is None (no checkpointing).
+            flush_every (int, optional): Number of processed lines between flushes and checkpoints. Default is 100.
+
+        Raises:
+            IOError: If the output file cannot be opened.
+        """
+        if flush_every < 1:
+            raise ValueError("flush_every must be at least 1")
+
+        self.output_file = output_file
+        self.checkpoint_file = checkpoint_file
+        self.flush_every = flush_every
+        self.start_line = 0
+        self.written = 0
+        # Number of agents written by the interrupted run this one resumes
+        self.resumed_written = 0
+        # Processed lines still waiting for a final verdict: line index -> user agent
+        self._pending: Dict[int, str] = {}
+
+        checkpoint = self._load_checkpoint()
+        if checkpoint is not None:
+            self.start_line = checkpoint['next_line']
+            self.written = self.resumed_written = checkpoint['written']
+            self._pending = dict(checkpoint['pending'])
+            logger.info("Resuming from line %s with %s user agents already written.", self.start_line + 1, self.written)
+            self._file = open(output_file, 'r+')
+            # Drop anything written after the last checkpoint so no agent appears twice
+            self._truncate_to(self.written)
+        else:
+            self._file = open(output_file, 'w')
+
+        self._next_line = self.start_line
+        self._unflushed = 0
+
+    def write(self, user_agent: str) -> None:
+        """
+        Append a successful user agent to the output file.
+
+        Args:
+            user_agent (str): The user agent that passed the test.
+        """
+        self._file.write(user_agent + '\n')
+        self.written += 1
+
+    def advance(self, next_line: int) -> None:
+        """
+        Record that every input line before `next_line` has been processed.
+
+        Advancing to an earlier line (e.g. after a deferred line got its verdict) is ignored.
+
+        Args:
+            next_line (int): The index of the first input line not processed yet.
+        """
+        if next_line <= self._next_line:
+            return
+        self._unflushed += next_line - self._next_line
+        self._next_line = next_line
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def defer(self, index: int, user_agent: str) -> None:
+        """
+        Record that an input line was processed but will be tested again later.
+
+        The line is saved in the checkpoint until `resolve` is called for it.
+
+        Args:
+            index (int): The index of the input line.
+            user_agent (str): The user agent read from the line.
+        """
+        self._pending[index] = user_agent
+        self.advance(index + 1)
+
+    def resolve(self, index: int) -> None:
+        """
+        Record that a deferred input line got its final verdict. Other lines are ignored.
+
+        Args:
+            index (int): The index of the input line.
+        """
+        if self._pending.pop(index, None) is None:
+            return
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def pending(self) -> List[Tuple[int, str]]:
+        """
+        Return the deferred lines that have no final verdict yet, e.g. those of a resumed run.
+
+        Returns:
+            list: (line_index, user_agent) pairs in input order.
+        """
+        return sorted(self._pending.items())
+
+    def flush(self) -> None:
+        """
+        Flush the output file and save the checkpoint.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed = 0
+        if self.checkpoint_file:
+            temp_file = self.checkpoint_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump({'next_line': self._next_line, 'written': self.written,
+                           'pending': self.pending()}, f)
+            # Replace atomically so a crash never leaves a half-written checkpoint
+            os.replace(temp_file, self.checkpoint_file)
+
+    def close(self, completed: bool = True) -> None:
+        """
+        Flush and close the output file.
+
+        Args:
+            completed (bool, optional): True if the whole input was processed, in which case the
+                                        checkpoint file is removed. Default is True.
+        """
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        if completed and self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+    def read_written(self) -> Iterator[str]:
+        """
+        Read back the user agents written before this run resumed.
+
+        Yields:
+            str: Each user agent written by the interrupted run, in order.
+        """
+        with open(self.output_file, 'r') as f:
+            for _, line in zip(range(self.resumed_written), f):
+                yield line.rstrip('\n')
+
+    def _load_checkpoint(self) -> Optional[dict]:
+        if not self.checkpoint_file or not os.path.exists(self.checkpoint_file):
+            return None
+        if not os.path.exists(self.output_file):
+            logger.warning("Ignoring checkpoint '%s': output file '%s' is missing.", self.checkpoint_file, self.output_file)
+            return None
+        try:
+            with open(self.checkpoint_file, 'r') as f:
+                checkpoint = json.load(f)
+            checkpoint = {
+                'next_line': int(checkpoint['next_line']),
+                'written': int(checkpoint['written']),
+                # Checkpoints written before deferred lines were saved have no 'pending' entry
+                'pending': [(int(index), str(agent)) for index, agent in checkpoint.get('pending', ())]
+            }
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring unreadable checkpoint '%s'.", self.checkpoint_file)
+            return None
+        return checkpoint
+
+    def _truncate_to(self, lines: int) -> None:
+        # Keep the first `lines` lines of the output file and position at its end
+        for _ in range(lines):
+            if not self._file.readline():
+                break
+        self._file.truncate(self._file.tell())
+        self._file.seek(0, os.SEEK_END)
+
+    def __enter__(self) -> 'AgentWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close(completed=exc_type is None)
@@ -2,11 +2,67 @@ import requests
 import time
 import random
 import urllib3
+import asyncio
+import functools
+import itertools
 import logging
-from typing import Optional, Dict, List, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Union, Iterable, Iterator, Tuple, Deque, AsyncIterator, Callable
+from urllib.parse import urlparse
 
-# Configure logging to display the time, log level, and message
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from .adapters import connection_timings, reset_connection_timings
+from .cache import VerdictCache
+from .classifier import AgentClassifier, classify_user_agents
+from .content import BLOCK_PAGE_STATUS, BlockDetector
+from .log import ProgressReporter
+from .metrics import CheckResult
+from .predictor import PredictionQueue, VerdictPredictor
+from .preprocess import dedupe_user_agents
+from .proxies import ProxyPool
+from .ratelimit import HostRateLimiter, parse_retry_after
+from .retry import ACCEPTED, REJECTED, TRANSPORT_FAILURE, RetryPolicy
+from .sharding import ShardStats, filter_user_agents_sharded
+from .streaming import AgentWriter, iter_user_agents
+from .transport import HEAD_UNSUPPORTED_STATUS_CODES, ProbeRequest, ProbeResponse, RequestsTransport, Transport
+
+# Per-agent messages are logged at DEBUG level; use `log.configure_logging` to see the package's log output
+logger = logging.getLogger(__name__)
+
+
+class _HostPacer:
+    """
+    Space out request start times per target host for the asynchronous filtering modes.
+
+    Each host gets `lanes` independent schedules, one per concurrent worker: a request reserves
+    the earliest free slot among its host's lanes and that lane's next slot is pushed back by a
+    random delay drawn from `delay_range`. Every worker thus keeps the human-like spacing of the
+    sequential mode, so up to `lanes` requests to one host can overlap and a host sees about
+    `lanes / mean(delay_range)` requests per second. Requests to different hosts never wait on
+    each other. The pacer is only used from a single event loop, so no locking is required.
+    """
+
+    def __init__(self, delay_range: tuple, lanes: int = 1):
+        self.delay_range = delay_range
+        self.lanes = lanes
+        # Per host: the next free start time of each lane
+        self._next_slots: Dict[str, List[float]] = {}
+
+    async def wait(self, host: str) -> None:
+        """
+        Wait until the next request to `host` may start.
+
+        Args:
+            host (str): The network location (host[:port]) the request is sent to.
+        """
+        now = asyncio.get_event_loop().time()
+        lanes = self._next_slots.setdefault(host, [now] * self.lanes)
+        lane = min(range(self.lanes), key=lanes.__getitem__)
+        slot = max(now, lanes[lane])
+        # Reserve the slot and push the lane's next one back by a human-like delay
+        lanes[lane] = slot + random.uniform(*self.delay_range)
+        if slot > now:
+            await asyncio.sleep(slot - now)
 
 
 class UserAgentTester:
@@ -17,37 +73,122 @@ class UserAgentTester:
     It handles errors, retries requests for transient issues, and applies random delays to mimic human behavior.
     """
 
+    # Supported values of `probe_mode`
+    PROBE_MODES = ('get', 'head', 'stream', 'capped')
+
+    # Status codes that mean the server does not support HEAD for the URL
+    HEAD_UNSUPPORTED_STATUS_CODES = HEAD_UNSUPPORTED_STATUS_CODES
+
+    # A progress line is logged every PROGRESS_EVERY user agents or PROGRESS_INTERVAL seconds
+    PROGRESS_EVERY = 1000
+    PROGRESS_INTERVAL = 10.0
+
     def __init__(
         self,
         test_url: str,
-        proxy: Optional[Union[Dict[str, str], List[str]]] = None,
+        proxy: Optional[Union[Dict[str, str], List[str], ProxyPool]] = None,
         timeout: int = 10,
         max_retries: int = 3,
-        delay_range: tuple = (3, 8)
+        delay_range: tuple = (3, 8),
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        keep_alive: bool = True,
+        cache: Optional[VerdictCache] = None,
+        dedupe: bool = False,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        probe_mode: str = 'get',
+        probe_bytes: int = 1024,
+        hooks: Optional[Iterable[Callable[[CheckResult], None]]] = None,
+        classifier: Optional[AgentClassifier] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        block_detector: Optional[BlockDetector] = None,
+        transport: Optional[Transport] = None
     ):
         """
         Initialize the UserAgentTester class.
 
         Args:
             test_url (str): The URL to test each user agent against.
-            proxy (dict or list, optional): A dictionary containing a single proxy setting or a list of proxy strings. Default is None.
+            proxy (dict, list or ProxyPool, optional): A dictionary containing a single proxy setting, a list of proxy strings
+                                                       or a `ProxyPool`. A list is wrapped in a `ProxyPool`. Default is None.
             timeout (int, optional): Timeout for the request in seconds. Default is 10.
-            max_retries (int, optional): Maximum number of retries for transient errors. Default is 3.
+            max_retries (int, optional): Maximum number of attempts per check, used when no `retry_policy` is
+                                         given. Default is 3.
             delay_range (tuple, optional): A tuple specifying the min and max delay (in seconds)
                                            between requests. Default is (3, 8).
+            pool_connections (int, optional): Number of per-host connection pools cached by each session. Default is 10.
+            pool_maxsize (int, optional): Maximum number of connections kept open per host by each session.
+                                          Should be at least the concurrency used with `afilter_user_agents`. Default is 10.
+            keep_alive (bool, optional): Reuse connections between checks. If False, every request asks the server
+                                         to close the connection. Default is True.
+            cache (VerdictCache, optional): A persistent verdict cache. User agents with a fresh verdict for
+                                            the host of `test_url` are not sent again. Default is None.
+            dedupe (bool, optional): Normalize user agents (whitespace, quotes, junk suffixes such as ",gzip(gfe)")
+                                     and drop duplicates before any request is sent. Default is False.
+            rate_limiter (HostRateLimiter, optional): An adaptive per-host rate limiter. When set, every request
+                                                      waits for its host's token bucket and the fixed `delay_range`
+                                                      sleeps are not used. Default is None.
+            probe_mode (str, optional): How much of each response is downloaded. One of:
+                                        'get' - a plain GET that downloads the whole body (the original behavior),
+                                        'head' - a HEAD request, falling back to a streamed GET if HEAD is not allowed,
+                                        'stream' - a GET whose connection is closed right after the headers,
+                                        'capped' - a GET that reads at most `probe_bytes` of the body.
+                                        Default is 'get'.
+            probe_bytes (int, optional): Number of body bytes read in 'capped' mode. Default is 1024.
+            hooks (iterable, optional): Callables that receive a `CheckResult` for every request attempt,
+                                        e.g. a `MetricsAggregator`. Default is None.
+            classifier (AgentClassifier, optional): Rules that skip malformed, bot and outdated user agents
+                                                    read from a file before any request is sent. Default is None.
+            retry_policy (RetryPolicy, optional): Which failures are retried, with what backoff and time budget.
+                                                  Default is None (`RetryPolicy(max_attempts=max_retries)`).
+            block_detector (BlockDetector, optional): Searches the start of every 200 response for captcha and
+                                                      robot-check pages, which then count as rejections. Needs
+                                                      probe_mode 'get' or 'capped'. Default is None.
+            transport (Transport, optional): The HTTP backend that sends the requests, e.g. an `HTTPXTransport`
+                                             for HTTP/2 or a `FakeTransport` in tests. Default is None
+                                             (a `RequestsTransport` built from the pool and keep-alive settings).
         """
+        if probe_mode not in self.PROBE_MODES:
+            raise ValueError(f"probe_mode must be one of {', '.join(self.PROBE_MODES)}")
+        if block_detector is not None and probe_mode in ('head', 'stream'):
+            raise ValueError("block_detector needs a probe_mode that reads the body ('get' or 'capped')")
+
         # Disable InsecureRequestWarnings from urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
         self.test_url = test_url
         self.proxy = proxy
+        # Health-scored pool for proxy lists; a single proxy dictionary is used as is
+        if isinstance(proxy, ProxyPool):
+            self.proxy_pool: Optional[ProxyPool] = proxy
+        elif isinstance(proxy, list) and proxy:
+            self.proxy_pool = ProxyPool(proxy)
+        else:
+            self.proxy_pool = None
         self.timeout = timeout
         self.max_retries = max_retries
         self.delay_range = delay_range
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.cache = cache
+        self.dedupe = dedupe
+        self.rate_limiter = rate_limiter
+        self.probe_mode = probe_mode
+        self.probe_bytes = probe_bytes
+        self.hooks: List[Callable[[CheckResult], None]] = list(hooks or ())
+        self.classifier = classifier
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy(max_attempts=max_retries)
+        self.block_detector = block_detector
+        if transport is None:
+            transport = RequestsTransport(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                          keep_alive=keep_alive)
+        self.transport = transport
         self.common_headers = {
             'User-Agent': '',  # User-Agent will be set for each request
             'Accept': 'application/json, text/javascript, */*; q=0.01',
-            'Accept-Encoding': 'gzip, deflate, br, zstd',
+            # Only advertise the encodings the transport can decode
+            'Accept-Encoding': transport.accept_encoding,
             'Accept-Language': 'en-IN,en-GB;q=0.9,en-US;q=0.8,en;q=0.7,ml;q=0.6',
             'Cache-Control': 'no-cache',
             'Sec-Fetch-Dest': 'empty',
@@ -56,27 +197,168 @@ class UserAgentTester:
             'X-Requested-With': 'XMLHttpRequest'
         }
 
-    def get_proxy(self) -> Optional[Dict[str, str]]:
+    def get_proxy(self, exclude: Iterable[str] = ()) -> Optional[Dict[str, str]]:
         """
         Retrieve the proxy setting for the request.
 
-        This method handles both single proxy settings as a dictionary or choosing a random proxy from a list.
+        This method handles both single proxy settings as a dictionary or choosing a proxy from the
+        proxy pool, weighted by health score and skipping proxies in cooldown.
+
+        Args:
+            exclude (iterable, optional): Pool proxies not to choose, e.g. ones that already failed.
 
         Returns:
-            dict or None: A dictionary containing the proxy setting, or None if no proxy is set.
+            dict or None: A dictionary containing the proxy setting, or None if no proxy is set
+                          (or every pool proxy is excluded).
         """
         if isinstance(self.proxy, dict):
             # If the proxy is a single dictionary, use it directly
             return self.proxy
-        elif isinstance(self.proxy, list) and self.proxy:
-            # If the proxy is a list, choose a random proxy string and format it as a dictionary
-            proxy_string = random.choice(self.proxy)
-            return {"https": proxy_string}
+        elif self.proxy_pool is not None:
+            # Choose a healthy proxy from the pool and use it for both HTTP and HTTPS
+            proxy_string = self.proxy_pool.choose(exclude)
+            return ProxyPool.as_requests_proxies(proxy_string) if proxy_string else None
         else:
             # No proxy setting
             return None
 
-    def check_user_agent(self, user_agent: str) -> bool:
+    def add_hook(self, hook: Callable[[CheckResult], None]) -> None:
+        """
+        Register a callable that receives a `CheckResult` for every request attempt.
+
+        Hooks are called on the thread that made the request, so they must be thread-safe when the
+        concurrent filtering modes are used. An exception raised by a hook is logged and ignored.
+
+        Args:
+            hook (callable): The hook to add.
+        """
+        self.hooks.append(hook)
+
+    def close(self) -> None:
+        """
+        Close the transport's pooled connections.
+
+        The tester can still be used afterwards; new connections are opened on demand.
+        """
+        self.transport.close()
+
+    def __enter__(self) -> 'UserAgentTester':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _cached_verdict(self, user_agent: str, url: Optional[str] = None) -> Optional[bool]:
+        """
+        Look up a fresh verdict for a user agent in the verdict cache.
+
+        Args:
+            user_agent (str): The user agent string to look up.
+            url (str, optional): The URL the user agent is tested against. Default is None (use `self.test_url`).
+
+        Returns:
+            bool or None: The cached verdict, or None if there is no cache or no fresh verdict.
+        """
+        if self.cache is None:
+            return None
+        url = url or self.test_url
+        verdict = self.cache.get(user_agent, urlparse(url).netloc)
+        if verdict is None:
+            return None
+        logger.debug("Cached: User-Agent '%s' received status code %s for %s.", user_agent, verdict.status_code, url)
+        return verdict.accepted
+
+    def _report_proxy(
+        self,
+        proxy: Optional[Dict[str, str]],
+        status_code: Optional[int] = None,
+        latency: Optional[float] = None,
+        error: bool = False
+    ) -> None:
+        """
+        Report the outcome of a request to the proxy pool, if the proxy came from one.
+
+        Args:
+            proxy (dict or None): The proxy setting the request was sent through.
+            status_code (int, optional): The HTTP status code, if a response was received.
+            latency (float, optional): Time in seconds the request took.
+            error (bool, optional): True if the request failed at the transport level.
+        """
+        if self.proxy_pool is not None and proxy:
+            self.proxy_pool.report(proxy['https'], status_code, latency, error)
+
+    def _emit_result(
+        self,
+        user_agent: str,
+        url: str,
+        attempt: int,
+        proxy: Optional[Dict[str, str]],
+        started: float,
+        response: Optional[ProbeResponse] = None,
+        error: Optional[Exception] = None,
+        blocked: Optional[str] = None,
+        extra_hooks: Iterable[Callable[[CheckResult], None]] = ()
+    ) -> None:
+        """
+        Build the `CheckResult` of a request attempt and pass it to every hook.
+
+        Args:
+            user_agent (str): The user agent that was tested.
+            url (str): The URL the request was sent to.
+            attempt (int): The 0-based attempt number.
+            proxy (dict or None): The proxy setting the request was sent through.
+            started (float): `time.perf_counter()` when the request was sent.
+            response (ProbeResponse, optional): The response, if one was received.
+            error (Exception, optional): The exception, if the request failed.
+            blocked (str, optional): The block signature found in the body, if any.
+            extra_hooks (iterable, optional): Hooks of this check only, called after `self.hooks`.
+        """
+        total = time.perf_counter() - started
+        timings = connection_timings()
+        result = CheckResult(
+            user_agent=user_agent,
+            url=url,
+            attempt=attempt,
+            status_code=response.status_code if response is not None else None,
+            dns=None,
+            connect=timings['connect'],
+            tls=timings['tls'],
+            ttfb=response.elapsed if response is not None else None,
+            total=total,
+            bytes=response.received if response is not None else 0,
+            proxy=proxy.get('https') if proxy else None,
+            exception=type(error).__name__ if error is not None else None,
+            timestamp=time.time(),
+            blocked=blocked
+        )
+        for hook in itertools.chain(self.hooks, extra_hooks):
+            try:
+                hook(result)
+            except Exception as e:
+                logger.error("Error: Check hook %r failed with exception: %s", hook, e)
+
+    def _probe_request(self, url: str, headers: Dict[str, str], proxy: Optional[Dict[str, str]]) -> ProbeRequest:
+        """
+        Describe the probe request for a check according to `self.probe_mode`.
+
+        Only the status code (and at most `probe_bytes` of the body in 'capped' mode) is needed to
+        judge a user agent, so the lighter modes let the transport skip downloading the page (see
+        `RequestsTransport.send`). In 'capped' mode at least `block_detector.max_bytes` are read.
+
+        Args:
+            url (str): The URL to probe.
+            headers (dict): The request headers.
+            proxy (dict or None): The proxy setting returned by `get_proxy`.
+
+        Returns:
+            ProbeRequest: The request to pass to the transport.
+        """
+        probe_bytes = self.probe_bytes
+        if self.block_detector is not None:
+            probe_bytes = max(probe_bytes, self.block_detector.max_bytes)
+        return ProbeRequest(url, headers, proxy, self.timeout, self.probe_mode, probe_bytes)
+
+    def check_user_agent(self, user_agent: str, url: Optional[str] = None) -> bool:
         """
         Test if a user agent is valid for the given website with enhanced error handling.
 
@@ -86,38 +368,55 @@ class UserAgentTester:
 
         Args:
             user_agent (str): The user agent string to test.
+            url (str, optional): The URL to test against. Default is None (use `self.test_url`).
 
         Returns:
             bool: True if the user agent is accepted (HTTP status 200), False otherwise.
 
         Method Details:
         ---------------
-        - A new requests session is created to maintain certain settings across requests, such as headers
-          and proxies.
+        - If a verdict cache is configured and holds a fresh verdict for the user agent and the host of
+          `url`, that verdict is returned without sending a request. Every response with a
+          status code is recorded in the cache; transport errors are not.
+        
+        - If a rate limiter is configured, every attempt first waits for a token from the bucket of the
+          target host, and the outcome of the attempt is reported back to the limiter: 429/503 responses
+          and timeouts slow the host down, clean responses speed it up, and `Retry-After` is honored.
         
-        - If a proxy is specified during the initialization of the UserAgentTester class, the session's
-          proxy settings are updated accordingly to route requests through the given proxy.
+        - If hooks are registered, every attempt (including retries and failed attempts) is reported to
+          them as a `CheckResult` with the status code, connect/TLS/TTFB/total timings, bytes received,
+          proxy and exception class. Cached verdicts make no attempt and are not reported.
         
-        - A retry counter is initialized to keep track of the number of attempts made to send the request.
-          The method will retry sending the request up to a maximum number of retries specified during
-          initialization (`self.max_retries`).
+        - Requests are sent by the tester's transport (`self.transport`, a `RequestsTransport` with one
+          pooled session per proxy setting by default), so connections to each target host are kept
+          alive and reused across checks.
         
-        - A loop is employed to allow for multiple attempts to send the request, particularly in cases
-          where transient errors like timeouts are encountered.
+        - If a proxy is specified during the initialization of the UserAgentTester class, the transport
+          routes requests through it.
+        
+        - Failed attempts are retried according to the retry policy (`self.retry_policy`, built from
+          `max_retries` if none was given). Timeouts, connection errors (including proxy errors) and
+          responses such as 429 or 5xx say nothing about the user agent, so they are retried after a
+          jittered exponential backoff, honoring `Retry-After`, until the policy's attempt limit or
+          time budget is used up. See `RetryPolicy`.
         
         - Inside the loop:
-            - The 'User-Agent' header in `self.common_headers` is updated to the current `user_agent`
-              being tested.
+            - A per-request copy of `self.common_headers` is built with the 'User-Agent' header set to
+              the current `user_agent`, so concurrent checks never share mutable header state.
             
-            - An HTTP GET request is sent to the `self.test_url` using the specified headers, timeout
-              setting (`self.timeout`), and with SSL verification disabled (`verify=False`).
+            - A probe request is sent to `url` (by default `self.test_url`) using the specified headers, timeout
+              setting (`self.timeout`), and with SSL verification disabled (`verify=False`). The request
+              method and how much of the body is downloaded depend on `self.probe_mode` (see `_probe_request`).
             
             - The HTTP response status code is checked to determine the outcome:
                 - **Status Code 200**: Indicates that the user agent is accepted. A success message is
                   logged and the method returns True.
                 
+                - **Retried Status Codes** (by default 408, 425, 429, 500, 502, 503 and 504): The attempt
+                  is retried. If no attempt is left, the check ends as a transport failure.
+                
                 - **Status Code 403 (Forbidden)**: Indicates that the user agent is blocked by the server.
-                  A warning message is logged and the method returns False.
+                  A message is logged and the method returns False.
                 
                 - **Status Code 300 to <400 (Redirection)**: Indicates a redirect response. A message is
                   logged indicating the redirection, and the method returns False.
@@ -125,98 +424,208 @@ class UserAgentTester:
                 - **Status Code 400 to <500 (Client Error)**: Indicates a client error occurred, possibly
                   due to the user agent. A message is logged and the method returns False.
                 
-                - **Status Code 500 to <600 (Server Error)**: Indicates a server error occurred. A message
-                  is logged and the method returns False.
-                
-                - **Other Status Codes**: For any other unexpected status codes, a warning message is
-                  logged and the method returns False.
+                - **Other Status Codes**: For any other status codes, such as server errors that are not
+                  retried, a message is logged and the method returns False.
         
         - If a request exception occurs, it is handled using multiple `except` blocks:
-            - **Timeout Exception**: If a timeout occurs, a message is logged and the retry counter is
-              incremented. If the retry limit is reached, a failure message is logged and the method
-              returns False.
+            - **ProxyError Exception**: The failure is reported to the proxy pool and the retry goes
+              through a different proxy. When no other proxy of the pool is left, the check ends.
             
-            - **ConnectionError Exception**: If a connection error occurs, a message is logged and the
-              method returns False.
+            - **Timeout Exception**: The host is slowed down by the rate limiter and, with a proxy pool,
+              the retry goes through a newly chosen proxy.
             
-            - **ProxyError Exception**: If a proxy error occurs, a message is logged indicating the
-              failure to connect using the proxy, and the method returns False.
+            - **ConnectionError Exception**: The failure is reported to the proxy pool and the request is
+              retried, through a newly chosen proxy if there is a pool.
             
-            - **InvalidURL Exception**: If the URL is invalid, an error message is logged and the method
-              returns False.
+            - **InvalidURL Exception**: If the URL is invalid, an error message is logged and the check
+              ends without a retry.
             
-            - **General RequestException**: Handles any other exceptions related to the request. A message
-              is logged with the exception details and the method returns False.
+            - **General RequestException**: Handles any other exceptions related to the request. They
+              are retried only if the retry policy lists them.
+        
+        - A check that ends without a verdict (retries exhausted, budget used up or an exception that
+          is not retried) is a transport failure: it is logged, not recorded in the verdict cache, and
+          the method returns False. Use `check_outcome` to tell it apart from a rejection.
         
         This method effectively manages and tests user agents by handling a wide range of response
         scenarios and exceptions, making it a robust solution for testing user agents in web scraping
         applications.
         """
-        # Create a new requests session for making HTTP requests
-        session = requests.Session()
+        return self.check_outcome(user_agent, url) == ACCEPTED
+
+    def check_outcome(
+        self,
+        user_agent: str,
+        url: Optional[str] = None,
+        extra_hooks: Iterable[Callable[[CheckResult], None]] = ()
+    ) -> str:
+        """
+        Test a user agent like `check_user_agent`, telling a rejection apart from a transport failure.
+
+        Args:
+            user_agent (str): The user agent string to test.
+            url (str, optional): The URL to test against. Default is None (use `self.test_url`).
+            extra_hooks (iterable, optional): Hooks that receive the `CheckResult` of this check's
+                                              attempts only, after the tester's `hooks`. Default is none.
+
+        Returns:
+            str: `ACCEPTED` or `REJECTED` (from `UserAgentFilter.retry`) if the website gave a verdict,
+                 `TRANSPORT_FAILURE` if no attempt got one.
+        """
+        url = url or self.test_url
+        policy = self.retry_policy
+        report = bool(self.hooks or extra_hooks)
+
+        # Reuse a fresh verdict from the cache if there is one
+        cached = self._cached_verdict(user_agent, url)
+        if cached is not None:
+            return ACCEPTED if cached else REJECTED
 
         # Get the current proxy settings
         current_proxy = self.get_proxy()
+        tried_proxies = set()  # Pool proxies that failed for this user agent
+        host = urlparse(url).netloc
+        deadline = time.monotonic() + policy.budget if policy.budget is not None else None
 
-        # If a proxy is provided, update the session's proxy settings
-        if current_proxy:
-            session.proxies.update(current_proxy)
-
-        retries = 0  # Initialize the retry counter
-        while retries < self.max_retries:
+        attempt = 0
+        while True:
+            retry_after = None
             try:
-                # Set the User-Agent header for the current request
-                self.common_headers['User-Agent'] = user_agent
-
-                # Send an HTTP GET request to the test URL with the specified headers and proxy
-                response = session.get(
-                    self.test_url, headers=self.common_headers, timeout=self.timeout, verify=False)
-
-                # Check the HTTP status code to determine if the user agent is accepted
-                if response.status_code == 200:
-                    logging.info(f"User-Agent '{user_agent}' is working for {self.test_url}.")
-                    return True  # User agent is accepted
-                elif response.status_code == 403:
-                    logging.warning(f"Warning: User-Agent '{user_agent}' is blocked with status code 403 Forbidden for {self.test_url}.")
-                    return False  # User agent is blocked
-                elif 300 <= response.status_code < 400:
-                    logging.info(f"Redirected: User-Agent '{user_agent}' received a redirect status code {response.status_code} for {self.test_url}.")
-                    return False  # User agent caused a redirect
-                elif 400 <= response.status_code < 500:
-                    logging.info(f"Client error: User-Agent '{user_agent}' received a client error status code {response.status_code} for {self.test_url}.")
-                    return False  # User agent caused a client error
-                elif 500 <= response.status_code < 600:
-                    logging.info(f"Server error: User-Agent '{user_agent}' received a server error status code {response.status_code} for {self.test_url}.")
-                    return False  # User agent caused a server error
+                # Build the headers for this request without touching the shared template
+                headers = dict(self.common_headers)
+                headers['User-Agent'] = user_agent
+
+                # Wait for the target host's rate limit before sending the request
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(host)
+
+                # Send the probe request to the test URL with the specified headers and proxy,
+                # reporting the attempt to the hooks whether it succeeds or fails
+                reset_connection_timings()
+                started = time.perf_counter()
+                try:
+                    response = self.transport.send(self._probe_request(url, headers, current_proxy))
+                except requests.RequestException as e:
+                    if report:
+                        self._emit_result(user_agent, url, attempt, current_proxy, started, error=e,
+                                          extra_hooks=extra_hooks)
+                    raise
+
+                # A 200 can still be a captcha or robot-check page; only the start of the body is searched
+                blocked = None
+                if self.block_detector is not None and response.status_code == 200:
+                    blocked = self.block_detector.detect(host, response.content)
+                if report:
+                    self._emit_result(user_agent, url, attempt, current_proxy, started, response=response,
+                                      blocked=blocked, extra_hooks=extra_hooks)
+
+                # Update the health score of the proxy the request went through
+                self._report_proxy(current_proxy, response.status_code, response.elapsed)
+
+                # Let the rate limiter adapt to how the server answered
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if self.rate_limiter is not None:
+                    self.rate_limiter.feedback(host, response.status_code, retry_after)
+
+                if policy.retries_status(response.status_code):
+                    # Throttling and server errors say nothing about the user agent: try again
+                    reason = f"status code {response.status_code}"
                 else:
-                    logging.warning(f"Warning: User-Agent '{user_agent}' is not working. Status code: {response.status_code} for {self.test_url}.")
-                    return False  # User agent is not working
-            except requests.exceptions.Timeout:
-                # If a timeout exception occurs, increment the retry counter and try again
-                retries += 1
-                logging.warning(f"Timeout: Request for User-Agent '{user_agent}' timed out for {self.test_url}. Retrying {retries}/{self.max_retries}...")
-                if retries >= self.max_retries:
-                    # If the maximum number of retries is reached, return False
-                    logging.error(f"Failed: User-Agent '{user_agent}' failed due to repeated timeouts for {self.test_url}.")
-                    return False
-            except requests.exceptions.ConnectionError:
-                # If a connection error occurs, log an error message and return False
-                logging.error(f"Connection error: Failed to connect to {self.test_url} with User-Agent '{user_agent}'.")
-                return False
-            except requests.exceptions.ProxyError:
-                # If a proxy error occurs, log an error message and return False
-                logging.error(f"Proxy error: Failed to connect using the proxy for User-Agent '{user_agent}'.")
-                return False
+                    # Record the verdict so later runs can skip this user agent
+                    if self.cache is not None:
+                        status_code = BLOCK_PAGE_STATUS if blocked is not None else response.status_code
+                        self.cache.put(user_agent, host, status_code, response.elapsed)
+
+                    # Check the HTTP status code to determine if the user agent is accepted
+                    if blocked is not None:
+                        logger.debug("User-Agent '%s' got a block page matching '%s' with status code 200 for %s.", user_agent, blocked, url)
+                        return REJECTED  # User agent was served a captcha or robot check
+                    elif response.status_code == 200:
+                        logger.debug("User-Agent '%s' is working for %s.", user_agent, url)
+                        return ACCEPTED  # User agent is accepted
+                    elif response.status_code == 403:
+                        logger.debug("User-Agent '%s' is blocked with status code 403 Forbidden for %s.", user_agent, url)
+                        return REJECTED  # User agent is blocked
+                    elif 300 <= response.status_code < 400:
+                        logger.debug("Redirected: User-Agent '%s' received a redirect status code %s for %s.", user_agent, response.status_code, url)
+                        return REJECTED  # User agent caused a redirect
+                    elif 400 <= response.status_code < 500:
+                        logger.debug("Client error: User-Agent '%s' received a client error status code %s for %s.", user_agent, response.status_code, url)
+                        return REJECTED  # User agent caused a client error
+                    else:
+                        logger.debug("User-Agent '%s' is not working. Status code: %s for %s.", user_agent, response.status_code, url)
+                        return REJECTED  # User agent is not working
+            except requests.exceptions.ProxyError as e:
+                # ProxyError is a ConnectionError, so it must be handled first. Take note of the failing
+                # proxy and retry through a different one from the pool, if there is one left
+                self._report_proxy(current_proxy, error=True)
+                if self.proxy_pool is not None:
+                    tried_proxies.add(current_proxy['https'])
+                    current_proxy = self.get_proxy(exclude=tried_proxies)
+                    if current_proxy is None:
+                        logger.error("Proxy error: No working proxy left for User-Agent '%s'.", user_agent)
+                        return TRANSPORT_FAILURE
+                if not policy.retries_exception(e):
+                    logger.error("Proxy error: Failed to connect using the proxy for User-Agent '%s'.", user_agent)
+                    return TRANSPORT_FAILURE
+                reason = "proxy error"
+            except requests.exceptions.Timeout as e:
+                # Slow the host down and retry through a freshly chosen proxy, preferring ones that
+                # have not failed yet
+                if self.rate_limiter is not None:
+                    self.rate_limiter.feedback(host, timeout=True)
+                self._report_proxy(current_proxy, error=True)
+                if self.proxy_pool is not None:
+                    tried_proxies.add(current_proxy['https'])
+                    current_proxy = self.get_proxy(exclude=tried_proxies) or self.get_proxy()
+                if not policy.retries_exception(e):
+                    logger.error("Timeout: Request for User-Agent '%s' timed out for %s.", user_agent, url)
+                    return TRANSPORT_FAILURE
+                reason = "timeout"
+            except requests.exceptions.ConnectionError as e:
+                self._report_proxy(current_proxy, error=True)
+                if self.proxy_pool is not None:
+                    tried_proxies.add(current_proxy['https'])
+                    current_proxy = self.get_proxy(exclude=tried_proxies) or self.get_proxy()
+                if not policy.retries_exception(e):
+                    logger.error("Connection error: Failed to connect to %s with User-Agent '%s'.", url, user_agent)
+                    return TRANSPORT_FAILURE
+                reason = "connection error"
             except requests.exceptions.InvalidURL:
-                # If an invalid URL error occurs, log an error message and return False
-                logging.error(f"Invalid URL: The URL '{self.test_url}' is invalid.")
-                return False
+                # If an invalid URL error occurs, log an error message; retrying cannot help
+                logger.error("Invalid URL: The URL '%s' is invalid.", url)
+                return TRANSPORT_FAILURE
             except requests.RequestException as e:
                 # Handle any other request exceptions, such as network errors
-                logging.error(f"Error: User-Agent '{user_agent}' failed with exception: {e} for {self.test_url}.")
-                return False  # Request failed
+                if not policy.retries_exception(e):
+                    logger.error("Error: User-Agent '%s' failed with exception: %s for %s.", user_agent, e, url)
+                    return TRANSPORT_FAILURE
+                reason = type(e).__name__
+
+            # The attempt failed without a verdict; wait and retry while the policy allows it
+            attempt += 1
+            if attempt >= policy.max_attempts:
+                logger.error("Failed: User-Agent '%s' got no verdict from %s after %s attempts (last: %s).",
+                             user_agent, url, attempt, reason)
+                return TRANSPORT_FAILURE
+            delay = policy.delay(attempt, retry_after)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                logger.error("Failed: User-Agent '%s' got no verdict from %s within the retry budget (last: %s).",
+                             user_agent, url, reason)
+                return TRANSPORT_FAILURE
+            logger.warning("Retrying User-Agent '%s' for %s after %s in %.2f seconds (%s/%s)...",
+                           user_agent, url, reason, delay, attempt + 1, policy.max_attempts)
+            if delay > 0:
+                time.sleep(delay)
 
-    def filter_user_agents(self, user_agents_file: str, output_file: str) -> List[str]:
+    def filter_user_agents(
+        self,
+        user_agents_file: str,
+        output_file: str,
+        checkpoint_file: Optional[str] = None,
+        flush_every: int = 100,
+        use_mmap: bool = False
+    ) -> List[str]:
         """
         Filter user agents by testing them against a specific website with enhanced error handling.
 
@@ -227,8 +636,14 @@ class UserAgentTester:
         requests to mimic human browsing behavior.
 
         Args:
-            user_agents_file (str): Path to the file containing user agents to test.
+            user_agents_file (str): Path to the file containing user agents to test. Gzip-compressed
+                                    files are detected and decompressed on the fly.
             output_file (str): Path to the file where successful user agents will be saved.
+            checkpoint_file (str, optional): Path to a checkpoint file. If it exists, the run resumes
+                                             where the interrupted run stopped. Default is None.
+            flush_every (int, optional): Number of input lines between flushes of the output file and
+                                         checkpoint saves. Default is 100.
+            use_mmap (bool, optional): Memory-map an uncompressed input file. Default is False.
 
         Returns:
             list: A list of successful user agents that were accepted by the website.
@@ -240,33 +655,36 @@ class UserAgentTester:
               pass the test (i.e., receive a status code 200 from the server).
         
         - **Reading User Agents**:
-            - The method attempts to open and read the `user_agents_file` using a `with` statement to 
-              ensure proper file handling.
-            - If the file is not found (`FileNotFoundError`), an error message is logged, and the method 
-              returns an empty list.
-            - If an I/O error occurs (e.g., permission issues), an error message is logged, and the method 
-              returns an empty list.
-            - Upon successful reading, the number of user agents loaded is logged for user reference.
+            - The input file is checked before any test is run. If the file is not found
+              (`FileNotFoundError`) or cannot be read (`IOError`), an error message is logged, and the
+              method returns an empty list.
+            - User agents are then read lazily, one line at a time, by `iter_user_agents`, so the input
+              is never loaded into memory as a whole.
+            - If a checkpoint file from an interrupted run exists, the lines it already processed are
+              skipped and the user agents it already wrote are included in the returned list.
         
         - **Testing User Agents**:
-            - The method iterates over each user agent in the list `user_agents`.
-            - Each user agent is stripped of leading/trailing whitespace using `strip()`.
-            - If a user agent is an empty string (e.g., due to empty lines in the file), it is skipped.
+            - Each user agent is stripped of leading/trailing whitespace, and empty lines are skipped.
+            - If `dedupe` was enabled, user agents are normalized and duplicates are dropped by
+              `dedupe_user_agents` before any request is sent.
+            - If a `classifier` was given, user agents that fail its rules (malformed, bots, outdated
+              browsers, unwanted device classes) are dropped by `classify_user_agents` without a request.
+            - If a verdict cache is configured and holds a fresh verdict for the user agent, that verdict
+              is used directly, without a request and without a delay.
             - The `check_user_agent` method is called for each user agent to test its validity against the 
               specified URL (`self.test_url`).
             - If a user agent is successful (i.e., `check_user_agent` returns `True`), it is appended to 
               `successful_user_agents`.
             - A random delay between requests is introduced using `random.uniform(*self.delay_range)` to 
-              mimic human-like browsing behavior. The delay duration is logged for user reference.
+              mimic human-like browsing behavior. The delay duration is logged for user reference. When a
+              rate limiter is configured, it paces the requests instead and no fixed delay is added.
         
         - **Writing Successful User Agents**:
-            - After testing all user agents, the method attempts to write the successful user agents to the 
-              `output_file`.
-            - A `with` statement is used to open the file in write mode, ensuring proper file handling.
-            - Each successful user agent is written to the file, one per line.
+            - Successful user agents are written to `output_file` as soon as they are found, one per line.
+            - The output file is flushed every `flush_every` input lines, and the checkpoint file (if any)
+              is saved right after each flush. The checkpoint is removed once the whole input is processed.
             - If an I/O error occurs during writing (e.g., permission issues), an error message is logged, 
               and the method returns an empty list.
-            - A success message is logged, indicating the number of user agents written to the output file.
         
         - **Final Checks**:
             - If no successful user agents are found, a warning message is logged suggesting the use of a 
@@ -274,73 +692,696 @@ class UserAgentTester:
         
         - **Return Value**:
             - The method returns the list `successful_user_agents`, containing all user agents that 
-              successfully received a status code 200 from the server.
-
-            Overall, this method provides a complete and robust mechanism for filtering user agents by testing 
-            them against a specified website, ensuring that only effective user agents are retained. It handles 
-            file and network errors gracefully, provides informative output messages, and incorporates random 
-            delays to reduce detection risks.
+              successfully received a status code 200 from the server. Use `iter_filter_user_agents` to
+              process very large inputs without keeping the successful user agents in memory.
         """
         # Initialize a list to store successful user agents
         successful_user_agents = []
 
-        # Attempt to read user agents from the specified file
-        try:
-            logging.info(f"Reading user agents from: {user_agents_file}")
-            with open(user_agents_file, 'r') as file:
-                user_agents = file.readlines()
-        except FileNotFoundError:
-            # If the file is not found, log an error message and return an empty list
-            logging.error(f"Error: The file '{user_agents_file}' was not found.")
+        # Open the input lazily and the output for streaming writes
+        stream = self._open_stream(user_agents_file, output_file, checkpoint_file, flush_every, use_mmap)
+        if stream is None:
             return []
+        agents, writer = stream
+
+        try:
+            # Include the user agents written by an interrupted run we are resuming
+            successful_user_agents.extend(writer.read_written())
+            for user_agent in self._filter_stream(agents, writer):
+                successful_user_agents.append(user_agent)
         except IOError:
             # If there is an I/O error (e.g., permission issue), log an error message and return an empty list
-            logging.error(f"Error: Unable to read the file '{user_agents_file}'. Check file permissions.")
+            logger.error("Error: Unable to write to the file '%s'. Check file permissions.", output_file)
             return []
 
-        # Print the number of user agents loaded
-        total_agents = len(user_agents)
-        logging.info(f"User agents loaded: {total_agents}")
+        # Return the list of successful user agents
+        return successful_user_agents
+
+    def iter_filter_user_agents(
+        self,
+        user_agents_file: str,
+        output_file: str,
+        checkpoint_file: Optional[str] = None,
+        flush_every: int = 100,
+        use_mmap: bool = False
+    ) -> Iterator[str]:
+        """
+        Filter user agents in constant memory, yielding each successful user agent as it is found.
+
+        This is the streaming form of `filter_user_agents`: the input is read lazily and each
+        successful user agent is written to `output_file` before it is yielded, so memory use does
+        not grow with the size of the input. If iteration stops early, the checkpoint file (if any)
+        is kept and a later call resumes from it.
 
-        # Test each user agent
-        for index, user_agent in enumerate(user_agents):
-            user_agent = user_agent.strip()  # Remove leading/trailing whitespace
-            if not user_agent:  # Skip empty lines
-                continue
+        Args:
+            user_agents_file (str): Path to the file containing user agents to test.
+            output_file (str): Path to the file where successful user agents will be saved.
+            checkpoint_file (str, optional): Path to a checkpoint file used to resume an interrupted run. Default is None.
+            flush_every (int, optional): Number of input lines between flushes and checkpoint saves. Default is 100.
+            use_mmap (bool, optional): Memory-map an uncompressed input file. Default is False.
 
-            # Display progress indicator
-            logging.info(f"Testing user agent {index + 1}/{total_agents}")
+        Yields:
+            str: Each user agent accepted by the website during this run.
+        """
+        stream = self._open_stream(user_agents_file, output_file, checkpoint_file, flush_every, use_mmap)
+        if stream is None:
+            return
+        agents, writer = stream
+        yield from self._filter_stream(agents, writer)
 
-            # Test the user agent against the specified URL
-            success = self.check_user_agent(user_agent)
+    def filter_user_agents_sharded(
+        self,
+        user_agents_file: str,
+        output_file: str,
+        processes: Optional[int] = None,
+        checkpoint_file: Optional[str] = None,
+        flush_every: int = 100,
+        use_mmap: bool = False,
+        stats: Optional[ShardStats] = None
+    ) -> List[str]:
+        """
+        Filter user agents across several processes, merging the results into one output file.
 
-            # If the user agent is successful, add it to the list of successful agents
-            if success:
-                successful_user_agents.append(user_agent)
+        The input is split into contiguous ranges of lines, one per process. Every process tests
+        its range with its own copy of this tester (sessions, proxy pool and rate limiter), and the
+        shard outputs are merged in input order, so the output file and the returned list match
+        those of `filter_user_agents`, except that user agents retried after a transport failure
+        come at the end of their shard rather than at the end of the output. A rate limiter's rates
+        are divided between the processes so the combined request rate per host does not change.
+        Hooks and an in-memory cache cannot be shared with the processes and raise a ValueError.
+        See `sharding.filter_user_agents_sharded` for details.
 
-            # Add a random delay between requests to mimic human behavior
-            delay = random.uniform(*self.delay_range)
-            logging.info(f"Delaying for {delay:.2f} seconds before the next request")
-            time.sleep(delay)
+        Args:
+            user_agents_file (str): Path to the file containing user agents to test.
+            output_file (str): Path to the file where successful user agents will be saved.
+            processes (int, optional): Number of worker processes. Default is None (one per CPU).
+            checkpoint_file (str, optional): Path prefix of the per-shard checkpoint files used to
+                                             resume an interrupted run. Default is None.
+            flush_every (int, optional): Number of input lines between flushes and checkpoint saves. Default is 100.
+            use_mmap (bool, optional): Memory-map an uncompressed input file. Default is False.
+            stats (ShardStats, optional): Per-shard and total counts to fill in. Default is None.
+
+        Returns:
+            list: A list of successful user agents that were accepted by the website.
+        """
+        return filter_user_agents_sharded(
+            self, user_agents_file, output_file, processes, checkpoint_file, flush_every, use_mmap, stats)
+
+    async def acheck_user_agent(self, user_agent: str, url: Optional[str] = None) -> bool:
+        """
+        Asynchronously test if a user agent is valid for the given website.
 
-        # Log the number of successful user agents
-        logging.info(f"Successful user agents: {len(successful_user_agents)}")
+        The blocking HTTP request made by `check_user_agent` runs on the event loop's default
+        executor, so the verdict is exactly the one the synchronous method would return.
 
-        # Attempt to write the successful user agents to the output file
+        Args:
+            user_agent (str): The user agent string to test.
+            url (str, optional): The URL to test against. Default is None (use `self.test_url`).
+
+        Returns:
+            bool: True if the user agent is accepted (HTTP status 200), False otherwise.
+        """
+        return await self._acheck(user_agent, None, url) == ACCEPTED
+
+    def test_matrix(
+        self,
+        user_agents: Iterable[str],
+        urls: List[str],
+        concurrency: int = 10
+    ) -> Dict[str, Dict[str, bool]]:
+        """
+        Test every user agent against every URL in one pass.
+
+        This is a blocking wrapper around `atest_matrix`; see there for details.
+
+        Args:
+            user_agents (iterable): The user agent strings to test.
+            urls (list): The URLs to test every user agent against.
+            concurrency (int, optional): Maximum number of checks running at the same time. Default is 10.
+
+        Returns:
+            dict: The acceptance matrix, mapping each user agent to a dictionary of URL -> verdict.
+        """
+        return asyncio.run(self.atest_matrix(user_agents, urls, concurrency))
+
+    def find_user_agents(
+        self,
+        user_agents: Iterable[str],
+        target: int,
+        predictor: Optional[VerdictPredictor] = None,
+        concurrency: int = 10,
+        threshold: float = 0.2,
+        explore: float = 0.1,
+        extra_hooks: Iterable[Callable[[CheckResult], None]] = ()
+    ) -> List[str]:
+        """
+        Find `target` accepted user agents with as few requests as possible.
+
+        This is a blocking wrapper around `afind_user_agents`; see there for details.
+
+        Args:
+            user_agents (iterable): The user agent strings to choose from.
+            target (int): Number of accepted user agents wanted.
+            predictor (VerdictPredictor, optional): The model used to rank the user agents. Default is None
+                                                    (a new model that learns during the run).
+            concurrency (int, optional): Maximum number of checks running at the same time. Default is 10.
+            threshold (float, optional): User agents predicted below this acceptance probability are pruned.
+                                         Default is 0.2.
+            explore (float, optional): Fraction of the pruned user agents tested anyway. Default is 0.1.
+            extra_hooks (iterable, optional): Hooks that receive the `CheckResult` of the request attempts
+                                              of this run only. Default is none.
+
+        Returns:
+            list: The accepted user agents, at most `target`, in the order they were tested.
+        """
+        return asyncio.run(self.afind_user_agents(user_agents, target, predictor, concurrency, threshold, explore,
+                                                  extra_hooks))
+
+    async def atest_matrix(
+        self,
+        user_agents: Iterable[str],
+        urls: List[str],
+        concurrency: int = 10
+    ) -> Dict[str, Dict[str, bool]]:
+        """
+        Asynchronously test every user agent against every URL in one pass.
+
+        All (user agent, URL) checks share one bounded pool of `concurrency` workers. Requests are
+        paced per target host and worker (by `delay_range`, or by the rate limiter when one is
+        configured), so checks against different hosts run side by side while each worker keeps
+        human-like spacing between its requests to a host.
+        Checks against the same host reuse the keep-alive connections of the pooled sessions; set
+        `pool_connections` to at least the number of distinct hosts to keep all of them open.
+
+        Args:
+            user_agents (iterable): The user agent strings to test.
+            urls (list): The URLs to test every user agent against.
+            concurrency (int, optional): Maximum number of checks running at the same time. Default is 10.
+
+        Returns:
+            dict: The acceptance matrix, mapping each user agent to a dictionary of URL -> verdict.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        user_agents = list(dict.fromkeys(user_agents))
+        pacer = _HostPacer(self.delay_range, concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(user_agent: str, url: str) -> bool:
+            # Use a fresh cached verdict without taking a slot from the host's schedule
+            cached = self._cached_verdict(user_agent, url)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                if self.rate_limiter is None:
+                    await pacer.wait(urlparse(url).netloc)
+                return await self._acheck(user_agent, executor, url) == ACCEPTED
+
+        # Interleave the URLs for each user agent so that consecutive checks spread across hosts
+        pairs = [(user_agent, url) for user_agent in user_agents for url in urls]
+        logger.info("Testing %s user agents against %s URLs.", len(user_agents), len(urls))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = await asyncio.gather(*(run(user_agent, url) for user_agent, url in pairs))
+
+        matrix: Dict[str, Dict[str, bool]] = {user_agent: {} for user_agent in user_agents}
+        for (user_agent, url), success in zip(pairs, results):
+            matrix[user_agent][url] = success
+        return matrix
+
+    async def afind_user_agents(
+        self,
+        user_agents: Iterable[str],
+        target: int,
+        predictor: Optional[VerdictPredictor] = None,
+        concurrency: int = 10,
+        threshold: float = 0.2,
+        explore: float = 0.1,
+        extra_hooks: Iterable[Callable[[CheckResult], None]] = ()
+    ) -> List[str]:
+        """
+        Asynchronously find `target` accepted user agents with as few requests as possible.
+
+        The user agents are tested in the order of a `PredictionQueue`: those the predictor rates
+        most likely to be accepted by the host of `test_url` go first, and groups of user agents
+        rated below `threshold` are only sampled (a fraction `explore` of them) to confirm the
+        prediction. The predictor learns from every response during the run, so the order adapts
+        as verdicts come in. Testing stops as soon as `target` user agents were accepted; no more
+        checks are started than could still be needed to reach it.
+
+        Args:
+            user_agents (iterable): The user agent strings to choose from.
+            target (int): Number of accepted user agents wanted.
+            predictor (VerdictPredictor, optional): The model used to rank the user agents, e.g. loaded
+                                                    with `VerdictPredictor.load` or trained with
+                                                    `learn_from_cache`. Default is None (a new model).
+            concurrency (int, optional): Maximum number of checks running at the same time. Default is 10.
+            threshold (float, optional): User agents predicted below this acceptance probability are pruned.
+                                         Default is 0.2.
+            explore (float, optional): Fraction of the pruned user agents tested anyway. Default is 0.1.
+            extra_hooks (iterable, optional): Hooks that receive the `CheckResult` of the request attempts
+                                              of this run only, after the tester's `hooks`. Default is none.
+
+        Returns:
+            list: The accepted user agents, at most `target`, in the order they were tested.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if target < 1:
+            raise ValueError("target must be at least 1")
+
+        if predictor is None:
+            predictor = VerdictPredictor()
+        host = urlparse(self.test_url).netloc
+        queue = PredictionQueue(predictor, host, dict.fromkeys(user_agents), threshold, explore)
+        total = len(queue)
+        pacer = _HostPacer(self.delay_range, concurrency)
+        # The predictor learns from the responses of this run through a hook of these checks only,
+        # so other runs sharing the tester never feed it
+        learning = () if predictor in self.hooks else (predictor,)
+        extra_hooks = learning + tuple(extra_hooks)
+
+        async def run(user_agent: str) -> bool:
+            # Use a fresh cached verdict without taking a slot from the host's schedule
+            cached = self._cached_verdict(user_agent)
+            if cached is not None:
+                return cached
+            if self.rate_limiter is None:
+                await pacer.wait(host)
+            return await self._acheck(user_agent, executor, extra_hooks=extra_hooks) == ACCEPTED
+
+        logger.info("Looking for %s accepted user agents among %s.", target, total)
+        accepted: List[str] = []
+        tested = 0
+        running: Dict[asyncio.Future, str] = {}
+        progress = ProgressReporter(logger, self.PROGRESS_EVERY, self.PROGRESS_INTERVAL, total=total)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    # Only start checks that could still be needed, assuming the running ones pass
+                    while len(running) < min(concurrency, target - len(accepted)):
+                        user_agent = queue.pop()
+                        if user_agent is None:
+                            break
+                        running[asyncio.ensure_future(run(user_agent))] = user_agent
+                    if not running:
+                        break
+                    done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        user_agent = running.pop(task)
+                        success = task.result()
+                        tested += 1
+                        progress.update(success)
+                        if success:
+                            accepted.append(user_agent)
+            finally:
+                for task in running:
+                    task.cancel()
+        progress.finish()
+
+        logger.info("Found %s of %s wanted user agents with %s checks (%s to confirm low predictions); "
+                    "%s user agents were not tested.", len(accepted), target, tested, queue.explored, total - tested)
+        return accepted
+
+    async def afilter_user_agents(
+        self,
+        user_agents_file: str,
+        output_file: str,
+        concurrency: int = 10,
+        checkpoint_file: Optional[str] = None,
+        flush_every: int = 100,
+        use_mmap: bool = False
+    ) -> List[str]:
+        """
+        Asynchronously filter user agents by testing many of them at once.
+
+        This is the concurrent counterpart of `filter_user_agents`. Up to `concurrency` checks are in
+        flight at the same time, each running on a dedicated thread pool. The human-like random delay
+        from `delay_range` is applied per worker and target host: each of the `concurrency` workers
+        waits one random delay between its requests to a host, while requests to different hosts are
+        not held back. Against a single host the throughput is therefore about
+        `concurrency / mean(delay_range)` requests per second (roughly 1.8 per second with 10 workers
+        and the default (3, 8)); raise `concurrency`, lower `delay_range` or pass a `rate_limiter`
+        to set the request rate directly.
+
+        The input is read lazily and only a bounded window of user agents is scheduled ahead of the
+        oldest unfinished one. Results are written in input order as soon as they are known, so the
+        output file, checkpointing and the returned list behave exactly as in `filter_user_agents`;
+        in both, user agents retried after a transport failure are written at the end.
+
+        Args:
+            user_agents_file (str): Path to the file containing user agents to test.
+            output_file (str): Path to the file where successful user agents will be saved.
+            concurrency (int, optional): Maximum number of checks running at the same time. Default is 10.
+            checkpoint_file (str, optional): Path to a checkpoint file used to resume an interrupted run. Default is None.
+            flush_every (int, optional): Number of input lines between flushes and checkpoint saves. Default is 100.
+            use_mmap (bool, optional): Memory-map an uncompressed input file. Default is False.
+
+        Returns:
+            list: A list of successful user agents that were accepted by the website.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        stream = self._open_stream(user_agents_file, output_file, checkpoint_file, flush_every, use_mmap)
+        if stream is None:
+            return []
+        agents, writer = stream
+
+        results = self._aiter_passes(agents, concurrency)
+        completed = False
         try:
-            logging.info(f"Writing successful user agents to: {output_file}")
-            with open(output_file, 'w') as f:
-                for agent in successful_user_agents:
-                    f.write(agent + '\n')
-            logging.info(f"Successfully wrote {len(successful_user_agents)} user agents to {output_file}.")
+            # Include the user agents written by an interrupted run we are resuming
+            successful_user_agents = list(writer.read_written())
+            async for index, user_agent, success in results:
+                if success is None:
+                    # Keep the line in the checkpoint until its deferred pass gives a verdict
+                    writer.defer(index, user_agent)
+                    continue
+                if success:
+                    writer.write(user_agent)
+                    successful_user_agents.append(user_agent)
+                writer.resolve(index)
+                writer.advance(index + 1)
+            completed = True
         except IOError:
             # If there is an I/O error (e.g., permission issue), log an error message and return an empty list
-            logging.error(f"Error: Unable to write to the file '{output_file}'. Check file permissions.")
+            logger.error("Error: Unable to write to the file '%s'. Check file permissions.", output_file)
             return []
+        finally:
+            # Cancel the checks still in flight if writing failed
+            await results.aclose()
+            writer.close(completed=completed)
 
-        # If no successful user agents are found, suggest using a proxy
-        if len(successful_user_agents) == 0:
-            logging.warning("Warning: No successful user agents found. Consider using a proxy if not already used.")
-
-        # Return the list of successful user agents
+        self._log_summary(output_file, writer.written)
         return successful_user_agents
+
+    async def aiter_check_user_agents(
+        self,
+        agents: Iterable[Tuple[int, str]],
+        concurrency: int = 10,
+        attempt_hook: Optional[Callable[[int, CheckResult], None]] = None
+    ) -> AsyncIterator[Tuple[int, str, bool]]:
+        """
+        Test a stream of user agents concurrently, yielding the verdicts in input order.
+
+        This is the engine of `afilter_user_agents`, for callers that read user agents from another
+        source (such as standard input) or handle the results themselves. Up to `concurrency` checks
+        run at the same time with the same per-host pacing, and only a bounded window of user agents
+        is read ahead of the oldest unfinished check, so `agents` may be an endless stream.
+
+        User agents whose check ended in a transport failure are held back and tested again after
+        the rest of the stream (see `RetryPolicy.defer_passes`); they are yielded after that, out of
+        input order, with the verdict of their last pass.
+
+        Args:
+            agents (iterable): (index, user_agent) pairs, e.g. from `iter_user_agents`.
+            concurrency (int, optional): Maximum number of checks running at the same time. Default is 10.
+            attempt_hook (callable, optional): Receives the index of the user agent and the `CheckResult`
+                                               of every request attempt of its checks, on the thread that
+                                               made the request. Default is None.
+
+        Yields:
+            tuple: (index, user_agent, success) for every user agent.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        results = self._aiter_passes(agents, concurrency, attempt_hook)
+        try:
+            async for index, user_agent, success in results:
+                if success is not None:
+                    yield index, user_agent, success
+        finally:
+            await results.aclose()
+
+    async def _aiter_passes(
+        self,
+        agents: Iterable[Tuple[int, str]],
+        concurrency: int,
+        attempt_hook: Optional[Callable[[int, CheckResult], None]] = None
+    ) -> AsyncIterator[Tuple[int, str, Optional[bool]]]:
+        """
+        Test a stream of user agents concurrently, with the deferred passes of the retry policy.
+
+        Args:
+            agents (iterable): (index, user_agent) pairs.
+            concurrency (int): Maximum number of checks running at the same time.
+            attempt_hook (callable, optional): As for `aiter_check_user_agents`. Default is None.
+
+        Yields:
+            tuple: (index, user_agent, success), where success is None when the user agent was put
+                   aside for a later pass; it is yielded again with its verdict after that pass.
+        """
+        progress = ProgressReporter(logger, self.PROGRESS_EVERY, self.PROGRESS_INTERVAL)
+        passes = self.retry_policy.defer_passes
+        deferred: List[Tuple[int, str]] = []
+        for pass_number in range(passes + 1):
+            if pass_number:
+                if not deferred:
+                    break
+                logger.info("Testing %s user agents again after transport failures (pass %s of %s).",
+                            len(deferred), pass_number, passes)
+                agents, deferred = deferred, []
+            results = self._aiter_outcomes(agents, concurrency, attempt_hook)
+            try:
+                async for index, user_agent, outcome in results:
+                    if outcome == TRANSPORT_FAILURE and pass_number < passes:
+                        deferred.append((index, user_agent))
+                        yield index, user_agent, None
+                        continue
+                    success = outcome == ACCEPTED
+                    progress.update(success)
+                    yield index, user_agent, success
+            finally:
+                await results.aclose()
+        progress.finish()
+
+    async def _aiter_outcomes(
+        self,
+        agents: Iterable[Tuple[int, str]],
+        concurrency: int,
+        attempt_hook: Optional[Callable[[int, CheckResult], None]] = None
+    ) -> AsyncIterator[Tuple[int, str, str]]:
+        """
+        Test a stream of user agents concurrently, yielding the outcomes in input order.
+
+        Args:
+            agents (iterable): (index, user_agent) pairs.
+            concurrency (int): Maximum number of checks running at the same time.
+            attempt_hook (callable, optional): As for `aiter_check_user_agents`. Default is None.
+
+        Yields:
+            tuple: (index, user_agent, outcome) for every user agent, in input order.
+        """
+        host = urlparse(self.test_url).netloc
+        pacer = _HostPacer(self.delay_range, concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        # Checks scheduled ahead of the oldest unfinished one, in input order
+        window: Deque[Tuple[int, str, asyncio.Future]] = deque()
+        window_size = concurrency * 4
+
+        async def run(index: int, user_agent: str) -> str:
+            # Use a fresh cached verdict without taking a slot from the host's schedule
+            cached = self._cached_verdict(user_agent)
+            if cached is not None:
+                return ACCEPTED if cached else REJECTED
+            async with semaphore:
+                # Wait for this host's next free slot before sending the request; with a rate
+                # limiter the check itself waits for the host's token bucket
+                if self.rate_limiter is None:
+                    await pacer.wait(host)
+                logger.debug("Testing user agent %d", index + 1)
+                extra_hooks = (functools.partial(attempt_hook, index),) if attempt_hook is not None else ()
+                return await self._acheck(user_agent, executor, extra_hooks=extra_hooks)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                for index, user_agent in agents:
+                    window.append((index, user_agent, asyncio.ensure_future(run(index, user_agent))))
+                    if len(window) >= window_size:
+                        index, user_agent, task = window.popleft()
+                        yield index, user_agent, await task
+                while window:
+                    index, user_agent, task = window.popleft()
+                    yield index, user_agent, await task
+            finally:
+                # Do not leave scheduled checks running after a failure or an early stop
+                for _, _, task in window:
+                    task.cancel()
+
+    async def _acheck(
+        self,
+        user_agent: str,
+        executor: Optional[ThreadPoolExecutor],
+        url: Optional[str] = None,
+        extra_hooks: Iterable[Callable[[CheckResult], None]] = ()
+    ) -> str:
+        """
+        Run `check_outcome` on an executor without blocking the event loop.
+
+        Args:
+            user_agent (str): The user agent string to test.
+            executor (ThreadPoolExecutor or None): The executor to use, or None for the loop's default.
+            url (str, optional): The URL to test against. Default is None (use `self.test_url`).
+            extra_hooks (iterable, optional): Hooks of this check only, as for `check_outcome`.
+
+        Returns:
+            str: The outcome returned by `check_outcome`.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, self.check_outcome, user_agent, url, extra_hooks)
+
+    def _open_stream(
+        self,
+        user_agents_file: str,
+        output_file: str,
+        checkpoint_file: Optional[str],
+        flush_every: int,
+        use_mmap: bool,
+        line_range: Optional[Tuple[int, int]] = None,
+        line_offset: int = 0
+    ) -> Optional[Tuple[Iterator[Tuple[int, str]], AgentWriter]]:
+        """
+        Open the lazy input reader and the streaming output writer for a filtering run.
+
+        Args:
+            user_agents_file (str): Path to the file containing user agents.
+            output_file (str): Path to the file where successful user agents will be saved.
+            checkpoint_file (str or None): Path to the checkpoint file.
+            flush_every (int): Number of input lines between flushes and checkpoint saves.
+            use_mmap (bool): Memory-map an uncompressed input file.
+            line_range (tuple, optional): (start, stop) line indices to test, as used by sharded runs.
+                                          Default is None (the whole file).
+            line_offset (int, optional): Byte offset of the start line of `line_range` in an uncompressed
+                                         input (see `line_offsets`). Default is 0 (read from the first line).
+
+        Returns:
+            tuple or None: (agents, writer), or None if the input could not be read or the output
+                           could not be opened.
+        """
+        # Check that the input can be read before touching the output file
+        try:
+            logger.info("Reading user agents from: %s", user_agents_file)
+            with open(user_agents_file, 'rb'):
+                pass
+        except FileNotFoundError:
+            # If the file is not found, log an error message
+            logger.error("Error: The file '%s' was not found.", user_agents_file)
+            return None
+        except IOError:
+            # If there is an I/O error (e.g., permission issue), log an error message
+            logger.error("Error: Unable to read the file '%s'. Check file permissions.", user_agents_file)
+            return None
+
+        try:
+            logger.info("Writing successful user agents to: %s", output_file)
+            writer = AgentWriter(output_file, checkpoint_file, flush_every)
+        except IOError:
+            logger.error("Error: Unable to write to the file '%s'. Check file permissions.", output_file)
+            return None
+
+        start_line, stop_line = line_range if line_range is not None else (0, None)
+        start_line = max(start_line, writer.start_line)
+        if self.dedupe:
+            # Read from the first line so duplicates of already processed agents are still recognized
+            agents = dedupe_user_agents(iter_user_agents(user_agents_file, use_mmap=use_mmap))
+            agents = ((index, agent) for index, agent in agents if index >= start_line)
+        else:
+            # Seek to the first line of the range rather than reading every line before it
+            range_start = line_range[0] if line_offset else 0
+            agents = iter_user_agents(user_agents_file, start=start_line, use_mmap=use_mmap,
+                                      offset=line_offset, offset_line=range_start)
+        if stop_line is not None:
+            agents = itertools.takewhile(lambda item: item[0] < stop_line, agents)
+        if self.classifier is not None:
+            agents = classify_user_agents(agents, self.classifier)
+        # Lines an interrupted run had put aside after a transport failure are tested after the rest
+        pending = writer.pending()
+        if pending:
+            logger.info("Testing %s user agents left without a verdict by the interrupted run.", len(pending))
+            agents = itertools.chain(agents, pending)
+        return agents, writer
+
+    def _filter_stream(self, agents: Iterator[Tuple[int, str]], writer: AgentWriter) -> Iterator[str]:
+        """
+        Test user agents one at a time, writing and yielding the successful ones.
+
+        User agents whose check ended in a transport failure are tested again after the rest of
+        the input, up to `RetryPolicy.defer_passes` times.
+
+        Args:
+            agents (iterator): (line_index, user_agent) pairs from `iter_user_agents`.
+            writer (AgentWriter): The writer for the output file.
+
+        Yields:
+            str: Each successful user agent, after it has been written.
+        """
+        progress = ProgressReporter(logger, self.PROGRESS_EVERY, self.PROGRESS_INTERVAL)
+        passes = self.retry_policy.defer_passes
+        deferred: List[Tuple[int, str]] = []
+        completed = False
+        try:
+            for pass_number in range(passes + 1):
+                if pass_number:
+                    if not deferred:
+                        break
+                    logger.info("Testing %s user agents again after transport failures (pass %s of %s).",
+                                len(deferred), pass_number, passes)
+                    agents, deferred = iter(deferred), []
+                for index, user_agent in agents:
+                    # Display a progress line every so often rather than one per user agent
+                    logger.debug("Testing user agent %d", index + 1)
+
+                    # Use a fresh cached verdict without a request or a delay
+                    cached = self._cached_verdict(user_agent)
+                    if cached is not None:
+                        outcome = ACCEPTED if cached else REJECTED
+                    else:
+                        # Test the user agent against the specified URL
+                        outcome = self.check_outcome(user_agent)
+
+                        # Add a random delay between requests to mimic human behavior, unless the
+                        # rate limiter already paces requests
+                        if self.rate_limiter is None:
+                            delay = random.uniform(*self.delay_range)
+                            logger.debug("Delaying for %.2f seconds before the next request", delay)
+                            time.sleep(delay)
+
+                    if outcome == TRANSPORT_FAILURE and pass_number < passes:
+                        # Keep the line in the checkpoint until its deferred pass gives a verdict
+                        deferred.append((index, user_agent))
+                        writer.defer(index, user_agent)
+                        continue
+
+                    success = outcome == ACCEPTED
+                    if success:
+                        writer.write(user_agent)
+                    # Record progress before handing the agent out, so stopping here never loses it
+                    writer.resolve(index)
+                    writer.advance(index + 1)
+                    progress.update(success)
+                    if success:
+                        yield user_agent
+            progress.finish()
+            completed = True
+        finally:
+            writer.close(completed=completed)
+
+        self._log_summary(writer.output_file, writer.written)
+
+    def _log_summary(self, output_file: str, written: int) -> None:
+        """
+        Log a summary of a finished filtering run.
+
+        Args:
+            output_file (str): Path to the file the successful user agents were saved to.
+            written (int): Number of successful user agents in the output file.
+        """
+        logger.info("Successful user agents: %s", written)
+        logger.info("Successfully wrote %s user agents to %s.", written, output_file)
+
+        # If no successful user agents are found, suggest using a proxy
+        if written == 0:
+            logger.warning("Warning: No successful user agents found. Consider using a proxy if not already used.")
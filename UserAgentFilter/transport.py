@@ -0,0 +1,466 @@
+import asyncio
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.request import ACCEPT_ENCODING
+
+from .adapters import TimedHTTPAdapter
+
+# Status codes that mean a server does not support HEAD requests
+HEAD_UNSUPPORTED_STATUS_CODES = (405, 501)
+
+
+class ProbeRequest(NamedTuple):
+    """
+    One probe request, as passed to `Transport.send`.
+
+    Attributes:
+        url (str): The URL to probe.
+        headers (dict): The request headers, including the User-Agent.
+        proxy (dict or None): The proxy setting from `UserAgentTester.get_proxy`.
+        timeout (float): Timeout in seconds.
+        probe_mode (str): One of `UserAgentTester.PROBE_MODES`.
+        probe_bytes (int): Number of body bytes to read in 'capped' mode.
+    """
+    url: str
+    headers: Dict[str, str]
+    proxy: Optional[Dict[str, str]]
+    timeout: float
+    probe_mode: str = 'get'
+    probe_bytes: int = 1024
+
+
+class ProbeResponse(NamedTuple):
+    """
+    The answer to a probe request.
+
+    Attributes:
+        status_code (int): The HTTP status code.
+        headers (Mapping): The response headers; lookups are case-insensitive.
+        content (bytes): The body, or the prefix of it that was read ('capped' mode), or b''.
+        elapsed (float): Time in seconds until the response headers arrived.
+        received (int): Number of body bytes received from the network.
+        http_version (str): The protocol the response came over, e.g. 'HTTP/1.1' or 'HTTP/2'.
+    """
+    status_code: int
+    headers: Mapping[str, str]
+    content: bytes
+    elapsed: float
+    received: int
+    http_version: str = 'HTTP/1.1'
+
+
+class Transport:
+    """
+    The HTTP backend that sends the probe requests of a `UserAgentTester`.
+
+    A transport is shared by all the threads of a tester, so `send` must be thread-safe. It
+    follows redirects, honors `ProbeRequest.probe_mode` and reports failures as `requests`
+    exceptions: `requests.exceptions.Timeout`, `ConnectionError`, `ProxyError`, `InvalidURL`, or
+    `requests.RequestException` for anything else. The tester's `RetryPolicy` then treats every
+    transport the same way.
+
+    Attributes:
+        accept_encoding (str): The content encodings the transport can decode, sent as the
+                               Accept-Encoding header.
+    """
+
+    accept_encoding = 'gzip, deflate'
+
+    def send(self, request: ProbeRequest) -> ProbeResponse:
+        """
+        Send a probe request.
+
+        Args:
+            request (ProbeRequest): The request to send.
+
+        Returns:
+            ProbeResponse: The response.
+
+        Raises:
+            requests.RequestException: If no response was received.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Close the open connections. The transport can still be used afterwards.
+        """
+
+    def settings(self) -> Dict[str, Any]:
+        """
+        Return the keyword arguments that build an equivalent transport, e.g. in a worker process.
+
+        Only the configuration is passed on; open connections and other state of this instance
+        are not.
+
+        Returns:
+            dict: The constructor arguments.
+
+        Raises:
+            NotImplementedError: If the transport cannot be rebuilt from keyword arguments.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not describe its settings")
+
+
+class RequestsTransport(Transport):
+    """
+    The default transport: HTTP/1.1 over pooled `requests` sessions.
+
+    Sessions are keyed by their proxy settings, so every check going through the same proxy
+    (or through no proxy) reuses the same keep-alive connections instead of paying for a new
+    TCP and TLS handshake. The underlying urllib3 connection pools are thread-safe, which lets
+    the concurrent filtering modes share a session between worker threads. Connect and TLS times
+    are recorded for `UserAgentFilter.adapters.connection_timings`.
+    """
+
+    # Only the encodings urllib3 can decode here ('br' and 'zstd' need optional packages)
+    accept_encoding = ACCEPT_ENCODING.replace(',', ', ')
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, keep_alive: bool = True):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_connections (int, optional): Number of per-host connection pools cached by each session. Default is 10.
+            pool_maxsize (int, optional): Maximum number of connections kept open per host by each session. Default is 10.
+            keep_alive (bool, optional): Reuse connections between checks. Default is True.
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        # One pooled session per proxy endpoint, created lazily by `session`
+        self._sessions: Dict[tuple, requests.Session] = {}
+        self._sessions_lock = threading.Lock()
+
+    def session(self, proxy: Optional[Dict[str, str]]) -> requests.Session:
+        """
+        Return the pooled session for a proxy endpoint, creating it on first use.
+
+        Args:
+            proxy (dict or None): The proxy setting.
+
+        Returns:
+            requests.Session: The session to send the request with.
+        """
+        key = tuple(sorted(proxy.items())) if proxy else ()
+        session = self._sessions.get(key)
+        if session is not None:
+            return session
+
+        with self._sessions_lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = TimedHTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                if proxy:
+                    session.proxies.update(proxy)
+                if not self.keep_alive:
+                    session.headers['Connection'] = 'close'
+                self._sessions[key] = session
+        return session
+
+    def send(self, request: ProbeRequest) -> ProbeResponse:
+        """
+        Send a probe request according to its `probe_mode`.
+
+        Only the status code (and at most `probe_bytes` of the body in 'capped' mode) is needed to
+        judge a user agent, so the lighter modes avoid downloading and decompressing the page:
+
+        - 'get': a plain GET; the whole body is downloaded.
+        - 'head': a HEAD request. If the server answers 405 or 501, a streamed GET is sent instead.
+        - 'stream': a streamed GET whose connection is closed as soon as the headers have arrived.
+        - 'capped': a streamed GET that reads at most `probe_bytes` of the body before closing.
+
+        Args:
+            request (ProbeRequest): The request to send.
+
+        Returns:
+            ProbeResponse: The response.
+        """
+        session = self.session(request.proxy)
+        options = dict(headers=request.headers, timeout=request.timeout, verify=False)
+        if request.probe_mode == 'get':
+            return self._wrap(session.get(request.url, **options))
+
+        if request.probe_mode == 'head':
+            response = session.head(request.url, allow_redirects=True, **options)
+            if response.status_code not in HEAD_UNSUPPORTED_STATUS_CODES:
+                return self._wrap(response)
+
+        response = session.get(request.url, stream=True, **options)
+        try:
+            content = b''
+            if request.probe_mode == 'capped':
+                # The (decoded) prefix of the body, for callers that inspect it
+                content = next(response.iter_content(request.probe_bytes), b'')[:request.probe_bytes]
+            return self._wrap(response, content)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _wrap(response: requests.Response, content: Optional[bytes] = None) -> ProbeResponse:
+        if content is None:
+            content = response.content
+        # Bytes read from the network, before decompression, when urllib3 can tell
+        tell = getattr(response.raw, 'tell', None)
+        return ProbeResponse(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=content,
+            elapsed=response.elapsed.total_seconds(),
+            received=tell() if tell is not None else len(content),
+        )
+
+    def close(self) -> None:
+        """
+        Close all pooled sessions and the connections they keep open.
+        """
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def settings(self) -> Dict[str, Any]:
+        return {'pool_connections': self.pool_connections, 'pool_maxsize': self.pool_maxsize,
+                'keep_alive': self.keep_alive}
+
+
+class HTTPXTransport(Transport):
+    """
+    An HTTP/2 transport that multiplexes many probes over a few connections per host.
+
+    Requests are sent by an `httpx.AsyncClient` running on an event loop in a background thread,
+    one client per proxy endpoint. The checks of the tester's worker threads (or of its
+    asynchronous modes) hand their requests to that loop, so concurrent probes to the same host
+    share its HTTP/2 connections as parallel streams instead of each holding a connection of its
+    own. Hosts that do not negotiate HTTP/2, and plain http:// URLs, are spoken to over HTTP/1.1.
+
+    Needs the optional httpx dependency: `pip install UserAgentFilter[http2]`. Any httpx from 0.20
+    on works, including the releases before 0.26 (the last ones for Python 3.7) that take the
+    proxy as `proxies=`. Connect and TLS times are not recorded.
+    """
+
+    def __init__(self, http2: bool = True, max_connections: int = 10, keep_alive: bool = True):
+        """
+        Initialize the transport.
+
+        Args:
+            http2 (bool, optional): Negotiate HTTP/2 where the server supports it. Default is True.
+            max_connections (int, optional): Maximum number of connections per client. Default is 10.
+            keep_alive (bool, optional): Reuse connections between checks. Default is True.
+
+        Raises:
+            ImportError: If httpx (or h2, for HTTP/2) is not installed.
+        """
+        try:
+            import httpx
+            if http2:
+                import h2  # noqa: F401
+        except ImportError:
+            raise ImportError("HTTPXTransport needs httpx with HTTP/2 support: pip install UserAgentFilter[http2]") from None
+        self._httpx = httpx
+        # httpx 0.26 renamed the client's `proxies` argument to `proxy` and 0.28 removed `proxies`
+        client_parameters = inspect.signature(httpx.AsyncClient.__init__).parameters
+        self._proxy_argument = 'proxy' if 'proxy' in client_parameters else 'proxies'
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.keep_alive = keep_alive
+        decoders = getattr(getattr(httpx, '_decoders', None), 'SUPPORTED_DECODERS', ('gzip', 'deflate'))
+        self.accept_encoding = ', '.join(name for name in decoders if name != 'identity')
+        self._clients: Dict[Optional[str], Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='HTTPXTransport', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def send(self, request: ProbeRequest) -> ProbeResponse:
+        """
+        Send a probe request from any thread, waiting for the background event loop to answer it.
+
+        Args:
+            request (ProbeRequest): The request to send.
+
+        Returns:
+            ProbeResponse: The response.
+        """
+        return asyncio.run_coroutine_threadsafe(self.asend(request), self._ensure_loop()).result()
+
+    def _client(self, proxy: Optional[Dict[str, str]]):
+        # Only called on the event loop's thread, so no lock is needed
+        url = (proxy.get('https') or proxy.get('http')) if proxy else None
+        client = self._clients.get(url)
+        if client is None:
+            httpx = self._httpx
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections if self.keep_alive else 0)
+            options = {self._proxy_argument: url} if url else {}
+            client = httpx.AsyncClient(http2=self.http2, limits=limits, verify=False, follow_redirects=True,
+                                       **options)
+            self._clients[url] = client
+        return client
+
+    async def asend(self, request: ProbeRequest) -> ProbeResponse:
+        """
+        Send a probe request on the transport's event loop.
+
+        Args:
+            request (ProbeRequest): The request to send.
+
+        Returns:
+            ProbeResponse: The response.
+        """
+        httpx = self._httpx
+        client = self._client(request.proxy)
+        # Connection headers are not allowed in HTTP/2; keep_alive=False is applied through the pool limits
+        headers = request.headers
+        try:
+            started = time.perf_counter()
+            if request.probe_mode == 'head':
+                response = await client.head(request.url, headers=headers, timeout=request.timeout)
+                if response.status_code not in HEAD_UNSUPPORTED_STATUS_CODES:
+                    return self._wrap(response, b'', time.perf_counter() - started)
+                started = time.perf_counter()
+            async with client.stream('GET', request.url, headers=headers, timeout=request.timeout) as response:
+                elapsed = time.perf_counter() - started
+                if request.probe_mode == 'get':
+                    content = await response.aread()
+                elif request.probe_mode == 'capped':
+                    chunks: List[bytes] = []
+                    size = 0
+                    async for chunk in response.aiter_bytes():
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= request.probe_bytes:
+                            break
+                    content = b''.join(chunks)[:request.probe_bytes]
+                else:
+                    content = b''
+                return self._wrap(response, content, elapsed)
+        except httpx.ProxyError as e:
+            raise requests.exceptions.ProxyError(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except (httpx.UnsupportedProtocol, getattr(httpx, 'InvalidURL', httpx.UnsupportedProtocol)) as e:
+            raise requests.exceptions.InvalidURL(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.RequestException(str(e)) from e
+
+    @staticmethod
+    def _wrap(response, content: bytes, elapsed: float) -> ProbeResponse:
+        return ProbeResponse(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=content,
+            elapsed=elapsed,
+            received=response.num_bytes_downloaded,
+            http_version=response.http_version,
+        )
+
+    def close(self) -> None:
+        """
+        Close the clients and stop the background event loop; both are restarted on the next request.
+        """
+        with self._loop_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        async def close_clients():
+            clients = list(self._clients.values())
+            self._clients.clear()
+            for client in clients:
+                await client.aclose()
+
+        asyncio.run_coroutine_threadsafe(close_clients(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def settings(self) -> Dict[str, Any]:
+        return {'http2': self.http2, 'max_connections': self.max_connections, 'keep_alive': self.keep_alive}
+
+
+# What a `FakeTransport` handler returns: a status code, (status, headers, body), or an exception to raise
+FakeAnswer = Union[int, Tuple[int, Dict[str, str], bytes], Exception]
+
+
+class FakeTransport(Transport):
+    """
+    An in-memory transport for tests: requests are answered without any network I/O.
+
+    Like the test suite's mock server, requests whose User-Agent contains one of the `blocked`
+    substrings get a 403 and every other request gets a 200 with `body`. Answers appended to
+    `queued` are used first, in order, and a `handler` callable, if given, answers every other
+    request instead. An answer is a status code, a (status, headers, body) tuple, or an exception
+    instance that is raised, e.g. `requests.exceptions.Timeout()`. All requests are recorded in
+    `requests`.
+
+    A sharded run gives every worker process its own transport built from `settings`, so the
+    handler must be picklable, and `queued` answers and recorded `requests` stay in the parent.
+    """
+
+    def __init__(
+        self,
+        blocked: tuple = ('MSIE',),
+        body: bytes = b'ok',
+        handler: Optional[Callable[[ProbeRequest], FakeAnswer]] = None,
+        latency: float = 0.0
+    ):
+        """
+        Initialize the transport.
+
+        Args:
+            blocked (tuple, optional): User-Agent substrings answered with a 403. Default is ('MSIE',).
+            body (bytes, optional): The body of the default answers. Default is b'ok'.
+            handler (callable, optional): Answers each request that has no queued answer. Default is None.
+            latency (float, optional): Seconds every request takes. Default is 0.
+        """
+        self.blocked = tuple(blocked)
+        self.body = body
+        self.handler = handler
+        self.latency = latency
+        self.requests: List[ProbeRequest] = []
+        self.queued: List[FakeAnswer] = []
+        self._lock = threading.Lock()
+
+    def send(self, request: ProbeRequest) -> ProbeResponse:
+        with self._lock:
+            self.requests.append(request)
+            answer = self.queued.pop(0) if self.queued else None
+        if answer is None and self.handler is not None:
+            answer = self.handler(request)
+        if answer is None:
+            user_agent = request.headers.get('User-Agent', '')
+            answer = 403 if any(token in user_agent for token in self.blocked) else 200
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(answer, Exception):
+            raise answer
+
+        status, headers, body = (answer, {}, self.body) if isinstance(answer, int) else answer
+        if request.probe_mode in ('head', 'stream'):
+            body = b''
+        elif request.probe_mode == 'capped':
+            body = body[:request.probe_bytes]
+        return ProbeResponse(status, CaseInsensitiveDict(headers), body, self.latency, len(body))
+
+    def settings(self) -> Dict[str, Any]:
+        return {'blocked': self.blocked, 'body': self.body, 'handler': self.handler, 'latency': self.latency}
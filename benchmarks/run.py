@@ -0,0 +1,235 @@
+"""
+Offline benchmarks for UserAgentFilter.
+
+Starts a local stand-in server (and optionally a fake proxy) and measures throughput, check
+latency and peak memory of `check_user_agent`, `filter_user_agents`, `afilter_user_agents` and
+`GetUserAgent.test_user_agents` for several list sizes. Nothing is sent to the internet.
+
+    python benchmarks/run.py --sizes 100 1000 --latency 0.005 --block-rate 0.2
+    python benchmarks/run.py --json results.json
+    python benchmarks/run.py --baseline results.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# Allow running from a checkout without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from UserAgentFilter.metrics import MetricsAggregator  # noqa: E402
+from UserAgentFilter.ratelimit import HostRateLimiter  # noqa: E402
+from UserAgentFilter.selector import GetUserAgent  # noqa: E402
+from UserAgentFilter.tester import UserAgentTester  # noqa: E402
+from server import FakeProxy, StandInServer  # noqa: E402
+
+SCENARIOS = ('check', 'filter', 'afilter', 'selector')
+
+
+def make_user_agents(count: int) -> List[str]:
+    """
+    Generate distinct, realistic-looking user agents; every tenth one is an old MSIE agent.
+    """
+    agents = []
+    for index in range(count):
+        if index % 10 == 9:
+            agents.append(f'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; build {index})')
+        else:
+            agents.append(f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                          f'(KHTML, like Gecko) Chrome/{100 + index % 30}.0.{index}.0 Safari/537.36')
+    return agents
+
+
+class Benchmark:
+    """
+    Runs the scenarios against one stand-in server.
+    """
+
+    def __init__(self, url: str, proxy: Optional[str], concurrency: int, timeout: float, workdir: str):
+        self.url = url
+        self.proxy = proxy
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.workdir = workdir
+
+    def tester(self, aggregator: MetricsAggregator) -> UserAgentTester:
+        return UserAgentTester(
+            test_url=self.url,
+            proxy={'http': self.proxy, 'https': self.proxy} if self.proxy else None,
+            timeout=self.timeout,
+            delay_range=(0, 0),
+            pool_maxsize=max(10, self.concurrency),
+            hooks=[aggregator]
+        )
+
+    def write_input(self, agents: List[str]) -> str:
+        path = os.path.join(self.workdir, f'agents-{len(agents)}.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(agents) + '\n')
+        return path
+
+    def scenario(self, name: str, agents: List[str], aggregator: MetricsAggregator) -> Callable[[], int]:
+        """
+        Prepare a scenario and return a callable that runs it and returns the number of accepted agents.
+        """
+        output = os.path.join(self.workdir, 'output.txt')
+        if name == 'check':
+            tester = self.tester(aggregator)
+            return lambda: sum(tester.check_user_agent(agent) for agent in agents)
+        if name == 'filter':
+            tester = self.tester(aggregator)
+            path = self.write_input(agents)
+            return lambda: len(tester.filter_user_agents(path, output))
+        if name == 'afilter':
+            tester = self.tester(aggregator)
+            path = self.write_input(agents)
+            return lambda: len(asyncio.run(tester.afilter_user_agents(path, output, concurrency=self.concurrency)))
+        if name == 'selector':
+            path = self.write_input(agents)
+            selector = GetUserAgent(path)
+
+            def run() -> int:
+                # A fast rate limiter replaces the selector's human-like delays
+                limiter = HostRateLimiter(rate=10000, burst=10000, max_rate=10000)
+                selector.test_user_agents(len(agents), self.url, workers=self.concurrency,
+                                          rate_limiter=limiter, hooks=[aggregator])
+                return len(selector.successful_agents)
+            return run
+        raise ValueError(f"unknown scenario '{name}'")
+
+    def measure(self, name: str, size: int, memory: bool) -> Dict[str, object]:
+        agents = make_user_agents(size)
+        aggregator = MetricsAggregator()
+        run = self.scenario(name, agents, aggregator)
+        started = time.perf_counter()
+        accepted = run()
+        seconds = time.perf_counter() - started
+
+        result = {
+            'scenario': name,
+            'size': size,
+            'seconds': round(seconds, 4),
+            'agents_per_sec': round(size / seconds, 1),
+            'accepted': accepted,
+            'attempts': aggregator.attempts,
+            'p50_ms': _ms(aggregator.percentile(50)),
+            'p99_ms': _ms(aggregator.percentile(99)),
+            'peak_kib': None,
+        }
+        if memory:
+            # A second run under tracemalloc, so tracing does not slow down the timed run
+            run = self.scenario(name, agents, MetricsAggregator())
+            tracemalloc.start()
+            try:
+                run()
+                result['peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            finally:
+                tracemalloc.stop()
+        return result
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def print_table(results: List[Dict[str, object]]) -> None:
+    columns = ('scenario', 'size', 'agents_per_sec', 'p50_ms', 'p99_ms', 'peak_kib', 'accepted', 'attempts')
+    rows = [[str(result[column]) if result[column] is not None else '-' for column in columns] for result in results]
+    widths = [max(len(column), *(len(row[index]) for row in rows)) for index, column in enumerate(columns)]
+    print('  '.join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def compare(results: List[Dict[str, object]], baseline_file: str, tolerance: float) -> List[str]:
+    """
+    Compare throughput with a baseline saved with --json.
+
+    Returns:
+        list: A message for every scenario and size that got slower by more than `tolerance`.
+    """
+    with open(baseline_file, 'r') as f:
+        baseline = {(entry['scenario'], entry['size']): entry for entry in json.load(f)}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['scenario'], result['size']))
+        if previous is None:
+            continue
+        if result['agents_per_sec'] < previous['agents_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result['scenario']} ({result['size']} agents): {result['agents_per_sec']} agents/s, "
+                               f"baseline {previous['agents_per_sec']} agents/s")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Run the offline UserAgentFilter benchmarks.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000], help='list sizes (default: 100 1000)')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS),
+                        help='scenarios to run (default: all)')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='concurrency of afilter and workers of selector (default: 10)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+
+    server = parser.add_argument_group('stand-in server')
+    server.add_argument('--latency', type=float, default=0.0, help='response delay in seconds (default: 0)')
+    server.add_argument('--jitter', type=float, default=0.0, help='extra random delay in seconds (default: 0)')
+    server.add_argument('--block-rate', type=float, default=0.0, help='fraction of 403 responses')
+    server.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of 429 responses')
+    server.add_argument('--error-rate', type=float, default=0.0, help='fraction of 5xx responses')
+    server.add_argument('--redirect-rate', type=float, default=0.0, help='fraction of redirects')
+    server.add_argument('--timeout-rate', type=float, default=0.0, help='fraction of requests left unanswered')
+    server.add_argument('--client-timeout', type=float, default=1.0,
+                        help='request timeout of the tester in seconds (default: 1)')
+    server.add_argument('--proxy', action='store_true', help='send every request through a local fake proxy')
+    server.add_argument('--proxy-latency', type=float, default=0.0, help='delay added by the fake proxy')
+    server.add_argument('--proxy-failure-rate', type=float, default=0.0, help='fraction of 502s from the fake proxy')
+
+    output = parser.add_argument_group('results')
+    output.add_argument('--json', metavar='PATH', help='save the results as JSON, e.g. as a baseline')
+    output.add_argument('--baseline', metavar='PATH', help='fail if throughput dropped compared to this file')
+    output.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed throughput drop against the baseline (default: 0.25)')
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    stand_in = StandInServer(
+        latency=args.latency, jitter=args.jitter, block_rate=args.block_rate, throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate, redirect_rate=args.redirect_rate, timeout_rate=args.timeout_rate,
+        hang=args.client_timeout + 1)
+    fake_proxy = FakeProxy(latency=args.proxy_latency, failure_rate=args.proxy_failure_rate) if args.proxy else None
+
+    results = []
+    with stand_in, tempfile.TemporaryDirectory() as workdir:
+        if fake_proxy is not None:
+            fake_proxy.__enter__()
+        try:
+            benchmark = Benchmark(stand_in.url, fake_proxy.url if fake_proxy else None,
+                                  args.concurrency, args.client_timeout, workdir)
+            for size in args.sizes:
+                for name in args.scenarios:
+                    results.append(benchmark.measure(name, size, memory=not args.no_memory))
+        finally:
+            if fake_proxy is not None:
+                fake_proxy.__exit__(None, None, None)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for message in regressions:
+            print(f"Regression: {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import http.client
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Benchmarks open many connections at once
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close their connection before the reply is written
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInServer:
+    """
+    A local HTTP server that stands in for a target website in the benchmarks.
+
+    Every response is delayed by `latency` seconds plus up to `jitter` seconds. Requests whose
+    User-Agent contains one of the `blocked` substrings get a 403. Other requests get, at the
+    configured rates, a 403, a 429 (with `Retry-After: 0`), a 500/502/503, a redirect to `/final`,
+    or no answer for `hang` seconds so the client times out. All remaining requests get a 200
+    with a `body_size` byte body. The outcome is drawn from a seeded random generator, so runs
+    with the same settings see the same mix of responses.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        block_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        redirect_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        hang: float = 3.0,
+        body_size: int = 2048,
+        blocked: tuple = ('MSIE',),
+        seed: int = 0
+    ):
+        rates = block_rate + throttle_rate + error_rate + redirect_rate + timeout_rate
+        if rates > 1:
+            raise ValueError("the response rates must add up to at most 1")
+        self.latency = latency
+        self.jitter = jitter
+        self.hang = hang
+        self.blocked = tuple(blocked)
+        self.body = b'x' * body_size
+        # Cumulative thresholds of the response kinds
+        self._outcomes = []
+        threshold = 0.0
+        for kind, rate in (('block', block_rate), ('throttle', throttle_rate), ('error', error_rate),
+                           ('redirect', redirect_rate), ('timeout', timeout_rate)):
+            threshold += rate
+            self._outcomes.append((threshold, kind))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    draw = server._random.random()
+                    delay = server.latency + server._random.random() * server.jitter
+                if delay:
+                    time.sleep(delay)
+
+                user_agent = self.headers.get('User-Agent', '')
+                kind = 'ok' if self.path == '/final' else server._kind(draw)
+                if any(token in user_agent for token in server.blocked):
+                    kind = 'block'
+                if kind == 'timeout':
+                    time.sleep(server.hang)
+                    self.close_connection = True
+                    return
+
+                headers = {}
+                if kind == 'block':
+                    status = 403
+                elif kind == 'throttle':
+                    status, headers = 429, {'Retry-After': '0'}
+                elif kind == 'error':
+                    status = (500, 502, 503)[int(draw * 1000) % 3]
+                elif kind == 'redirect':
+                    status, headers = 302, {'Location': '/final'}
+                else:
+                    status = 200
+                body = server.body if status == 200 else b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def _kind(self, draw: float) -> str:
+        for threshold, kind in self._outcomes:
+            if draw < threshold:
+                return kind
+        return 'ok'
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}/'
+
+    def __enter__(self) -> 'StandInServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeProxy:
+    """
+    A minimal forward HTTP proxy for the benchmarks.
+
+    It forwards plain HTTP requests (absolute-URI form) to their target and relays the response.
+    Each request is delayed by `latency` seconds, and a fraction `failure_rate` of the requests
+    get a 502 without being forwarded, as a flaky proxy would answer. HTTPS tunnels (CONNECT)
+    are not supported.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with proxy._lock:
+                    proxy.requests += 1
+                    failed = proxy._random.random() < proxy.failure_rate
+                if proxy.latency:
+                    time.sleep(proxy.latency)
+                if failed:
+                    self._reply(502, {}, b'')
+                    return
+
+                target = urlsplit(self.path)
+                headers = {name: value for name, value in self.headers.items()
+                           if name.lower() not in ('proxy-connection', 'connection', 'host')}
+                upstream = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                try:
+                    path = target.path or '/'
+                    if target.query:
+                        path += '?' + target.query
+                    upstream.request(self.command, path, headers=headers)
+                    response = upstream.getresponse()
+                    body = response.read()
+                    relayed = {name: value for name, value in response.getheaders()
+                               if name.lower() not in ('connection', 'transfer-encoding', 'content-length')}
+                    self._reply(response.status, relayed, body)
+                except OSError:
+                    self._reply(504, {}, b'')
+                finally:
+                    upstream.close()
+
+            do_HEAD = do_GET
+
+            def _reply(self, status, headers, body):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self) -> 'FakeProxy':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -14,6 +14,18 @@ setup(
         'requests>=2.25.0',
         'urllib3>=1.26.0',
     ],
+    extras_require={
+        # HTTPXTransport: multiplexed HTTP/2 requests. 0.20 is the oldest httpx it supports, and
+        # 0.24 the last release for Python 3.7
+        'http2': ['httpx[http2]>=0.20'],
+        # Runs the HTTPXTransport tests against a real httpx as well
+        'test': ['httpx[http2]>=0.20'],
+    },
+    entry_points={
+        'console_scripts': [
+            'useragentfilter=UserAgentFilter.cli:main',
+        ],
+    },
     python_requires='>=3.7',  
     classifiers=[
         'Development Status :: 5 - Production/Stable',  
@@ -0,0 +1,82 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MockServer:
+    """
+    A local HTTP server used by the offline tests.
+
+    Requests whose User-Agent contains one of the `blocked` substrings get a 403 response,
+    every other request gets a 200. All received User-Agent headers are recorded in `requests`
+    and the client ports of all connections in `connections`. Responses appended to `queued` as
+    (status, headers) pairs are sent first, in order. The request methods are recorded in `methods`;
+    with `head_allowed=False` HEAD requests get a 405.
+    """
+
+    def __init__(self, blocked=('MSIE',), body=b'ok', head_allowed=True):
+        self.blocked = tuple(blocked)
+        self.body = body
+        self.head_allowed = head_allowed
+        self.requests = []
+        self.methods = []
+        self.connections = set()
+        self.queued = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self):
+                if server.head_allowed:
+                    self.do_GET()
+                    return
+                with server._lock:
+                    server.methods.append('HEAD')
+                self.send_response(405)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self):
+                user_agent = self.headers.get('User-Agent', '')
+                with server._lock:
+                    server.requests.append(user_agent)
+                    server.methods.append(self.command)
+                    server.connections.add(self.client_address[1])
+                    queued = server.queued.pop(0) if server.queued else None
+                if queued:
+                    status, headers = queued
+                else:
+                    status = 403 if any(token in user_agent for token in server.blocked) else 200
+                    headers = {}
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(server.body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(server.body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}/'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
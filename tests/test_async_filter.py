@@ -0,0 +1,75 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from UserAgentFilter.tester import UserAgentTester
+from UserAgentFilter.transport import FakeTransport
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestAsyncFilter(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tester = UserAgentTester(test_url=self.server.url, delay_range=(0, 0))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    def test_async_matches_sync(self):
+        sync_output = os.path.join(self.tmpdir.name, 'sync.txt')
+        async_output = os.path.join(self.tmpdir.name, 'async.txt')
+
+        expected = self.tester.filter_user_agents(USER_AGENTS_FILE, sync_output)
+        actual = asyncio.run(self.tester.afilter_user_agents(USER_AGENTS_FILE, async_output, concurrency=4))
+
+        self.assertEqual(actual, expected)
+        self.assertEqual(len(actual), 6)
+        with open(sync_output) as f_sync, open(async_output) as f_async:
+            self.assertEqual(f_async.read(), f_sync.read())
+
+    def test_acheck_user_agent(self):
+        self.assertTrue(asyncio.run(self.tester.acheck_user_agent('Mozilla/5.0 Firefox/120.0')))
+        self.assertFalse(asyncio.run(self.tester.acheck_user_agent('Mozilla/4.0 (compatible; MSIE 6.0)')))
+
+    def test_checks_to_one_host_overlap(self):
+        # Each worker waits a full delay between its own requests, but the workers run side by side
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def handler(request):
+            with lock:
+                in_flight.append(request)
+                peak.append(len(in_flight))
+            time.sleep(0.2)
+            with lock:
+                in_flight.remove(request)
+            return 200
+
+        agents = [(index, f'Mozilla/5.0 Firefox/{100 + index}.0') for index in range(4)]
+        tester = UserAgentTester(test_url='http://example.com/', delay_range=(1, 1),
+                                 transport=FakeTransport(handler=handler))
+
+        async def run():
+            return [result async for result in tester.aiter_check_user_agents(agents, concurrency=4)]
+
+        started = time.monotonic()
+        results = asyncio.run(run())
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual([success for _, _, success in results], [True] * 4)
+        self.assertEqual(max(peak), 4)
+
+    def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(self.tester.afilter_user_agents(USER_AGENTS_FILE, 'unused.txt', concurrency=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
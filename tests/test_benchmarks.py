@@ -0,0 +1,48 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import run  # noqa: E402
+
+
+class TestBenchmarks(unittest.TestCase):
+    def run_benchmarks(self, args):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            status = run.main(args)
+        return status, stdout.getvalue()
+
+    def test_all_scenarios(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_file = os.path.join(temp_dir, 'results.json')
+            status, output = self.run_benchmarks(['--sizes', '20', '--block-rate', '0.1', '--json', results_file])
+            with open(results_file, 'r') as f:
+                results = json.load(f)
+        self.assertEqual(status, 0)
+        self.assertIn('agents_per_sec', output)
+        self.assertEqual([result['scenario'] for result in results], list(run.SCENARIOS))
+        for result in results:
+            # Every tenth generated agent is an MSIE agent, which the stand-in server blocks
+            self.assertLessEqual(result['accepted'], 18)
+            self.assertGreaterEqual(result['attempts'], 20)
+            self.assertIsNotNone(result['p50_ms'])
+            self.assertIsNotNone(result['peak_kib'])
+
+    def test_baseline_regression(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            baseline_file = os.path.join(temp_dir, 'baseline.json')
+            with open(baseline_file, 'w') as f:
+                json.dump([{'scenario': 'check', 'size': 10, 'agents_per_sec': 1e9}], f)
+            status, _ = self.run_benchmarks(['--sizes', '10', '--scenarios', 'check', '--proxy', '--no-memory',
+                                             '--baseline', baseline_file])
+        self.assertEqual(status, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
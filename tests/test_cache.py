@@ -0,0 +1,55 @@
+import os
+import tempfile
+import time
+import unittest
+
+from UserAgentFilter.cache import VerdictCache
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestVerdictCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'verdicts.sqlite')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_put_get_persists(self):
+        with VerdictCache(self.path) as cache:
+            cache.put('agent', 'Example.com', 200, 0.5)
+            self.assertIsNone(cache.get('agent', 'other.com'))
+        with VerdictCache(self.path) as cache:
+            verdict = cache.get('agent', 'example.com')
+            self.assertEqual(verdict.status_code, 200)
+            self.assertTrue(verdict.accepted)
+
+    def test_ttl_and_size_eviction(self):
+        with VerdictCache(self.path, ttl=0.05, max_entries=2) as cache:
+            for index in range(3):
+                cache.put(f'agent-{index}', 'example.com', 403, 0.1)
+            self.assertEqual(cache.evict(), 1)
+            self.assertIsNone(cache.get('agent-0', 'example.com'))
+            self.assertFalse(cache.get('agent-2', 'example.com').accepted)
+            time.sleep(0.1)
+            self.assertIsNone(cache.get('agent-2', 'example.com'))
+            self.assertEqual(cache.evict(), 2)
+            self.assertEqual(len(cache), 0)
+
+    def test_rerun_skips_cached_agents(self):
+        output_file = os.path.join(self.tmpdir.name, 'out.txt')
+        with MockServer() as server, VerdictCache(self.path) as cache:
+            tester = UserAgentTester(test_url=server.url, delay_range=(0, 0), cache=cache)
+            first = tester.filter_user_agents(USER_AGENTS_FILE, output_file)
+            requests_sent = len(server.requests)
+            second = tester.filter_user_agents(USER_AGENTS_FILE, output_file)
+            self.assertEqual(second, first)
+            self.assertEqual(len(server.requests), requests_sent)
+            tester.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
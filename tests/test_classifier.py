@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from UserAgentFilter.classifier import AgentClassifier, ClassifyStats, classify_user_agents, parse_user_agent
+from UserAgentFilter.selector import GetUserAgent
+from UserAgentFilter.streaming import iter_user_agents
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+IPHONE = ('Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) AppleWebKit/605.1.15 '
+          '(KHTML, like Gecko) Version/16.5 Mobile/15E148 Safari/604.1')
+EDGE = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0')
+
+
+class TestClassifier(unittest.TestCase):
+    def test_parse_user_agent(self):
+        self.assertEqual(tuple(parse_user_agent(EDGE)), ('Edge', 119, 'Windows', 'desktop', False))
+        self.assertEqual(tuple(parse_user_agent(IPHONE)), ('Safari', 16, 'iOS', 'mobile', False))
+        self.assertEqual(parse_user_agent('Mozilla/4.0 (compatible; MSIE 8.0; Windows NT 6.1; Trident/4.0)')[:2],
+                         ('IE', 8))
+        self.assertEqual(parse_user_agent('Mozilla/5.0 (Windows NT 10.0; Trident/7.0; rv:11.0) like Gecko')[:2],
+                         ('IE', 11))
+        self.assertEqual(parse_user_agent('Mozilla/5.0 (Linux; Android 10; K) Chrome/114.0.0.0 Safari/537.36').device,
+                         'tablet')
+        self.assertEqual(parse_user_agent('Mozilla/5.0 (compatible; Googlebot/2.1)').device, 'bot')
+        self.assertTrue(parse_user_agent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML').malformed)
+
+    def test_rules(self):
+        classifier = AgentClassifier()
+        self.assertIsNone(classifier.reject_reason(EDGE))
+        self.assertEqual(classifier.reject_reason('Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1)'), 'outdated')
+        self.assertEqual(classifier.reject_reason('python-requests/2.31.0 (bundled)'), 'bot')
+        self.assertEqual(classifier.reject_reason('Mozilla/5.0'), 'length')
+        self.assertEqual(classifier.reject_reason(EDGE[:75]), 'malformed')
+        self.assertEqual(AgentClassifier(devices=['mobile']).reject_reason(EDGE), 'device')
+        self.assertTrue(AgentClassifier(min_versions={}).accepts('Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1)'))
+        with self.assertRaises(ValueError):
+            AgentClassifier(devices=['watch'])
+
+    def test_classify_bundled_list(self):
+        stats = ClassifyStats()
+        agents = list(classify_user_agents(iter_user_agents(USER_AGENTS_FILE), stats=stats))
+        self.assertEqual(stats.total, 9)
+        self.assertEqual(stats.passed, 6)
+        self.assertEqual(stats.rejected, {'outdated': 3})
+        self.assertEqual(stats.requests_saved, 3)
+        self.assertEqual([index for index, _ in agents], [0, 1, 2, 3, 4, 5])
+
+    def test_filter_skips_rejected_agents(self):
+        with MockServer() as server, tempfile.TemporaryDirectory() as temp_dir:
+            tester = UserAgentTester(test_url=server.url, delay_range=(0, 0), classifier=AgentClassifier())
+            result = tester.filter_user_agents(USER_AGENTS_FILE, os.path.join(temp_dir, 'out.txt'))
+            self.assertEqual(len(result), 6)
+            # The outdated MSIE agents are never sent
+            self.assertEqual(len(server.requests), 6)
+
+    def test_selector(self):
+        with MockServer() as server:
+            selector = GetUserAgent(USER_AGENTS_FILE, classifier=AgentClassifier())
+            selector.test_user_agents(number=6, test_url=server.url)
+            self.assertEqual(len(server.requests), 6)
+            self.assertEqual(len(selector.successful_agents), 6)
+
+        for device in ('mobile', 'desktop', 'tablet'):
+            for _ in range(10):
+                self.assertEqual(parse_user_agent(selector.get_random_user_agent(device=device)).device, device)
+        self.assertIsNone(selector.get_random_user_agent(device='bot'))
+
+        # The per-device samplers follow evictions and weight changes after the first draw
+        mobile = [agent for agent in selector.successful_agents if parse_user_agent(agent).device == 'mobile']
+        self.assertGreater(len(mobile), 1)
+        selector.report(mobile[0], 403)
+        for agent in mobile[2:]:
+            selector.report(agent, False)
+        for _ in range(10):
+            self.assertEqual(selector.get_random_user_agent(device='mobile'), mobile[1])
+        selector.report(mobile[1], 403)
+        self.assertIsNone(selector.get_random_user_agent(device='mobile'))
+        selector.record_verdict(mobile[0], True)
+        self.assertEqual(selector.get_random_user_agent(device='mobile'), mobile[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
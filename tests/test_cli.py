@@ -0,0 +1,143 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from UserAgentFilter.cli import _LastAttempts, _find, build_parser, main
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+        self.options = ['--url', self.server.url, '--delay', '0', '0', '--quiet']
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def run_cli(self, args, stdin=''):
+        stdout = io.StringIO()
+        with mock.patch.object(sys, 'stdin', io.StringIO(stdin)), mock.patch.object(sys, 'stdout', stdout):
+            status = main(args + self.options)
+        return status, stdout.getvalue().splitlines()
+
+    def test_stdin_to_stdout(self):
+        status, lines = self.run_cli(['--concurrency', '4'], stdin='Mozilla/5.0 A\n\nMozilla/4.0 (MSIE 6.0)\nMozilla/5.0 B\n')
+        self.assertEqual(status, 0)
+        self.assertEqual(lines, ['Mozilla/5.0 A', 'Mozilla/5.0 B'])
+
+    def test_jsonl(self):
+        status, lines = self.run_cli([USER_AGENTS_FILE, '--format', 'jsonl', '--all', '--probe-mode', 'head'])
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(status, 0)
+        self.assertEqual(len(records), 9)
+        self.assertEqual(sum(record['accepted'] for record in records), 6)
+        self.assertEqual({record['status_code'] for record in records}, {200, 403})
+        self.assertTrue(all(record['latency'] >= 0 for record in records))
+        self.assertEqual(set(self.server.methods), {'HEAD'})
+
+    def test_jsonl_reports_each_request(self):
+        # Without --cache, duplicates are tested again and block pages keep their real status code
+        self.server.body = b'<html><title>Robot Check</title></html>'
+        status, lines = self.run_cli(['--format', 'jsonl', '--all', '--detect-blocks'],
+                                     stdin='Mozilla/5.0 A\nMozilla/5.0 A\n')
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(status, 1)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual([(record['status_code'], record['blocked']) for record in records],
+                         [(200, 'robot check')] * 2)
+
+    def test_jsonl_transport_failure(self):
+        # Both attempts of both passes are answered with a 503: the record shows the last one
+        self.server.queued.extend([(503, {})] * 4)
+        status, lines = self.run_cli(['--format', 'jsonl', '--all', '--retries', '2', '--backoff', '0'],
+                                     stdin='Mozilla/5.0 A\n')
+        record = json.loads(lines[0])
+        self.assertEqual(status, 1)
+        self.assertEqual((record['accepted'], record['status_code']), (False, 503))
+
+    def test_jsonl_duplicates_keep_their_attempts(self):
+        # Two checks of the same string run at once: one is rejected with a 404, the other is accepted
+        self.server.queued.append((404, {}))
+        status, lines = self.run_cli(['--format', 'jsonl', '--all', '--concurrency', '2'],
+                                     stdin='Mozilla/5.0 A\nMozilla/5.0 A\n')
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted((record['accepted'], record['status_code']) for record in records),
+                         [(False, 404), (True, 200)])
+
+    def test_target_drops_unprinted_attempts(self):
+        args = build_parser().parse_args(['--format', 'jsonl', '--target', '1'] + self.options)
+        attempts = _LastAttempts()
+        tester = UserAgentTester(test_url=self.server.url, delay_range=(0, 0))
+        out = io.StringIO()
+        agents = enumerate(['Mozilla/4.0 (MSIE 6.0)', 'Mozilla/5.0 A'])
+        self.assertEqual(_find(tester, agents, out, args, attempts), 1)
+        self.assertEqual(json.loads(out.getvalue())['status_code'], 200)
+        # The attempts of the rejected agent were not kept after the run
+        self.assertIsNone(attempts.pop('Mozilla/4.0 (MSIE 6.0)'))
+        self.assertEqual(tester.hooks, [])
+
+    def test_output_file_and_dedupe(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, 'good.txt')
+            status, lines = self.run_cli([USER_AGENTS_FILE, '-o', output, '--dedupe'])
+            with open(output) as f:
+                written = f.read().splitlines()
+        self.assertEqual(status, 0)
+        self.assertEqual(lines, [])
+        # The ",gzip(gfe)" variant of the first agent is dropped as a duplicate
+        self.assertEqual(len(written), 5)
+
+    def test_classify(self):
+        status, lines = self.run_cli(['--device', 'desktop'], stdin=open(USER_AGENTS_FILE).read())
+        self.assertEqual(status, 0)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_block_signature(self):
+        self.server.body = b'<html><h1>Please wait while we check your browser</h1></html>'
+        status, lines = self.run_cli(['--block-signature', 'check your browser'], stdin='Mozilla/5.0 A\n')
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [])
+
+    def test_target_with_model(self):
+        stdin = ''.join(f'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; build {index})\n' for index in range(10))
+        stdin += open(USER_AGENTS_FILE).read()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            model = os.path.join(temp_dir, 'model.json')
+            status, lines = self.run_cli(['--target', '2', '--model', model], stdin=stdin)
+            self.assertEqual(status, 0)
+            self.assertEqual(len(lines), 2)
+            self.assertLessEqual(len(self.server.requests), 3)
+            self.assertTrue(os.path.exists(model))
+
+            # The saved model knows MSIE is blocked, so no MSIE agent is tried first
+            self.server.requests.clear()
+            status, lines = self.run_cli(['--target', '2', '--model', model], stdin=stdin)
+            self.assertEqual(len(self.server.requests), 2)
+
+    def test_metrics_export(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'metrics.prom')
+            self.run_cli([USER_AGENTS_FILE, '--metrics', path, '--metrics-format', 'prometheus'])
+            with open(path) as f:
+                self.assertIn('useragentfilter_attempts_total 9', f.read())
+
+    def test_nothing_accepted(self):
+        status, lines = self.run_cli([], stdin='Mozilla/4.0 (MSIE 6.0)\n')
+        self.assertEqual((status, lines), (1, []))
+
+    def test_batch_needs_files(self):
+        with mock.patch.object(sys, 'stderr', io.StringIO()), self.assertRaises(SystemExit):
+            self.run_cli(['--processes', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
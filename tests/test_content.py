@@ -0,0 +1,98 @@
+import unittest
+
+from UserAgentFilter.cache import VerdictCache
+from UserAgentFilter.content import DEFAULT_BLOCK_SIGNATURES, VENDOR_BLOCK_SIGNATURES, BlockDetector, SignatureMatcher
+from UserAgentFilter.metrics import MetricsAggregator
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+AGENT = 'Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0'
+ROBOT_CHECK = (b'<!doctype html><html><head><title dir="ltr">Amazon.in</title></head><body>'
+               b'<h4>Type the characters you see in this image:</h4>'
+               b'<form method="get" action="/errors/validateCaptcha"></form></body></html>')
+# An ordinary page of a site that loads bot-protection scripts
+VENDOR_PAGE = (b'<!doctype html><html><head><title>Shoes</title>'
+               b'<script src="https://js.datadome.co/tags.js"></script>'
+               b'<script src="/cdn-cgi/challenge-platform/scripts/jsd/main.js"></script>'
+               b'<div id="px-captcha"></div></head><body>Shoes</body></html>')
+
+
+class TestSignatureMatcher(unittest.TestCase):
+    def test_finds_first_match(self):
+        matcher = SignatureMatcher(['he', 'she', 'his', 'hers'])
+        self.assertEqual(matcher.search(b'ushers'), 'she')
+        self.assertEqual(matcher.search(b'ahis'), 'his')
+        self.assertIsNone(matcher.search(b'hxe'))
+
+    def test_overlapping_patterns(self):
+        # 'abcd' fails after 'abc', and the automaton must fall back to 'bce' without rescanning
+        matcher = SignatureMatcher(['abcd', 'bce'])
+        self.assertEqual(matcher.search(b'xabce'), 'bce')
+        self.assertEqual(SignatureMatcher(['aab']).search(b'aaab'), 'aab')
+
+    def test_case_insensitive(self):
+        self.assertEqual(SignatureMatcher(['Robot Check']).search(b'<TITLE>ROBOT CHECK</TITLE>'), 'Robot Check')
+
+    def test_empty(self):
+        self.assertIsNone(SignatureMatcher([]).search(b'anything'))
+
+
+class TestBlockDetector(unittest.TestCase):
+    def test_default_signatures(self):
+        detector = BlockDetector()
+        self.assertIn(detector.detect('www.amazon.in', ROBOT_CHECK), DEFAULT_BLOCK_SIGNATURES)
+        self.assertIsNone(detector.detect('www.amazon.in', b'<html><title>Shoes</title></html>'))
+
+    def test_vendor_scripts_are_not_block_pages(self):
+        self.assertIsNone(BlockDetector().detect('www.example.com', VENDOR_PAGE))
+        self.assertIn(BlockDetector(vendor_markers=True).detect('www.example.com', VENDOR_PAGE),
+                      VENDOR_BLOCK_SIGNATURES)
+        challenge = b'<!DOCTYPE html><html><head><title>Just a moment...</title>'
+        self.assertIsNotNone(BlockDetector().detect('www.example.com', challenge))
+
+    def test_host_signatures_apply_to_subdomains(self):
+        detector = BlockDetector({'example.com': ['please enable cookies']}, defaults=False)
+        page = b'<p>Please enable cookies.</p>'
+        self.assertEqual(detector.detect('www.example.com:8443', page), 'please enable cookies')
+        self.assertIsNone(detector.detect('example.org', page))
+        self.assertIsNone(detector.detect('example.com', ROBOT_CHECK))
+
+    def test_only_prefix_is_searched(self):
+        detector = BlockDetector(max_bytes=100)
+        self.assertIsNone(detector.detect('example.com', b' ' * 100 + b'robot check'))
+
+
+class TestTesterBlockPages(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(body=ROBOT_CHECK).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_block_page_is_rejected_and_cached(self):
+        cache = VerdictCache(':memory:')
+        metrics = MetricsAggregator()
+        with UserAgentTester(test_url=self.server.url, cache=cache, hooks=[metrics], probe_mode='capped',
+                             block_detector=BlockDetector()) as tester:
+            self.assertFalse(tester.check_user_agent(AGENT))
+            self.assertFalse(tester.check_user_agent(AGENT))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(cache.get(AGENT, self.server.url.split('/')[2]).status_code, 403)
+        self.assertEqual(metrics.block_pages, 1)
+
+    def test_without_detector_block_page_is_accepted(self):
+        with UserAgentTester(test_url=self.server.url) as tester:
+            self.assertTrue(tester.check_user_agent(AGENT))
+
+    def test_page_loading_vendor_scripts_is_accepted(self):
+        with MockServer(body=VENDOR_PAGE) as server:
+            with UserAgentTester(test_url=server.url, block_detector=BlockDetector()) as tester:
+                self.assertTrue(tester.check_user_agent(AGENT))
+
+    def test_needs_body(self):
+        with self.assertRaises(ValueError):
+            UserAgentTester(test_url=self.server.url, probe_mode='head', block_detector=BlockDetector())
+
+
+if __name__ == '__main__':
+    unittest.main()
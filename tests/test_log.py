@@ -0,0 +1,50 @@
+import logging
+import subprocess
+import sys
+import unittest
+
+from UserAgentFilter.log import PACKAGE_LOGGER, ProgressReporter, configure_logging, shutdown_logging
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestLogging(unittest.TestCase):
+    def test_import_leaves_root_logger_alone(self):
+        code = 'import logging, UserAgentFilter; print(len(logging.getLogger().handlers))'
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '0')
+
+    def test_queue_handler(self):
+        handler = _ListHandler()
+        logger = configure_logging(logging.INFO, handler=handler, use_queue=True)
+        try:
+            logging.getLogger(PACKAGE_LOGGER + '.tester').info("Tested %d user agents", 3)
+            logging.getLogger(PACKAGE_LOGGER + '.tester').debug("hidden")
+        finally:
+            shutdown_logging()
+        self.assertEqual(handler.messages, ['Tested 3 user agents'])
+        self.assertEqual(logger.handlers, [h for h in logger.handlers if isinstance(h, logging.NullHandler)])
+
+    def test_progress_is_aggregated(self):
+        handler = _ListHandler()
+        logger = logging.getLogger('test_progress')
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        progress = ProgressReporter(logger, every=10, interval=3600, total=25)
+        for index in range(25):
+            progress.update(index % 5 == 0)
+        progress.finish()
+        progress.finish()
+        self.assertEqual(len(handler.messages), 3)
+        self.assertTrue(handler.messages[-1].startswith('Tested 25 of 25 user agents (5 accepted'))
+
+
+if __name__ == '__main__':
+    unittest.main()
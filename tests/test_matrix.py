@@ -0,0 +1,46 @@
+import os
+import unittest
+
+from UserAgentFilter.ratelimit import HostRateLimiter
+from UserAgentFilter.selector import GetUserAgent
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestMatrix(unittest.TestCase):
+    def setUp(self):
+        self.strict = MockServer(blocked=('MSIE', 'Android')).__enter__()
+        self.lenient = MockServer(blocked=()).__enter__()
+        self.urls = [self.strict.url, self.lenient.url + 'page']
+
+    def tearDown(self):
+        self.strict.__exit__(None, None, None)
+        self.lenient.__exit__(None, None, None)
+
+    def test_matrix(self):
+        agents = ['Mozilla/5.0 (Windows NT 10.0) Chrome/119.0', 'Mozilla/5.0 (Linux; Android 10) Chrome/114.0']
+        with UserAgentTester(test_url=self.urls[0], delay_range=(0, 0)) as tester:
+            matrix = tester.test_matrix(agents, self.urls, concurrency=4)
+        self.assertEqual(matrix, {
+            agents[0]: {self.urls[0]: True, self.urls[1]: True},
+            agents[1]: {self.urls[0]: False, self.urls[1]: True},
+        })
+        self.assertEqual(len(self.strict.requests), 2)
+        self.assertEqual(len(self.lenient.requests), 2)
+
+    def test_selector_matrix(self):
+        selector = GetUserAgent(USER_AGENTS_FILE)
+        limiter = HostRateLimiter(rate=100.0, burst=10.0, max_rate=100.0)
+        matrix = selector.test_user_agents_matrix(number=9, urls=self.urls, concurrency=4, rate_limiter=limiter)
+        self.assertEqual(len(matrix), 9)
+        self.assertEqual(len(selector.url_agents[self.urls[1]]), 9)
+        self.assertEqual(len(selector.url_agents[self.urls[0]]), 3)
+        self.assertEqual(sorted(selector.successful_agents), sorted(selector.url_agents[self.urls[0]]))
+        self.assertNotIn('Android', selector.get_random_user_agent(self.urls[0]))
+        self.assertIsNone(selector.get_random_user_agent('http://unknown.example/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import unittest
+
+from UserAgentFilter.metrics import CheckResult, MetricsAggregator
+from UserAgentFilter.retry import RetryPolicy
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+
+def make_result(total, status_code=200, exception=None, proxy=None):
+    return CheckResult(
+        user_agent='Mozilla/5.0', url='http://example.com/', attempt=0, status_code=status_code,
+        dns=None, connect=None, tls=None, ttfb=total / 2, total=total, bytes=10,
+        proxy=proxy, exception=exception, timestamp=0.0)
+
+
+class TestCheckHooks(unittest.TestCase):
+    def test_attempts_are_reported(self):
+        results = []
+        with MockServer(body=b'x' * 100) as server:
+            tester = UserAgentTester(test_url=server.url, delay_range=(0, 0), hooks=[results.append])
+            self.assertTrue(tester.check_user_agent('Mozilla/5.0 A'))
+            self.assertFalse(tester.check_user_agent('Mozilla/4.0 (MSIE 6.0)'))
+            tester.close()
+
+        first, second = results
+        self.assertEqual((first.status_code, second.status_code), (200, 403))
+        self.assertTrue(first.accepted)
+        self.assertEqual(first.bytes, 100)
+        self.assertIsNotNone(first.connect)
+        # The second check reuses the keep-alive connection
+        self.assertIsNone(second.connect)
+        self.assertLessEqual(first.ttfb, first.total)
+        self.assertEqual(first.user_agent, 'Mozilla/5.0 A')
+
+    def test_failed_attempts_are_reported(self):
+        aggregator = MetricsAggregator()
+        tester = UserAgentTester(test_url='http://127.0.0.1:9/', delay_range=(0, 0), timeout=1,
+                                 retry_policy=RetryPolicy(backoff=0))
+        tester.add_hook(aggregator)
+        tester.add_hook(lambda result: 1 / 0)  # A failing hook must not break the check
+        self.assertFalse(tester.check_user_agent('Mozilla/5.0'))
+        # Connection errors are retried, and every attempt is reported
+        self.assertEqual(aggregator.errors, 3)
+        self.assertEqual(dict(aggregator.exceptions), {'ConnectionError': 3})
+
+
+class TestMetricsAggregator(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = MetricsAggregator()
+        for total in range(1, 101):
+            self.aggregator(make_result(total / 100, proxy='http://p1'))
+        self.aggregator(make_result(3.0, status_code=None, exception='Timeout', proxy='http://p2'))
+
+    def test_summary(self):
+        summary = self.aggregator.summary()
+        self.assertEqual(summary['attempts'], 101)
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(summary['status_codes'], {'200': 100})
+        self.assertEqual(summary['exceptions'], {'Timeout': 1})
+        self.assertEqual(summary['latency']['total']['p50'], 0.51)
+        self.assertEqual(summary['latency']['total']['max'], 3.0)
+        self.assertEqual(summary['proxies']['http://p2'], {'attempts': 1, 'errors': 1, 'mean_latency': 3.0})
+        self.assertNotIn('connect', summary['latency'])
+
+    def test_percentiles_are_sampled(self):
+        aggregator = MetricsAggregator(max_samples=50)
+        for total in range(1000):
+            aggregator(make_result(total / 1000))
+        self.assertEqual(len(aggregator._samples['total']), 50)
+        self.assertAlmostEqual(aggregator.percentile(50), 0.5, delta=0.2)
+        self.assertEqual(aggregator.summary()['latency']['total']['count'], 1000)
+
+    def test_prometheus(self):
+        text = self.aggregator.to_prometheus()
+        self.assertIn('useragentfilter_attempts_total 101', text)
+        self.assertIn('useragentfilter_responses_total{code="200"} 100', text)
+        self.assertIn('useragentfilter_latency_seconds_bucket{phase="total",le="0.05"} 5', text)
+        self.assertIn('useragentfilter_latency_seconds_bucket{phase="total",le="+Inf"} 101', text)
+
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'metrics.json')
+            self.aggregator.export(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['attempts'], 101)
+            with self.assertRaises(ValueError):
+                self.aggregator.export(path, format='xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
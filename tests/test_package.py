@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import UserAgentFilter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_modules(statement):
+    # Run in a fresh interpreter, as this one has already imported everything
+    code = f"import sys; {statement}; print(' '.join(sorted(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return set(output.split())
+
+
+class TestPackage(unittest.TestCase):
+    def test_exports(self):
+        from UserAgentFilter.selector import GetUserAgent
+        from UserAgentFilter.tester import UserAgentTester
+        self.assertIs(UserAgentFilter.GetUserAgent, GetUserAgent)
+        self.assertIs(UserAgentFilter.UserAgentTester, UserAgentTester)
+        for name in UserAgentFilter.__all__:
+            self.assertTrue(hasattr(UserAgentFilter, name), name)
+        self.assertIn('GetUserAgent', dir(UserAgentFilter))
+        with self.assertRaises(AttributeError):
+            UserAgentFilter.UserAgentFilter
+
+    def test_import_is_lazy(self):
+        modules = imported_modules('import UserAgentFilter')
+        self.assertNotIn('requests', modules)
+        self.assertNotIn('UserAgentFilter.tester', modules)
+
+    def test_selector_does_not_import_http_stack(self):
+        modules = imported_modules('from UserAgentFilter import GetUserAgent, parse_user_agent, MetricsAggregator')
+        self.assertNotIn('requests', modules)
+        self.assertNotIn('urllib3', modules)
+
+    def test_config_objects_do_not_import_http_stack(self):
+        modules = imported_modules('from UserAgentFilter import RetryPolicy; RetryPolicy(max_attempts=2)')
+        self.assertNotIn('requests', modules)
+        self.assertNotIn('urllib3', modules)
+
+    def test_moved_names_still_importable(self):
+        from UserAgentFilter.adapters import TimedHTTPAdapter
+        from UserAgentFilter.metrics import TimedHTTPAdapter as moved
+        self.assertIs(moved, TimedHTTPAdapter)
+
+
+if __name__ == '__main__':
+    unittest.main()
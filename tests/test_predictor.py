@@ -0,0 +1,114 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from UserAgentFilter.cache import VerdictCache
+from UserAgentFilter.metrics import CheckResult
+from UserAgentFilter.predictor import PredictionQueue, VerdictPredictor, agent_signature
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+OLD = [f'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; build {index})' for index in range(20)]
+NEW = [f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+       f'Chrome/119.0.{index}.0 Safari/537.36' for index in range(10)]
+ANDROID = 'Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{} Mobile Safari/537.36'
+
+
+def trained(host, blocked=10, accepted=10):
+    predictor = VerdictPredictor()
+    for user_agent in OLD[:blocked]:
+        predictor.observe(host, user_agent, False)
+    for user_agent in NEW[:accepted]:
+        predictor.observe(host, user_agent, True)
+    return predictor
+
+
+class TestPredictor(unittest.TestCase):
+    def test_generalizes_to_untested_versions(self):
+        predictor = VerdictPredictor()
+        for version in (91, 95, 97):
+            predictor.observe('example.com', ANDROID.format(f'{version}.0.0.0'), False)
+        for version in (114, 119):
+            predictor.observe('example.com', ANDROID.format(f'{version}.0.0.0'), True)
+        self.assertEqual(agent_signature(ANDROID.format('96.0.0.0'))[:3], ('Chrome', 'Android', 90))
+        self.assertLess(predictor.predict('example.com', ANDROID.format('96.0.0.0')), 0.3)
+        self.assertGreater(predictor.predict('example.com', ANDROID.format('118.0.0.0')), 0.7)
+        # Other hosts have their own model
+        self.assertEqual(predictor.predict('other.com', ANDROID.format('96.0.0.0')), 0.5)
+
+    def test_hook_ignores_transient_responses(self):
+        predictor = VerdictPredictor()
+        for status_code in (429, 503, None, 200, 403):
+            predictor(CheckResult(NEW[0], 'http://example.com/page', 0, status_code, None, None, None, None,
+                                  0.1, 0, None, None, time.time()))
+        self.assertEqual(predictor.observations('example.com'), 2)
+
+    def test_queue_order_and_pruning(self):
+        predictor = trained('example.com')
+        queue = PredictionQueue(predictor, 'example.com', OLD + NEW, threshold=0.2, explore=0.1)
+        popped = []
+        while True:
+            user_agent = queue.pop()
+            if user_agent is None:
+                break
+            popped.append(user_agent)
+        self.assertEqual(popped[:10], NEW)
+        # Only 10% of the predicted-blocked agents are tested to confirm
+        self.assertEqual(popped[10:], OLD[:2])
+        self.assertEqual(queue.explored, 2)
+        self.assertEqual(len(queue), 18)
+
+    def test_find_user_agents(self):
+        with MockServer() as server:
+            tester = UserAgentTester(test_url=server.url, delay_range=(0, 0))
+            found = tester.find_user_agents(OLD + NEW, target=5, concurrency=1)
+            self.assertEqual(len(found), 5)
+            self.assertTrue(all(agent in NEW for agent in found))
+            # One blocked agent is enough to move on to the other browser
+            self.assertLessEqual(len(server.requests), 6)
+
+            server.requests.clear()
+            host = server.url.split('/')[2]
+            found = tester.find_user_agents(OLD + NEW, target=15, predictor=trained(host), concurrency=4)
+            self.assertEqual(sorted(found), sorted(NEW))
+            self.assertLessEqual(len(server.requests), 12)
+            self.assertEqual(tester.hooks, [])
+
+    def test_concurrent_runs_keep_their_predictors(self):
+        async def find_both(tester, first, second):
+            return await asyncio.gather(
+                tester.afind_user_agents(NEW[:5], target=5, predictor=first, concurrency=2),
+                tester.afind_user_agents(OLD[:3] + NEW[5:], target=2, predictor=second, concurrency=2))
+
+        with MockServer() as server:
+            tester = UserAgentTester(test_url=server.url, delay_range=(0, 0))
+            first, second = VerdictPredictor(), VerdictPredictor()
+            found = asyncio.run(find_both(tester, first, second))
+            host = server.url.split('/')[2]
+            # Each predictor only learned from the responses of its own run
+            self.assertEqual(sorted(found[0]), sorted(NEW[:5]))
+            self.assertEqual(first.observations(host), 5)
+            self.assertEqual(second.observations(host), len(server.requests) - 5)
+            self.assertEqual(tester.hooks, [])
+
+    def test_save_load_and_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'model.json')
+            predictor = trained('example.com')
+            predictor.save(path)
+            loaded = VerdictPredictor.load(path)
+        self.assertEqual(loaded.predict('example.com', OLD[15]), predictor.predict('example.com', OLD[15]))
+
+        with VerdictCache(':memory:') as cache:
+            cache.put(OLD[0], 'example.com', 403, 0.1)
+            cache.put(NEW[0], 'example.com', 200, 0.1)
+            cache.put(NEW[1], 'example.com', 429, 0.1)
+            predictor = VerdictPredictor()
+            self.assertEqual(predictor.learn_from_cache(cache), 2)
+        self.assertLess(predictor.predict('example.com', OLD[1]), predictor.predict('example.com', NEW[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from UserAgentFilter.preprocess import DedupStats, dedupe_user_agents, normalize_user_agent
+from UserAgentFilter.streaming import iter_user_agents
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+CHROME = 'Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Mobile Safari/537.36'
+
+
+class TestPreprocess(unittest.TestCase):
+    def test_normalize_user_agent(self):
+        self.assertEqual(normalize_user_agent(CHROME + ',gzip(gfe)'), CHROME)
+        self.assertEqual(normalize_user_agent(CHROME + ', GZIP(gfe),gzip(gfe)'), CHROME)
+        self.assertEqual(normalize_user_agent('  "Mozilla/5.0 \t (X11;\x00 Linux)"  '), 'Mozilla/5.0 (X11; Linux)')
+        self.assertEqual(normalize_user_agent(' \t '), '')
+
+    def test_dedupe_bundled_list(self):
+        stats = DedupStats()
+        agents = list(dedupe_user_agents(iter_user_agents(USER_AGENTS_FILE), stats=stats))
+        self.assertEqual(stats.total, 9)
+        self.assertEqual(stats.unique, 8)
+        self.assertEqual(stats.requests_saved, 1)
+        self.assertEqual(stats.normalized, 1)
+        self.assertEqual(agents[0], (0, CHROME))
+        self.assertNotIn(2, [index for index, _ in agents])
+
+    def test_exact_dedupe_without_normalization(self):
+        agents = [(0, 'a'), (1, 'b'), (2, 'a'), (3, 'a,gzip(gfe)')]
+        self.assertEqual(list(dedupe_user_agents(agents, normalize=False)), [(0, 'a'), (1, 'b'), (3, 'a,gzip(gfe)')])
+
+    def test_filter_with_dedupe(self):
+        with tempfile.TemporaryDirectory() as tmpdir, MockServer() as server:
+            tester = UserAgentTester(test_url=server.url, delay_range=(0, 0), dedupe=True)
+            result = tester.filter_user_agents(USER_AGENTS_FILE, os.path.join(tmpdir, 'out.txt'))
+            tester.close()
+            self.assertEqual(len(server.requests), 8)
+            self.assertEqual(len(result), 5)
+            self.assertEqual(len(set(result)), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
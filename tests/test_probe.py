@@ -0,0 +1,48 @@
+import unittest
+
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+FIREFOX = 'Mozilla/5.0 Firefox/120.0'
+MSIE = 'Mozilla/4.0 (compatible; MSIE 6.0)'
+
+
+class TestProbeModes(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(body=b'x' * 1000000).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def check(self, probe_mode, **kwargs):
+        with UserAgentTester(test_url=self.server.url, probe_mode=probe_mode, **kwargs) as tester:
+            return tester.check_user_agent(FIREFOX), tester.check_user_agent(MSIE)
+
+    def test_verdicts_match_in_every_mode(self):
+        for probe_mode in UserAgentTester.PROBE_MODES:
+            with self.subTest(probe_mode=probe_mode):
+                self.assertEqual(self.check(probe_mode), (True, False))
+
+    def test_head(self):
+        self.check('head')
+        self.assertEqual(self.server.methods, ['HEAD', 'HEAD'])
+
+    def test_head_falls_back_to_get(self):
+        self.server.head_allowed = False
+        self.assertEqual(self.check('head'), (True, False))
+        self.assertEqual(self.server.methods, ['HEAD', 'GET', 'HEAD', 'GET'])
+
+    def test_capped_reads_prefix(self):
+        with UserAgentTester(test_url=self.server.url, probe_mode='capped', probe_bytes=100) as tester:
+            request = tester._probe_request(self.server.url, {'User-Agent': FIREFOX}, None)
+            response = tester.transport.send(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'x' * 100)
+
+    def test_invalid_probe_mode(self):
+        with self.assertRaises(ValueError):
+            UserAgentTester(test_url=self.server.url, probe_mode='options')
+
+
+if __name__ == '__main__':
+    unittest.main()
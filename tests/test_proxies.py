@@ -0,0 +1,55 @@
+import unittest
+
+from UserAgentFilter.proxies import ProxyPool
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+DEAD_PROXY = 'http://127.0.0.1:1'
+
+
+class TestProxyPool(unittest.TestCase):
+    def test_cooldown_after_failures(self):
+        pool = ProxyPool(['http://a:1', 'http://b:1'], cooldown=60, max_failures=2)
+        pool.report('http://a:1', error=True)
+        self.assertEqual(pool.stats['http://a:1'].cooldown_until, 0.0)
+        pool.report('http://a:1', error=True)
+        self.assertEqual({pool.choose() for _ in range(20)}, {'http://b:1'})
+        # With every proxy cooling down, the one that comes back first is used
+        pool.report('http://b:1', error=True)
+        pool.report('http://b:1', error=True)
+        self.assertEqual(pool.choose(), 'http://a:1')
+        self.assertIsNone(pool.choose(exclude=['http://a:1', 'http://b:1']))
+
+    def test_score_prefers_healthy_proxies(self):
+        pool = ProxyPool(['http://fast:1', 'http://slow:1', 'http://banned:1'])
+        for _ in range(5):
+            pool.report('http://fast:1', 200, latency=0.1)
+            pool.report('http://slow:1', 200, latency=5.0)
+            pool.report('http://banned:1', 429, latency=0.1)
+        scores = {proxy: stats.score for proxy, stats in pool.stats.items()}
+        self.assertGreater(scores['http://fast:1'], scores['http://banned:1'])
+        self.assertGreater(scores['http://fast:1'], scores['http://slow:1'])
+
+    def test_failover_on_proxy_error(self):
+        with MockServer() as server:
+            # The mock server answers absolute-URI requests, so it doubles as a working proxy
+            pool = ProxyPool([DEAD_PROXY, server.url], max_failures=1)
+            with UserAgentTester(test_url=server.url, proxy=pool, max_retries=3) as tester:
+                self.assertEqual(tester.get_proxy(exclude=[DEAD_PROXY]), {'http': server.url, 'https': server.url})
+                for _ in range(3):
+                    self.assertTrue(tester.check_user_agent('Mozilla/5.0 Firefox/120.0'))
+            self.assertEqual(pool.stats[server.url].errors, 0)
+            self.assertLessEqual(pool.stats[DEAD_PROXY].errors, 1)
+
+    def test_list_is_wrapped_in_pool(self):
+        tester = UserAgentTester(test_url='http://example.com', proxy=[DEAD_PROXY])
+        self.assertIsInstance(tester.proxy_pool, ProxyPool)
+        with MockServer() as server:
+            tester.test_url = server.url
+            self.assertFalse(tester.check_user_agent('Mozilla/5.0 Firefox/120.0'))
+        self.assertEqual(tester.proxy_pool.stats[DEAD_PROXY].errors, 1)
+        tester.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import time
+import unittest
+from email.utils import formatdate
+
+from UserAgentFilter.ratelimit import HostRateLimiter, parse_retry_after
+from UserAgentFilter.retry import RetryPolicy
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+
+class TestHostRateLimiter(unittest.TestCase):
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertAlmostEqual(parse_retry_after(formatdate(time.time() + 60, usegmt=True)), 60, delta=2)
+        self.assertEqual(parse_retry_after(formatdate(time.time() - 60, usegmt=True)), 0.0)
+
+    def test_aimd(self):
+        limiter = HostRateLimiter(rate=1.0, min_rate=0.1, max_rate=1.2, increase=0.1, decrease=0.5)
+        limiter.feedback('a.com', 200)
+        self.assertAlmostEqual(limiter.rate('a.com'), 1.1)
+        limiter.feedback('a.com', 200)
+        limiter.feedback('a.com', 200)
+        self.assertAlmostEqual(limiter.rate('a.com'), 1.2)
+        limiter.feedback('a.com', 429)
+        self.assertAlmostEqual(limiter.rate('a.com'), 0.6)
+        limiter.feedback('a.com', timeout=True)
+        self.assertAlmostEqual(limiter.rate('a.com'), 0.3)
+        limiter.feedback('a.com', 500)
+        self.assertAlmostEqual(limiter.rate('a.com'), 0.3)
+        self.assertAlmostEqual(limiter.rate('b.com'), 1.0)
+
+    def test_spacing_per_host(self):
+        limiter = HostRateLimiter(rate=10.0, max_rate=10.0)
+        self.assertEqual(limiter.acquire('a.com'), 0.0)
+        self.assertEqual(limiter.acquire('b.com'), 0.0)
+        self.assertAlmostEqual(limiter._reserve('a.com'), 0.1, delta=0.02)
+        self.assertAlmostEqual(limiter._reserve('a.com'), 0.2, delta=0.02)
+
+    def test_retry_after_pauses_host(self):
+        limiter = HostRateLimiter(rate=10.0, max_rate=10.0)
+        limiter.acquire('a.com')
+        limiter.feedback('a.com', 503, retry_after=5)
+        self.assertGreater(limiter._reserve('a.com'), 4)
+
+    def test_tester_reports_to_limiter(self):
+        limiter = HostRateLimiter(rate=5.0, max_rate=10.0)
+        with MockServer() as server:
+            server.queued.append((429, {'Retry-After': '0'}))
+            with UserAgentTester(test_url=server.url, rate_limiter=limiter,
+                                 retry_policy=RetryPolicy(backoff=0)) as tester:
+                host = server.url.split('/')[2]
+                # The 429 halves the rate and is retried; the 200 of the retry raises it again
+                self.assertTrue(tester.check_user_agent('Mozilla/5.0 Firefox/120.0'))
+                self.assertAlmostEqual(limiter.rate(host), 2.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
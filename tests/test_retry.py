@@ -0,0 +1,140 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from UserAgentFilter.cache import VerdictCache
+from UserAgentFilter.retry import ACCEPTED, REJECTED, TRANSPORT_FAILURE, RetryPolicy
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+AGENTS = [f'Mozilla/5.0 (X11; Linux x86_64; rv:{version}.0) Gecko/20100101 Firefox/{version}.0'
+          for version in (115, 118, 120)]
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_backoff_grows_and_is_capped(self):
+        policy = RetryPolicy(backoff=1.0, multiplier=2.0, max_backoff=5.0, jitter=False)
+        self.assertEqual([policy.delay(retry) for retry in range(1, 5)], [1.0, 2.0, 4.0, 5.0])
+        # Retry-After only lengthens the wait
+        self.assertEqual(policy.delay(1, retry_after=3.0), 3.0)
+
+    def test_jitter_stays_within_bound(self):
+        policy = RetryPolicy(backoff=1.0, multiplier=2.0)
+        for _ in range(100):
+            self.assertTrue(0 <= policy.delay(3) <= 4.0)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_attempts=0)
+        with self.assertRaises(ValueError):
+            RetryPolicy(multiplier=0.5)
+
+
+class TestRetries(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_server_error_is_retried(self):
+        self.server.queued.append((503, {}))
+        with UserAgentTester(test_url=self.server.url, retry_policy=RetryPolicy(backoff=0)) as tester:
+            self.assertEqual(tester.check_outcome(AGENTS[0]), ACCEPTED)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_rejection_is_not_retried(self):
+        with UserAgentTester(test_url=self.server.url, retry_policy=RetryPolicy(backoff=0)) as tester:
+            self.assertEqual(tester.check_outcome('Mozilla/4.0 (compatible; MSIE 8.0; Windows NT 6.1)'), REJECTED)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_transport_failure_is_not_cached(self):
+        self.server.queued.extend([(503, {})] * 2)
+        cache = VerdictCache(':memory:')
+        policy = RetryPolicy(max_attempts=2, backoff=0)
+        with UserAgentTester(test_url=self.server.url, cache=cache, retry_policy=policy) as tester:
+            self.assertEqual(tester.check_outcome(AGENTS[0]), TRANSPORT_FAILURE)
+            self.assertIsNone(cache.get(AGENTS[0], self.server.url.split('/')[2]))
+            self.assertTrue(tester.check_user_agent(AGENTS[0]))
+
+    def test_budget_stops_retrying(self):
+        self.server.queued.extend([(503, {'Retry-After': '5'})] * 3)
+        policy = RetryPolicy(budget=1.0)
+        with UserAgentTester(test_url=self.server.url, retry_policy=policy) as tester:
+            self.assertEqual(tester.check_outcome(AGENTS[0]), TRANSPORT_FAILURE)
+        self.assertEqual(len(self.server.requests), 1)
+
+
+class TestDeferredPass(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.temp_dir.name, 'agents.txt')
+        self.output_file = os.path.join(self.temp_dir.name, 'output.txt')
+        with open(self.input_file, 'w') as f:
+            f.write('\n'.join(AGENTS) + '\n')
+        # Every attempt for the first user agent fails; its deferred retry succeeds
+        self.server.queued.extend([(503, {})] * 2)
+        self.tester = UserAgentTester(test_url=self.server.url, delay_range=(0, 0),
+                                      retry_policy=RetryPolicy(max_attempts=2, backoff=0))
+
+    def tearDown(self):
+        self.tester.close()
+        self.server.__exit__(None, None, None)
+        self.temp_dir.cleanup()
+
+    def test_filter_retries_transport_failures_last(self):
+        result = self.tester.filter_user_agents(self.input_file, self.output_file)
+        expected = AGENTS[1:] + AGENTS[:1]
+        self.assertEqual(result, expected)
+        with open(self.output_file, 'r') as f:
+            self.assertEqual(f.read().splitlines(), expected)
+
+    def test_async_filter_retries_transport_failures_last(self):
+        result = asyncio.run(self.tester.afilter_user_agents(self.input_file, self.output_file, concurrency=1))
+        self.assertEqual(result, AGENTS[1:] + AGENTS[:1])
+
+    def _interrupt_deferred_pass(self, checkpoint_file):
+        # Stop the run when the deferred pass gets its verdict, before it is recorded
+        def interrupt(result):
+            if result.user_agent == AGENTS[0] and result.status_code == 200:
+                raise KeyboardInterrupt
+        self.tester.add_hook(interrupt)
+        with self.assertRaises(KeyboardInterrupt):
+            self.tester.filter_user_agents(self.input_file, self.output_file, checkpoint_file=checkpoint_file,
+                                           flush_every=1)
+        self.tester.hooks.remove(interrupt)
+        with open(self.output_file, 'r') as f:
+            self.assertEqual(f.read().splitlines(), AGENTS[1:])
+
+    def test_resume_during_deferred_pass(self):
+        checkpoint_file = os.path.join(self.temp_dir.name, 'checkpoint.json')
+        self._interrupt_deferred_pass(checkpoint_file)
+
+        requests_before = len(self.server.requests)
+        result = self.tester.filter_user_agents(self.input_file, self.output_file, checkpoint_file=checkpoint_file,
+                                                flush_every=1)
+        expected = AGENTS[1:] + AGENTS[:1]
+        self.assertEqual(result, expected)
+        # Only the deferred user agent is tested again
+        self.assertEqual(len(self.server.requests) - requests_before, 1)
+        self.assertFalse(os.path.exists(checkpoint_file))
+        with open(self.output_file, 'r') as f:
+            self.assertEqual(f.read().splitlines(), expected)
+
+    def test_async_resume_during_deferred_pass(self):
+        checkpoint_file = os.path.join(self.temp_dir.name, 'checkpoint.json')
+        self._interrupt_deferred_pass(checkpoint_file)
+        result = asyncio.run(self.tester.afilter_user_agents(self.input_file, self.output_file, concurrency=2,
+                                                             checkpoint_file=checkpoint_file))
+        self.assertEqual(result, AGENTS[1:] + AGENTS[:1])
+
+    def test_failures_without_deferred_pass_are_rejected(self):
+        self.tester.retry_policy.defer_passes = 0
+        result = self.tester.filter_user_agents(self.input_file, self.output_file)
+        self.assertEqual(result, AGENTS[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
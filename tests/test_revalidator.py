@@ -0,0 +1,74 @@
+import os
+import tempfile
+import time
+import unittest
+
+from UserAgentFilter.revalidator import PoolRevalidator
+from UserAgentFilter.selector import GetUserAgent
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestPoolRevalidator(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # Nine user agents the server accepts
+        with open(USER_AGENTS_FILE, 'r') as f:
+            good = [line.strip() for line in f if 'MSIE' not in line][:6]
+        good += [f'Mozilla/5.0 (X11; Linux x86_64; rv:{version}.0) Gecko/20100101 Firefox/{version}.0'
+                 for version in (115, 118, 120)]
+        self.good = good
+        self.file_path = os.path.join(self.temp_dir.name, 'agents.txt')
+        with open(self.file_path, 'w') as f:
+            f.write('\n'.join(good) + '\n')
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.temp_dir.cleanup()
+
+    def test_evicts_and_tops_up(self):
+        selector = GetUserAgent(self.file_path)
+        selector.test_user_agents(number=6, test_url=self.server.url)
+        self.assertEqual(len(selector.successful_agents), 6)
+        # The server blocks by substring, so pick an agent no other agent of the file contains
+        blocked = next(agent for agent in selector.successful_agents
+                       if not any(agent in other for other in self.good if other != agent))
+        self.server.blocked += (blocked,)
+        self.server.requests.clear()
+
+        revalidator = PoolRevalidator(selector, self.server.url, budget=10, min_pool=6, delay_range=(0, 0))
+        self.assertEqual(revalidator.run_once(), 7)
+        self.assertEqual(revalidator.evicted, 1)
+        self.assertEqual(revalidator.added, 1)
+        self.assertNotIn(blocked, selector.successful_agents)
+        self.assertEqual(len(selector.successful_agents), 6)
+        # The budget limits the requests per cycle
+        revalidator.budget = 2
+        self.assertEqual(revalidator.run_once(), 2)
+        revalidator.stop()
+
+    def test_top_up_only_draws_needed_agents(self):
+        selector = GetUserAgent(self.file_path)
+        revalidator = PoolRevalidator(selector, self.server.url, budget=9, min_pool=1, delay_range=(0, 0))
+        self.assertEqual(revalidator.run_once(), 1)
+        self.assertEqual(revalidator.added, 1)
+        # The agents that were not needed can still be drawn later
+        self.assertEqual(len(selector.sample_untested(9)), 8)
+
+    def test_background_thread(self):
+        selector = GetUserAgent(self.file_path)
+        selector.test_user_agents(number=3, test_url=self.server.url)
+        with selector.revalidate(self.server.url, interval=0.05, budget=3, delay_range=(0, 0)) as revalidator:
+            deadline = time.monotonic() + 5
+            while revalidator.cycles < 2 and time.monotonic() < deadline:
+                self.assertIsNotNone(selector.get_random_user_agent())
+                time.sleep(0.01)
+        self.assertGreaterEqual(revalidator.cycles, 2)
+        self.assertFalse(revalidator._thread.is_alive())
+        self.assertEqual(len(selector.successful_agents), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
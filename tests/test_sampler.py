@@ -0,0 +1,72 @@
+import random
+import unittest
+from collections import Counter
+
+from UserAgentFilter.sampler import WeightedSampler
+from UserAgentFilter.selector import GetUserAgent
+
+
+class TestWeightedSampler(unittest.TestCase):
+    def test_distribution(self):
+        sampler = WeightedSampler([1, 0, 3, 6])
+        rng = random.Random(1)
+        counts = Counter(sampler.sample(rng) for _ in range(20000))
+        self.assertNotIn(1, counts)
+        self.assertAlmostEqual(counts[3] / 20000, 0.6, delta=0.02)
+        self.assertAlmostEqual(counts[0] / 20000, 0.1, delta=0.02)
+
+    def test_updates_keep_totals(self):
+        rng = random.Random(2)
+        sampler = WeightedSampler()
+        weights = []
+        for _ in range(1000):
+            weight = rng.random()
+            weights.append(weight)
+            sampler.append(weight)
+        for _ in range(1000):
+            index = rng.randrange(len(weights))
+            weights[index] = rng.random() * 3
+            sampler.update(index, weights[index])
+        for _ in range(300):
+            self.assertEqual(sampler.pop(), weights.pop())
+        self.assertAlmostEqual(sampler.total, sum(weights))
+        self.assertEqual(len(sampler), 700)
+
+    def test_empty(self):
+        with self.assertRaises(ValueError):
+            WeightedSampler().sample()
+        with self.assertRaises(ValueError):
+            WeightedSampler([0, 0]).sample()
+
+
+class TestSelectorFeedback(unittest.TestCase):
+    def setUp(self):
+        self.selector = GetUserAgent('unused.txt')
+        self.selector.successful_agents.extend(['a', 'b', 'c'])
+
+    def test_blocked_agents_drop_out(self):
+        self.selector.report('a', 403)
+        self.selector.report('c', False)
+        self.assertEqual(self.selector.successful_agents, ['b'])
+        self.assertEqual({self.selector.get_random_user_agent() for _ in range(20)}, {'b'})
+        self.selector.report('b', 403)
+        self.assertIsNone(self.selector.get_random_user_agent())
+
+    def test_failures_lower_weight(self):
+        for _ in range(10):
+            self.selector.report('a', 503)
+        self.selector.report('b', None)
+        counts = Counter(self.selector.get_random_user_agent() for _ in range(3000))
+        self.assertLess(counts['a'], 20)
+        self.assertGreater(counts['c'], counts['b'])
+        self.selector.report('b', 200)
+        self.assertEqual(self.selector._sampler.weight(self.selector._positions[self.selector.store.id_of('b')]), 1.0)
+
+    def test_direct_list_changes_are_picked_up(self):
+        self.selector.successful_agents.append('d')
+        self.selector.report('d', 403)
+        self.assertEqual(sorted(self.selector.successful_agents), ['a', 'b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import unittest
+
+from UserAgentFilter.selector import GetUserAgent
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestGetUserAgent(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_parallel_matches_sequential(self):
+        sequential = GetUserAgent(USER_AGENTS_FILE)
+        sequential.test_user_agents(number=9, test_url=self.server.url)
+        parallel = GetUserAgent(USER_AGENTS_FILE)
+        parallel.test_user_agents(number=9, test_url=self.server.url, workers=4)
+
+        self.assertEqual(sorted(parallel.successful_agents), sorted(sequential.successful_agents))
+        self.assertEqual(len(parallel.successful_agents), 6)
+        self.assertNotIn('MSIE', parallel.get_random_user_agent())
+
+    def test_stop_after(self):
+        selector = GetUserAgent(USER_AGENTS_FILE)
+        selector.test_user_agents(number=9, test_url=self.server.url, workers=2, stop_after=2)
+        self.assertEqual(len(selector.successful_agents), 2)
+
+        sequential = GetUserAgent(USER_AGENTS_FILE)
+        sequential.test_user_agents(number=9, test_url=self.server.url, stop_after=1)
+        self.assertEqual(len(sequential.successful_agents), 1)
+        self.assertLess(len(self.server.requests), 18)
+
+    def test_verdict_interface(self):
+        selector = GetUserAgent(USER_AGENTS_FILE)
+        first = selector.sample_untested(5)
+        # Sampled agents count as tested and are not handed out again
+        rest = selector.sample_untested(10)
+        self.assertEqual(len(set(first) | set(rest)), 9)
+        self.assertEqual(selector.sample_untested(1), [])
+
+        selector.record_verdict(first[0], True)
+        selector.record_verdict(first[1], True)
+        selector.record_verdict(first[2], None)
+        self.assertEqual(sorted(selector.pool_snapshot()), sorted(first[:2]))
+        selector.record_verdict(first[0], False)
+        self.assertEqual(selector.pool_snapshot(), [first[1]])
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            GetUserAgent(USER_AGENTS_FILE).test_user_agents(number=1, test_url=self.server.url, workers=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_connections_are_reused(self):
+        with UserAgentTester(test_url=self.server.url) as tester:
+            for _ in range(5):
+                self.assertTrue(tester.check_user_agent('Mozilla/5.0 Firefox/120.0'))
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_keep_alive_disabled(self):
+        with UserAgentTester(test_url=self.server.url, keep_alive=False) as tester:
+            for _ in range(3):
+                self.assertTrue(tester.check_user_agent('Mozilla/5.0 Firefox/120.0'))
+        self.assertEqual(len(self.server.connections), 3)
+
+    def test_one_session_per_proxy(self):
+        tester = UserAgentTester(test_url=self.server.url)
+        transport = tester.transport
+        direct = transport.session(None)
+        proxied = transport.session({'https': 'http://127.0.0.1:9'})
+        self.assertIs(transport.session(None), direct)
+        self.assertIsNot(direct, proxied)
+        self.assertEqual(proxied.proxies['https'], 'http://127.0.0.1:9')
+        tester.close()
+        self.assertEqual(transport._sessions, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
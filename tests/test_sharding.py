@@ -0,0 +1,138 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from UserAgentFilter.cache import VerdictCache
+from UserAgentFilter.cli import main
+from UserAgentFilter.metrics import MetricsAggregator
+from UserAgentFilter import sharding
+from UserAgentFilter.sharding import ShardStats
+from UserAgentFilter.streaming import count_lines, iter_user_agents, line_offsets
+from UserAgentFilter.tester import UserAgentTester
+from UserAgentFilter.transport import FakeTransport
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tester = UserAgentTester(test_url=self.server.url, delay_range=(0, 0))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_sharded_matches_sequential(self):
+        expected = self.tester.filter_user_agents(USER_AGENTS_FILE, self.path('sequential.txt'))
+        stats = ShardStats()
+        actual = self.tester.filter_user_agents_sharded(
+            USER_AGENTS_FILE, self.path('sharded.txt'), processes=3, stats=stats)
+
+        self.assertEqual(actual, expected)
+        with open(self.path('sequential.txt')) as f_seq, open(self.path('sharded.txt')) as f_shard:
+            self.assertEqual(f_shard.read(), f_seq.read())
+        self.assertEqual(len(stats.shards), 3)
+        self.assertEqual(stats.written, len(expected))
+        self.assertEqual(stats.shards[-1].stop_line, count_lines(USER_AGENTS_FILE))
+        # Only the merged output is left behind
+        self.assertEqual(os.listdir(self.tmpdir.name), ['sequential.txt', 'sharded.txt'])
+
+    def test_finished_shards_are_kept(self):
+        output = self.path('out.txt')
+        checkpoint = self.path('run.checkpoint')
+        lines = count_lines(USER_AGENTS_FILE)
+        # A shard left complete by an interrupted run is merged without being tested again
+        with open(f'{output}.1-of-2', 'w') as f:
+            f.write('Kept/1.0\n')
+        actual = self.tester.filter_user_agents_sharded(
+            USER_AGENTS_FILE, output, processes=2, checkpoint_file=checkpoint)
+        self.assertEqual(actual[0], 'Kept/1.0')
+        self.assertLessEqual(len(self.server.requests), lines - lines // 2)
+
+    def test_dedupe_once_in_parent(self):
+        self.tester.dedupe = True
+        expected = self.tester.filter_user_agents(USER_AGENTS_FILE, self.path('sequential.txt'))
+        stats = ShardStats()
+        actual = self.tester.filter_user_agents_sharded(
+            USER_AGENTS_FILE, self.path('sharded.txt'), processes=2, stats=stats)
+        self.assertEqual(actual, expected)
+        # The shards split the distinct user agents, and the temporary file is removed
+        self.assertEqual(stats.lines, count_lines(USER_AGENTS_FILE) - 1)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['sequential.txt', 'sharded.txt'])
+
+    def test_settings_that_cannot_be_shared(self):
+        for tester in (UserAgentTester(test_url=self.server.url, hooks=[MetricsAggregator()]),
+                       UserAgentTester(test_url=self.server.url, cache=VerdictCache(':memory:'))):
+            with self.assertRaises(ValueError):
+                tester.filter_user_agents_sharded(USER_AGENTS_FILE, self.path('out.txt'), processes=2)
+        self.assertEqual(self.server.requests, [])
+
+    def test_fake_transport_settings(self):
+        tester = UserAgentTester(test_url='http://example.com/', delay_range=(0, 0),
+                                 transport=FakeTransport(blocked=('Android',)))
+        actual = tester.filter_user_agents_sharded(USER_AGENTS_FILE, self.path('out.txt'), processes=2)
+        self.assertEqual(actual, tester.filter_user_agents(USER_AGENTS_FILE, self.path('sequential.txt')))
+        # The shards were built with the same blocked substrings, not the default ones
+        self.assertEqual(len(actual), 6)
+        self.assertFalse(any('Android' in user_agent for user_agent in actual))
+
+    def test_missing_input(self):
+        self.assertEqual(self.tester.filter_user_agents_sharded('missing.txt', self.path('out.txt'), processes=2), [])
+
+    def test_cli(self):
+        output = self.path('cli.txt')
+        status = main([USER_AGENTS_FILE, '-o', output, '--url', self.server.url, '--processes', '2', '--delay', '0', '0'])
+        self.assertEqual(status, 0)
+        with open(output) as f:
+            self.assertEqual(len(f.read().splitlines()), 6)
+
+
+class TestCountLines(unittest.TestCase):
+    def test_trailing_line(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'agents.txt')
+            with open(path, 'w') as f:
+                f.write('a\n\nb')
+            self.assertEqual(count_lines(path), 3)
+            with open(path, 'w') as f:
+                f.write('a\nb\n')
+            self.assertEqual(count_lines(path), 2)
+
+    def test_line_offsets(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'agents.txt')
+            with open(path, 'w') as f:
+                f.write('a\n\nbc\nd')
+            self.assertEqual(line_offsets(path, [3, 0, 2, 4]), [6, 0, 3, 7])
+            # Reading from an offset numbers the lines like a read from the start
+            self.assertEqual(list(iter_user_agents(path, offset=3, offset_line=2)), [(2, 'bc'), (3, 'd')])
+            self.assertEqual(list(iter_user_agents(path, start=3, offset=3, offset_line=2, use_mmap=True)), [(3, 'd')])
+            with gzip.open(path + '.gz', 'wt') as f:
+                f.write('a\nb\n')
+            self.assertIsNone(line_offsets(path + '.gz', [1]))
+
+    def test_shards_seek_to_their_lines(self):
+        with tempfile.TemporaryDirectory() as tmpdir, MockServer() as server:
+            tester = UserAgentTester(test_url=server.url, delay_range=(0, 0))
+            offset = line_offsets(USER_AGENTS_FILE, [5])[0]
+            with mock.patch('UserAgentFilter.tester.iter_user_agents', wraps=iter_user_agents) as reader:
+                sharding._filter_shard(sharding._tester_recipe(tester, 2), 1, (5, 9), offset, USER_AGENTS_FILE,
+                                       os.path.join(tmpdir, 'shard'), None, 100, False)
+            # The shard starts reading at its first line
+            self.assertEqual((reader.call_args.kwargs['offset'], reader.call_args.kwargs['offset_line']), (offset, 5))
+            self.assertGreater(offset, 0)
+            with open(USER_AGENTS_FILE) as f:
+                tail = [line.strip() for line in f.read().splitlines()[5:] if line.strip()]
+            self.assertEqual(sorted(server.requests), sorted(tail))
+
+
+if __name__ == '__main__':
+    unittest.main()
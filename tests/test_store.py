@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from UserAgentFilter.selector import GetUserAgent
+from UserAgentFilter.store import AgentList, AgentStore
+
+
+class TestAgentStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'agents.store')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_interning(self):
+        store = AgentStore(['Mozilla/5.0', 'Opera/9.80', 'Mozilla/5.0'])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.add('Opera/9.80'), 1)
+        self.assertEqual(store.add('Lynx/2.8 (é)'), 2)
+        self.assertEqual(store[2], 'Lynx/2.8 (é)')
+        self.assertEqual(store.id_of('Mozilla/5.0'), 0)
+        self.assertIsNone(store.id_of('curl/8.0'))
+        self.assertEqual(list(store), ['Mozilla/5.0', 'Opera/9.80', 'Lynx/2.8 (é)'])
+
+    def test_save_and_open(self):
+        agents = [f'Agent/{i}' for i in range(1000)]
+        AgentStore(agents).save(self.path)
+        self.assertTrue(AgentStore.is_store_file(self.path))
+
+        with AgentStore.open(self.path) as store:
+            self.assertEqual(list(store), agents)
+            self.assertEqual(store.id_of('Agent/500'), 500)
+            # Agents added after opening live in memory next to the mapped part
+            self.assertEqual(store.add('Agent/1000'), 1000)
+            self.assertEqual(store.add('Agent/3'), 3)
+            self.assertEqual(store[1000], 'Agent/1000')
+
+    def test_agent_list(self):
+        store = AgentStore()
+        agents = AgentList(store, ['a', 'b', 'a'])
+        self.assertEqual(agents, ['a', 'b', 'a'])
+        self.assertEqual(len(store), 2)
+        agents[1] = 'c'
+        agents.append('b')
+        del agents[0]
+        self.assertEqual(agents, ['c', 'a', 'b'])
+        self.assertEqual(list(agents.ids), [2, 0, 1])
+
+    def test_selector_opens_store_file(self):
+        AgentStore(['Mozilla/5.0', 'Opera/9.80']).save(self.path)
+        selector = GetUserAgent(self.path)
+        self.assertEqual(len(selector.store), 2)
+        selector.successful_agents.extend(['Opera/9.80'])
+        self.assertEqual(selector.get_random_user_agent(), 'Opera/9.80')
+        selector.store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
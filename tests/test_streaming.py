@@ -0,0 +1,77 @@
+import asyncio
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from UserAgentFilter.streaming import iter_user_agents
+from UserAgentFilter.tester import UserAgentTester
+from mock_server import MockServer
+
+USER_AGENTS_FILE = os.path.join(os.path.dirname(__file__), 'user_agents.txt')
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().__enter__()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.output_file = os.path.join(self.tmpdir.name, 'out.txt')
+        self.checkpoint_file = os.path.join(self.tmpdir.name, 'out.checkpoint')
+        self.tester = UserAgentTester(test_url=self.server.url, delay_range=(0, 0))
+        self.expected = self.tester.filter_user_agents(USER_AGENTS_FILE, self.output_file)
+
+    def tearDown(self):
+        self.tester.close()
+        self.server.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    def test_gzip_and_mmap_inputs(self):
+        gzip_file = os.path.join(self.tmpdir.name, 'agents.txt.gz')
+        with open(USER_AGENTS_FILE, 'rb') as src, gzip.open(gzip_file, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+        plain = list(iter_user_agents(USER_AGENTS_FILE))
+        self.assertEqual(len(plain), 9)
+        self.assertEqual(list(iter_user_agents(gzip_file)), plain)
+        self.assertEqual(list(iter_user_agents(USER_AGENTS_FILE, use_mmap=True)), plain)
+        self.assertEqual(list(iter_user_agents(USER_AGENTS_FILE, start=7)), plain[7:])
+        self.assertEqual(self.tester.filter_user_agents(gzip_file, self.output_file), self.expected)
+
+    def test_resume_after_interruption(self):
+        stream = self.tester.iter_filter_user_agents(
+            USER_AGENTS_FILE, self.output_file, checkpoint_file=self.checkpoint_file, flush_every=1)
+        first = [next(stream), next(stream)]
+        stream.close()
+        self.assertTrue(os.path.exists(self.checkpoint_file))
+        with open(self.output_file) as f:
+            self.assertEqual(f.read().splitlines(), first)
+
+        requests_before = len(self.server.requests)
+        resumed = self.tester.filter_user_agents(
+            USER_AGENTS_FILE, self.output_file, checkpoint_file=self.checkpoint_file, flush_every=1)
+        self.assertEqual(resumed, self.expected)
+        self.assertFalse(os.path.exists(self.checkpoint_file))
+        self.assertEqual(len(self.server.requests) - requests_before, 9 - 2)
+        with open(self.output_file) as f:
+            self.assertEqual(f.read().splitlines(), self.expected)
+
+    def test_async_resume(self):
+        stream = self.tester.iter_filter_user_agents(
+            USER_AGENTS_FILE, self.output_file, checkpoint_file=self.checkpoint_file, flush_every=1)
+        next(stream)
+        stream.close()
+        resumed = asyncio.run(self.tester.afilter_user_agents(
+            USER_AGENTS_FILE, self.output_file, concurrency=3, checkpoint_file=self.checkpoint_file))
+        self.assertEqual(resumed, self.expected)
+        with open(self.output_file) as f:
+            self.assertEqual(f.read().splitlines(), self.expected)
+
+    def test_missing_input(self):
+        missing = os.path.join(self.tmpdir.name, 'missing.txt')
+        self.assertEqual(self.tester.filter_user_agents(missing, self.output_file), [])
+        self.assertEqual(list(self.tester.iter_filter_user_agents(missing, self.output_file)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import asyncio
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+import requests
+
+from UserAgentFilter.retry import RetryPolicy
+from UserAgentFilter.tester import UserAgentTester
+from UserAgentFilter.transport import FakeTransport, HTTPXTransport, ProbeRequest, RequestsTransport
+from mock_server import MockServer
+
+try:
+    import h2  # noqa: F401
+    HTTPXTransport()
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+FIREFOX = 'Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0'
+MSIE = 'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1)'
+URL = 'https://example.com/'
+
+
+class TestFakeTransport(unittest.TestCase):
+    def test_verdicts_without_network(self):
+        transport = FakeTransport()
+        with UserAgentTester(test_url=URL, transport=transport) as tester:
+            self.assertTrue(tester.check_user_agent(FIREFOX))
+            self.assertFalse(tester.check_user_agent(MSIE))
+        self.assertEqual([request.headers['User-Agent'] for request in transport.requests], [FIREFOX, MSIE])
+
+    def test_queued_failures_are_retried(self):
+        transport = FakeTransport()
+        transport.queued += [requests.exceptions.Timeout(), (503, {'Retry-After': '0'}, b'')]
+        with UserAgentTester(test_url=URL, transport=transport, retry_policy=RetryPolicy(backoff=0)) as tester:
+            self.assertTrue(tester.check_user_agent(FIREFOX))
+        self.assertEqual(len(transport.requests), 3)
+
+    def test_handler_and_probe_modes(self):
+        transport = FakeTransport(handler=lambda request: (200, {}, b'x' * 5000))
+        capped = transport.send(ProbeRequest(URL, {}, None, 10, 'capped', 100))
+        self.assertEqual(capped.content, b'x' * 100)
+        self.assertEqual(transport.send(ProbeRequest(URL, {}, None, 10, 'head')).content, b'')
+
+    def test_async_filter(self):
+        transport = FakeTransport(latency=0.01)
+        tester = UserAgentTester(test_url=URL, transport=transport, delay_range=(0, 0))
+        agents = list(enumerate([FIREFOX, MSIE] * 10))
+
+        async def collect():
+            return [result async for result in tester.aiter_check_user_agents(agents, concurrency=10)]
+
+        results = asyncio.run(collect())
+        self.assertEqual([success for _, _, success in results], [True, False] * 10)
+
+
+class TestRequestsTransport(unittest.TestCase):
+    def test_only_decodable_encodings_are_advertised(self):
+        tester = UserAgentTester(test_url=URL)
+        self.assertIsInstance(tester.transport, RequestsTransport)
+        encodings = {name.strip() for name in tester.common_headers['Accept-Encoding'].split(',')}
+        self.assertLessEqual({'gzip', 'deflate'}, encodings)
+        for name in encodings - {'gzip', 'deflate'}:
+            # urllib3 only advertises br and zstd when their decoders are installed
+            self.assertIn(name, ('br', 'zstd'))
+
+
+def fake_httpx(proxy_argument='proxy'):
+    """
+    Build a stand-in for the httpx module with the parts `HTTPXTransport` uses.
+    """
+    httpx = types.ModuleType('httpx')
+    httpx.HTTPError = type('HTTPError', (Exception,), {})
+    httpx.TransportError = type('TransportError', (httpx.HTTPError,), {})
+    httpx.TimeoutException = type('TimeoutException', (httpx.TransportError,), {})
+    httpx.ProxyError = type('ProxyError', (httpx.TransportError,), {})
+    httpx.UnsupportedProtocol = type('UnsupportedProtocol', (httpx.TransportError,), {})
+    httpx.Limits = lambda **limits: limits
+    httpx.clients = []
+
+    class Response:
+        status_code = 200
+        headers = {}
+        http_version = 'HTTP/2'
+        num_bytes_downloaded = 4
+
+        async def aread(self):
+            return b'body'
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+    class AsyncClient:
+        def __init__(self, **options):
+            self.options = options
+            self.closed = False
+            self.threads = set()
+            httpx.clients.append(self)
+
+        def stream(self, method, url, headers, timeout):
+            self.threads.add(threading.current_thread())
+            if 'timeout' in url:
+                raise httpx.TimeoutException('timed out')
+            return Response()
+
+        async def aclose(self):
+            self.closed = True
+
+    # The keyword the client takes its proxy by: 'proxy' since httpx 0.26, 'proxies' before
+    class ProxyClient(AsyncClient):
+        def __init__(self, http2=False, limits=None, verify=True, follow_redirects=False, proxy=None):
+            super().__init__(proxy=proxy)
+
+    class ProxiesClient(AsyncClient):
+        def __init__(self, http2=False, limits=None, verify=True, follow_redirects=False, proxies=None):
+            super().__init__(proxies=proxies)
+
+    httpx.AsyncClient = ProxyClient if proxy_argument == 'proxy' else ProxiesClient
+    return httpx
+
+
+class TestHTTPXTransportLogic(unittest.TestCase):
+    """
+    Exercise HTTPXTransport with a stand-in httpx module, so it is tested where httpx is not installed.
+    """
+
+    def transport(self, proxy_argument='proxy'):
+        httpx = fake_httpx(proxy_argument)
+        patcher = mock.patch.dict(sys.modules, {'httpx': httpx, 'h2': types.ModuleType('h2')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        transport = HTTPXTransport()
+        self.addCleanup(transport.close)
+        return transport, httpx
+
+    def test_requests_from_many_threads_share_the_loop(self):
+        transport, httpx = self.transport()
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(
+            transport.send(ProbeRequest(URL, {}, None, 10)))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([response.content for response in responses], [b'body'] * 8)
+        self.assertEqual(len(httpx.clients), 1)
+        self.assertEqual([thread.name for thread in httpx.clients[0].threads], ['HTTPXTransport'])
+
+    def test_one_client_per_proxy(self):
+        for proxy_argument in ('proxy', 'proxies'):
+            with self.subTest(proxy_argument=proxy_argument):
+                transport, httpx = self.transport(proxy_argument)
+                proxy = {'http': 'http://10.0.0.1:8080', 'https': 'http://10.0.0.1:8080'}
+                for _ in range(2):
+                    transport.send(ProbeRequest(URL, {}, None, 10))
+                    transport.send(ProbeRequest(URL, {}, proxy, 10))
+                # A client that does not take the keyword would have raised a TypeError
+                self.assertEqual([client.options[proxy_argument] for client in httpx.clients],
+                                 [None, 'http://10.0.0.1:8080'])
+
+    def test_close_and_restart(self):
+        transport, httpx = self.transport()
+        transport.send(ProbeRequest(URL, {}, None, 10))
+        transport.close()
+        self.assertTrue(httpx.clients[0].closed)
+        transport.send(ProbeRequest(URL, {}, None, 10))
+        self.assertEqual(len(httpx.clients), 2)
+
+    def test_errors_are_mapped(self):
+        transport, _ = self.transport()
+        with self.assertRaises(requests.exceptions.Timeout):
+            transport.send(ProbeRequest('https://example.com/timeout', {}, None, 10))
+
+
+@unittest.skipUnless(HAS_HTTPX, 'httpx with HTTP/2 support is not installed')
+class TestHTTPXTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(body=b'x' * 10000).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_verdicts_match_requests_transport(self):
+        for probe_mode in UserAgentTester.PROBE_MODES:
+            with self.subTest(probe_mode=probe_mode):
+                with UserAgentTester(test_url=self.server.url, probe_mode=probe_mode,
+                                     transport=HTTPXTransport()) as tester:
+                    self.assertTrue(tester.check_user_agent(FIREFOX))
+                    self.assertFalse(tester.check_user_agent(MSIE))
+
+    def test_connection_error_is_mapped(self):
+        transport = HTTPXTransport()
+        try:
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                transport.send(ProbeRequest('http://127.0.0.1:9/', {}, None, 1))
+        finally:
+            transport.close()
+
+
+if __name__ == '__main__':
+    unittest.main()